@@ -1,90 +1,473 @@
-from groq import Groq
+from groq import AsyncGroq, DefaultAsyncHttpxClient
 from config import settings
 from app.prompts.system_prompt import SYSTEM_PROMPT, SUMMARY_PROMPT
-from typing import List, Dict
+from app.LLM_Service.prompt_builder import assemble_prompt, build_prefix, count_message_tokens
+from app.LLM_Service.fake_llm import FakeLLMClient
+from app.LLM_Service.router import BackendStats, LLMRouter
+from app.LLM_Service.rate_limit import (
+    CircuitBreaker, LLMUnavailableError, RetryPolicy, TokenBucket, is_retryable, retry_after_seconds
+)
+from app.metrics.chat_metrics import (
+    STAGE_SECONDS, LLM_IN_FLIGHT, LLM_REQUESTS, LLM_RETRIES, LLM_THROTTLE_SECONDS, LLM_CIRCUIT_OPEN,
+    RESPONSE_CACHE_LOOKUPS, record_usage
+)
+from app.cache.response_cache import ResponseCache, prompt_fingerprint
+from app.admission.scheduler import FairScheduler
+from typing import List, Dict, Optional, AsyncIterator, Tuple
+import asyncio
+import functools
+import httpx
+import json
 import logging
+import os
+import time
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Groq client initialization
-try:
-    if not settings.GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY is not set in environment")
-    client = Groq(api_key=settings.GROQ_API_KEY)
-    logger.info("Groq client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Groq client: {str(e)}")
-    client = None
+def make_client(spec: Dict):
+    """
+    Create the completion client for one backend spec.
+    
+    AsyncGroq keeps completions off the event loop; the httpx pool is sized to the
+    concurrency cap so in-flight requests are not queued behind the default limit of 100.
+    base_url lets a backend point at another OpenAI-compatible endpoint.
+    The SDK's own retries are disabled; GroqService retries with its RetryPolicy.
+    """
+    api_key = backend_api_key(spec)
+    if spec["provider"] == "fake":
+        logger.warning(f"LLM backend {spec['name']} uses the fake provider; replies are not real")
+        return FakeLLMClient(
+            latency=spec.get("latency", settings.FAKE_LLM_LATENCY),
+            tokens_per_second=spec.get("tokens_per_second", settings.FAKE_LLM_TOKENS_PER_SECOND),
+            reply_tokens=spec.get("reply_tokens", settings.FAKE_LLM_REPLY_TOKENS),
+            error_rate=spec.get("error_rate", settings.FAKE_LLM_ERROR_RATE),
+            seed=spec.get("seed", settings.FAKE_LLM_SEED)
+        )
+    
+    max_connections = spec.get("max_concurrency", settings.LLM_MAX_CONCURRENCY)
+    return AsyncGroq(
+        api_key=api_key,
+        base_url=spec.get("base_url"),
+        timeout=spec.get("timeout", settings.LLM_TIMEOUT),
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+    )
+
+
+def backend_api_key(spec: Dict) -> Optional[str]:
+    """
+    API key of a backend spec (None for the fake provider).
+    
+    Raises:
+        ValueError: A Groq backend has no API key
+    """
+    if spec["provider"] == "fake":
+        return None
+    api_key = os.getenv(spec["api_key_env"]) if spec.get("api_key_env") else settings.GROQ_API_KEY
+    if not api_key:
+        raise ValueError(f"API key for LLM backend {spec['name']} is not set in environment")
+    return api_key
+
+
+def backend_specs() -> Tuple[List[Dict], Dict[str, List[str]]]:
+    """
+    Backend specs and per-purpose routes from settings.
+    
+    Without LLM_BACKENDS there is one 'primary' backend (LLM_BACKEND / MODEL), plus a
+    'summary' backend when SUMMARY_MODEL is set, which summaries try first.
+    """
+    if settings.LLM_BACKENDS:
+        specs = json.loads(settings.LLM_BACKENDS)
+        for spec in specs:
+            spec.setdefault("provider", settings.LLM_BACKEND)
+        default_route = [spec["name"] for spec in specs]
+        default_summary_route = default_route
+    else:
+        specs = [{"name": "primary", "provider": settings.LLM_BACKEND, "model": settings.MODEL}]
+        default_route = ["primary"]
+        default_summary_route = ["primary"]
+        if settings.SUMMARY_MODEL:
+            specs.append({"name": "summary", "provider": settings.LLM_BACKEND, "model": settings.SUMMARY_MODEL})
+            default_summary_route = ["summary", "primary"]
+    
+    def route(value: str, default: List[str]) -> List[str]:
+        return [name.strip() for name in value.split(",") if name.strip()] if value else default
+    
+    routes = {
+        "chat": route(settings.LLM_CHAT_ROUTE, default_route),
+        "summary": route(settings.LLM_SUMMARY_ROUTE, default_summary_route)
+    }
+    return specs, routes
+
+
+# Static prompts, built and hashed once; the version changes whenever the text does
+SYSTEM_PREFIX = build_prefix("system", SYSTEM_PROMPT)
+SUMMARY_PREFIX = build_prefix("summary", SUMMARY_PROMPT)
+logger.info(
+    f"Prompt versions: {SYSTEM_PREFIX.version} (~{SYSTEM_PREFIX.tokens} tokens), "
+    f"{SUMMARY_PREFIX.version} (~{SUMMARY_PREFIX.tokens} tokens)"
+)
 
 class GroqService:
-    def __init__(self):
-        self.model_name = settings.MODEL
-        self.client = client
-        
-        if not self.client:
+    """
+    One LLM backend: a client, a model, its concurrency cap, rolling stats and
+    outbound throttling (RPM/TPM token buckets, retry policy, circuit breaker).
+    
+    Pass `client_factory` instead of `client` to create the client on first use
+    (or in warm_llm_clients), which keeps the SDK client setup out of module import.
+    """
+    
+    def __init__(self, client, model_name: str, name: str = "primary",
+                 max_concurrency: Optional[int] = None,
+                 rpm_limit: Optional[float] = None, tpm_limit: Optional[float] = None,
+                 client_factory=None):
+        self.name = name
+        self.model_name = model_name
+        self._client = client
+        self._client_factory = client_factory
+        
+        if not client and not client_factory:
             raise RuntimeError("Groq client is not initialized")
         
         if not self.model_name:
             raise ValueError("MODEL is not configured")
         
-        logger.info(f"GroqService initialized with model: {self.model_name}")
+        # Caps the number of completions in flight to this backend from this worker process
+        self.semaphore = asyncio.Semaphore(max_concurrency or settings.LLM_MAX_CONCURRENCY)
+        self.stats = BackendStats(window=settings.LLM_STATS_WINDOW)
+        
+        rpm_limit = settings.LLM_RPM_LIMIT if rpm_limit is None else rpm_limit
+        tpm_limit = settings.LLM_TPM_LIMIT if tpm_limit is None else tpm_limit
+        self.rpm = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self.tpm = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self.retry_policy = RetryPolicy(
+            max_retries=settings.LLM_MAX_RETRIES,
+            base_delay=settings.LLM_RETRY_BASE_DELAY,
+            max_delay=settings.LLM_RETRY_MAX_DELAY
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.LLM_BREAKER_FAILURES,
+            cooldown=settings.LLM_BREAKER_COOLDOWN
+        )
+        # Set from a Retry-After header; no new attempts start before this monotonic time
+        self.paused_until = 0.0
+        
+        logger.info(f"GroqService {self.name} initialized with model: {self.model_name}")
 
-    async def generate_response(self, messages: List[dict], user_id: str) -> str:
-        try:
-            if not messages:
-                raise ValueError("Messages list cannot be empty")
-            
-            # system prompt add 
-            formatted_messages = [
-                {
-                    "role": "system",
-                    "content": SYSTEM_PROMPT
-                }
-            ]
-            
-            # User messages add
-            for msg in messages:
-                if not isinstance(msg, dict) or "role" not in msg or "content" not in msg:
-                    raise ValueError("Invalid message format")
-                formatted_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-
-            # Groq API call
-            logger.info(f"Calling Groq API with {len(formatted_messages)} messages for user {user_id}")
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=formatted_messages,
-                temperature=settings.TEMPERATURE,
-                max_tokens=settings.MAX_TOKENS
+    async def _admit(self, prompt_tokens: int):
+        """
+        Wait until an attempt may be sent: circuit closed (or half-open trial),
+        Retry-After pause over, RPM and TPM budget available.
+        
+        Raises:
+            LLMUnavailableError: Circuit open, or the pause is longer than LLM_RETRY_MAX_DELAY
+        """
+        if not self.breaker.allow():
+            raise LLMUnavailableError(
+                f"Circuit open for LLM backend {self.name}", retry_after=self.breaker.retry_after()
             )
+        LLM_CIRCUIT_OPEN.set(0, backend=self.name)
+        
+        waited = 0.0
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            if pause > self.retry_policy.max_delay:
+                raise LLMUnavailableError(f"LLM backend {self.name} is rate limited", retry_after=pause)
+            await asyncio.sleep(pause)
+            waited += pause
+        if self.rpm:
+            waited += await self.rpm.acquire(1)
+        if self.tpm:
+            waited += await self.tpm.acquire(prompt_tokens)
+        if waited:
+            LLM_THROTTLE_SECONDS.inc(waited, backend=self.name)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Record a failed attempt and return how long to wait before the next one.
+        
+        Raises:
+            The original error when it is not retryable, LLMUnavailableError when
+            retries are exhausted or the provider asks to wait too long
+        """
+        if isinstance(error, LLMUnavailableError):
+            raise error
+        if not is_retryable(error):
+            # The backend answered (e.g. 400/401), so it is up; this also ends a half-open trial
+            self.breaker.record_success()
+            raise error
+        
+        self.breaker.record_failure()
+        if self.breaker.state == "open":
+            LLM_CIRCUIT_OPEN.set(1, backend=self.name)
+            logger.warning(f"Circuit opened for LLM backend {self.name} after {self.breaker.failures} failures")
+        
+        retry_after = retry_after_seconds(error)
+        if retry_after:
+            # Pause every request to this backend, not just this one
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            if self.rpm:
+                self.rpm.pause(retry_after)
+        
+        delay = self.retry_policy.delay(attempt + 1, retry_after)
+        if delay is None or self.breaker.state == "open":
+            raise LLMUnavailableError(
+                f"LLM backend {self.name} unavailable: {str(error)}",
+                retry_after=retry_after if retry_after else self.breaker.retry_after() or None
+            ) from error
+        
+        reason = str(getattr(error, "status_code", None) or type(error).__name__)
+        LLM_RETRIES.inc(backend=self.name, reason=reason)
+        logger.warning(f"Retrying LLM backend {self.name} in {delay:.2f}s after {reason}: {str(error)}")
+        return delay
+
+    def _charge_completion(self, usage):
+        """Charge completion tokens to the TPM bucket once the provider reports them"""
+        if self.tpm and usage is not None:
+            self.tpm.debit(getattr(usage, "completion_tokens", 0) or 0)
+
+    async def _complete_once(self, messages: List[dict], temperature: Optional[float],
+                             max_tokens: Optional[int]):
+        async with self.semaphore:
+            start = time.perf_counter()
+            LLM_IN_FLIGHT.inc()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=settings.TEMPERATURE if temperature is None else temperature,
+                    max_tokens=settings.MAX_TOKENS if max_tokens is None else max_tokens
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                LLM_REQUESTS.inc(backend=self.name, outcome="error")
+                self.stats.record(time.perf_counter() - start, ok=False)
+                raise
+            finally:
+                LLM_IN_FLIGHT.dec()
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_total")
+        
+        LLM_REQUESTS.inc(backend=self.name, outcome="ok")
+        self.stats.record(time.perf_counter() - start, ok=True)
+        usage = getattr(response, "usage", None)
+        record_usage(usage)
+        self._charge_completion(usage)
+        return response
+
+    @property
+    def client(self):
+        """The completion client, created on first use when built from a factory"""
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    async def create_completion(
+        self,
+        messages: List[dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Run a single chat completion on the async client.
+        
+        Waits for a free slot when LLM_MAX_CONCURRENCY completions are already in flight,
+        and for RPM/TPM budget. 429, 5xx and timeouts are retried with backoff.
+        
+        Returns:
+            The stripped completion text
             
-            if not response.choices or not response.choices[0].message:
-                raise ValueError("Empty response from Groq API")
-            
-            return response.choices[0].message.content.strip()
+        Raises:
+            LLMUnavailableError: Rate limited or failing after retries, or circuit open
+        """
+        prompt_tokens = sum(count_message_tokens(msg) for msg in messages)
+        attempt = 0
+        while True:
+            await self._admit(prompt_tokens)
+            try:
+                response = await self._complete_once(messages, temperature, max_tokens)
+                break
+            except asyncio.CancelledError:
+                # e.g. the losing request of a hedge: no outcome to record
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+        self.breaker.record_success()
         
-        except ValueError as e:
-            logger.warning(f"Validation error for user {user_id}: {str(e)}")
-            raise
-        except Exception as e:
-            logger.error(f"Error generating response for user {user_id}: {str(e)}")
-            raise
+        if not response.choices or not response.choices[0].message:
+            raise ValueError("Empty response from Groq API")
+        
+        return response.choices[0].message.content.strip()
+
+    async def _stream_once(self, messages: List[dict], temperature: Optional[float],
+                           max_tokens: Optional[int]) -> AsyncIterator[str]:
+        async with self.semaphore:
+            start = time.perf_counter()
+            first_token = True
+            outcome = "error"
+            LLM_IN_FLIGHT.inc()
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=settings.TEMPERATURE if temperature is None else temperature,
+                    max_tokens=settings.MAX_TOKENS if max_tokens is None else max_tokens,
+                    stream=True
+                )
+                try:
+                    async for chunk in stream:
+                        # Groq reports usage on the last chunk (x_groq.usage)
+                        x_groq = getattr(chunk, "x_groq", None)
+                        usage = getattr(chunk, "usage", None) or getattr(x_groq, "usage", None)
+                        record_usage(usage)
+                        self._charge_completion(usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if first_token:
+                                STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_ttft")
+                                first_token = False
+                            yield delta
+                    outcome = "ok"
+                finally:
+                    await stream.close()
+            except Exception:
+                self.stats.record(time.perf_counter() - start, ok=False)
+                raise
+            finally:
+                LLM_IN_FLIGHT.dec()
+                LLM_REQUESTS.inc(backend=self.name, outcome=outcome)
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_total")
+            self.stats.record(time.perf_counter() - start, ok=True)
 
-# Singleton instance
+    async def stream_completion(
+        self,
+        messages: List[dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of create_completion.
+        
+        The concurrency slot is held until the stream is exhausted or closed.
+        Failed attempts are retried only before the first token has been yielded.
+        
+        Yields:
+            Text fragments as they arrive
+        """
+        prompt_tokens = sum(count_message_tokens(msg) for msg in messages)
+        attempt = 0
+        while True:
+            await self._admit(prompt_tokens)
+            started = False
+            try:
+                async for delta in self._stream_once(messages, temperature, max_tokens):
+                    started = True
+                    yield delta
+                break
+            except (asyncio.CancelledError, GeneratorExit):
+                # Caller went away: tokens already arrived means the backend is up
+                if started:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if started:
+                    self.breaker.record_failure()
+                    raise
+                delay = self._retry_delay(e, attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+        self.breaker.record_success()
+
+
+# Router over all configured backends
 try:
-    groq_service = GroqService()
-    logger.info("GroqService singleton created")
+    specs, routes = backend_specs()
+    backends = {}
+    for spec in specs:
+        try:
+            # Fail fast on a missing key; the client itself is created lazily
+            backend_api_key(spec)
+            backends[spec["name"]] = GroqService(
+                None, spec.get("model", settings.MODEL),
+                name=spec["name"], max_concurrency=spec.get("max_concurrency"),
+                rpm_limit=spec.get("rpm"), tpm_limit=spec.get("tpm"),
+                client_factory=functools.partial(make_client, spec)
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize LLM backend {spec.get('name')}: {str(e)}")
+    llm_router = LLMRouter(
+        backends, routes,
+        policy=settings.LLM_ROUTING_POLICY,
+        error_threshold=settings.LLM_ERROR_THRESHOLD,
+        hedge=settings.LLM_HEDGE_ENABLED,
+        hedge_quantile=settings.LLM_HEDGE_QUANTILE,
+        hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY
+    )
+    logger.info(f"LLM router created with routes {llm_router.routes}")
 except Exception as e:
-    logger.error(f"Failed to create GroqService: {str(e)}")
-    groq_service = None
+    logger.error(f"Failed to create LLM router: {str(e)}")
+    llm_router = None
+
+def warm_llm_clients():
+    """Create the LLM clients now instead of on the first request (called after startup)"""
+    if not llm_router:
+        return
+    for backend in llm_router.backends.values():
+        try:
+            backend.client  # the property creates it
+        except Exception as e:
+            logger.error(f"Failed to create client for LLM backend {backend.name}: {str(e)}")
+
+# Fair share of LLM capacity across users for chat completions (summaries have their own worker cap)
+llm_scheduler = FairScheduler(
+    slots=settings.ADMISSION_LLM_SLOTS,
+    weights=json.loads(settings.ADMISSION_USER_WEIGHTS) if settings.ADMISSION_USER_WEIGHTS else None,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT
+)
 
 async def generate_gemini_response(messages: List[dict], user_id: str) -> str:
-    if not groq_service:
-        raise RuntimeError("GroqService is not available")
-    return await groq_service.generate_response(messages, user_id)
+    if not llm_router:
+        raise RuntimeError("LLM router is not available")
+    
+    try:
+        if not messages:
+            raise ValueError("Messages list cannot be empty")
+        
+        # System prompt + as many of the client messages as fit the token budget
+        with STAGE_SECONDS.time(stage="prompt_assembly"):
+            formatted_messages, prompt_stats = assemble_prompt(SYSTEM_PREFIX, messages)
+
+        # Groq API call
+        logger.info(
+            f"Calling Groq API with {len(formatted_messages)} messages "
+            f"(~{prompt_stats['prompt_tokens']} tokens) for user {user_id}"
+        )
+        async with llm_scheduler.slot(user_id):
+            return await llm_router.create_completion(formatted_messages)
+    
+    except ValueError as e:
+        logger.warning(f"Validation error for user {user_id}: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error generating response for user {user_id}: {str(e)}")
+        raise
 
 async def get_thread_messages(thread_id: str, user_id: str, limit: int = 10) -> List[Dict]:
     """
@@ -110,16 +493,16 @@ async def get_thread_messages(thread_id: str, user_id: str, limit: int = 10) ->
         ]
     """
     try:
-        from app.database import db_client
+        from app.storage.factory import storage as db_client
         
         if not db_client or not db_client.is_connected():
             raise RuntimeError(
                 "Database client not available. "
-                "Please ensure MongoDB is running and configured."
+                "Please ensure the storage backend is running and configured."
             )
         
         # Fetch messages from database
-        messages = db_client.get_thread_messages(thread_id, user_id, limit=limit)
+        messages = await db_client.get_thread_messages(thread_id, user_id, limit=limit)
         
         if not messages:
             logger.warning(f"No messages found in thread {thread_id} for user {user_id}")
@@ -133,28 +516,36 @@ async def get_thread_messages(thread_id: str, user_id: str, limit: int = 10) ->
         logger.error(f"Error fetching thread messages: {str(e)}")
         raise RuntimeError(f"Failed to fetch messages: {str(e)}")
 
-async def generate_summary(thread_id: str, user_id: str) -> str:
+async def generate_summary(thread_id: str, user_id: str, previous_summary: Optional[str] = None,
+                           messages: Optional[List[Dict]] = None) -> str:
     """
-    Generate a summary of the last 10 messages in a thread.
+    Generate a thread summary.
+    
+    For rolling summaries pass the stored summary and only the messages added since
+    it was written; the model folds them into one updated summary, so the cost
+    depends on the new messages rather than the thread length.
     
     Args:
         thread_id: ID of the thread
         user_id: ID of the user
+        previous_summary: Summary covering earlier messages, if any
+        messages: Messages to summarize; defaults to the last 10 messages in the thread
         
     Returns:
         Summary string
     """
-    if not groq_service:
-        raise RuntimeError("GroqService is not available")
+    if not llm_router:
+        raise RuntimeError("LLM router is not available")
     
     try:
-        # Fetch last 10 messages from thread via database
-        messages = await get_thread_messages(thread_id, user_id, limit=10)
+        if messages is None:
+            # Fetch last 10 messages from thread via database
+            messages = await get_thread_messages(thread_id, user_id, limit=10)
         
         if not messages:
             raise ValueError(f"No messages found in thread {thread_id}")
         
-        logger.info(f"Retrieved {len(messages)} messages from thread {thread_id}")
+        logger.info(f"Summarizing {len(messages)} messages from thread {thread_id}")
         
         # Prepare the conversation for summarization
         conversation_text = "\n".join([
@@ -162,19 +553,28 @@ async def generate_summary(thread_id: str, user_id: str) -> str:
             for msg in messages
         ])
         
-        # Create summary prompt with structured format
-        summary_prompt = f"""Please summarize the following conversation thread.
+        # Rules and output format live in the system message only; the user message
+        # carries just the dynamic part
+        if previous_summary:
+            summary_prompt = f"""Please update the summary of this conversation thread with the new messages.
+Keep earlier points that are still relevant and add what the new messages contribute.
 
-Conversation:
-{conversation_text}
+Previous summary:
+{previous_summary}
+
+New messages:
+{conversation_text}"""
+        else:
+            summary_prompt = f"""Please summarize the following conversation thread.
 
-{SUMMARY_PROMPT}"""
+Conversation:
+{conversation_text}"""
         
         # Prepare messages for API
         formatted_messages = [
             {
                 "role": "system",
-                "content": SUMMARY_PROMPT
+                "content": SUMMARY_PREFIX.content
             },
             {
                 "role": "user",
@@ -185,17 +585,12 @@ Conversation:
         logger.info(f"Generating summary for thread {thread_id}, user {user_id}")
         
         # Call Groq API for summary
-        response = groq_service.client.chat.completions.create(
-            model=groq_service.model_name,
-            messages=formatted_messages,
+        summary = await llm_router.create_completion(
+            formatted_messages,
+            purpose="summary",
             temperature=0.3,  # Lower temperature for more consistent summaries
             max_tokens=300
         )
-        
-        if not response.choices or not response.choices[0].message:
-            raise ValueError("Empty response from Groq API")
-        
-        summary = response.choices[0].message.content.strip()
         logger.info(f"Summary generated successfully for thread {thread_id}")
         
         return summary
@@ -210,7 +605,97 @@ Conversation:
         logger.error(f"Error generating summary for thread {thread_id}: {str(e)}")
         raise
 
-async def generate_context_aware_response(messages: List[dict], thread_id: str, user_id: str) -> str:
+# Answers to first-turn questions that depend on nothing but the question itself
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL,
+    semantic=settings.RESPONSE_CACHE_SEMANTIC,
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY
+) if settings.RESPONSE_CACHE_ENABLED else None
+
+
+def cacheable_question(messages: List[dict], context: Dict) -> Optional[str]:
+    """
+    Return the question text when the answer depends only on it: a single user
+    message in a thread with no stored summary or history. Otherwise None.
+    """
+    if response_cache is None or len(messages) != 1 or messages[0].get("role") != "user":
+        return None
+    if context.get("summary") or context.get("messages"):
+        return None
+    return messages[0].get("content") or None
+
+
+def chat_backends_fingerprint() -> List[str]:
+    """Provider, model and endpoint of every backend on the chat route, in route order"""
+    if not llm_router:
+        return []
+    specs_by_name = {spec["name"]: spec for spec in specs}
+    return [
+        f"{name}:{specs_by_name[name]['provider']}:{llm_router.backends[name].model_name}:"
+        f"{specs_by_name[name].get('base_url') or ''}"
+        for name in llm_router.routes["chat"]
+    ]
+
+
+def response_fingerprint() -> str:
+    """Everything besides the question that shapes a cached answer"""
+    return prompt_fingerprint(
+        SYSTEM_PREFIX.version, *chat_backends_fingerprint(), str(settings.TEMPERATURE), str(settings.MAX_TOKENS)
+    )
+
+
+async def load_context(thread_id: str, user_id: str) -> Dict:
+    """Fetch summary and recent messages for a thread in one query"""
+    from app.storage.factory import storage as db_client
+    
+    if not db_client or not db_client.is_connected():
+        raise RuntimeError(
+            "Database client not available. "
+            "Please ensure the storage backend is running and configured."
+        )
+    return await db_client.load_thread_context(thread_id, user_id, limit=20)
+
+
+async def build_context_messages(messages: List[dict], thread_id: str, user_id: str,
+                                 context: Optional[Dict] = None) -> List[dict]:
+    """
+    Build the message list for a context-aware completion.
+    Packs the system prompt, thread summary (if exists) and whole recent messages
+    into the prompt token budget (see prompt_builder.assemble_prompt).
+    
+    Args:
+        messages: List of messages (dict with 'role' and 'content')
+        thread_id: ID of the thread
+        user_id: ID of the user
+        context: Pre-loaded result of load_thread_context; loaded here when omitted
+        
+    Returns:
+        Formatted messages ready for the Groq API
+    """
+    if not messages:
+        raise ValueError("Messages list cannot be empty")
+    
+    if context is None:
+        context = await load_context(thread_id, user_id)
+    
+    with STAGE_SECONDS.time(stage="prompt_assembly"):
+        formatted_messages, prompt_stats = assemble_prompt(
+            SYSTEM_PREFIX,
+            messages,
+            summary=context.get("summary"),
+            history=context.get("messages", [])
+        )
+    
+    logger.info(
+        f"Prompt for thread {thread_id}: ~{prompt_stats['prompt_tokens']}/{prompt_stats['budget']} tokens, "
+        f"{prompt_stats['messages_included']} messages included, {prompt_stats['messages_dropped']} dropped"
+    )
+    
+    return formatted_messages
+
+async def generate_context_aware_response(messages: List[dict], thread_id: str, user_id: str,
+                                          context: Optional[Dict] = None) -> str:
     """
     Generate a response with thread context awareness.
     Reads previous thread summary (if exists) and uses it as context.
@@ -219,79 +704,83 @@ async def generate_context_aware_response(messages: List[dict], thread_id: str,
         messages: List of messages (dict with 'role' and 'content')
         thread_id: ID of the thread
         user_id: ID of the user
+        context: Pre-loaded result of load_thread_context (optional)
         
     Returns:
         Context-aware response string
     """
-    if not groq_service:
-        raise RuntimeError("GroqService is not available")
+    if not llm_router:
+        raise RuntimeError("LLM router is not available")
     
     try:
-        if not messages:
-            raise ValueError("Messages list cannot be empty")
-        
-        # Fetch thread summary from database for context
-        from app.database import db_client
+        if context is None:
+            context = await load_context(thread_id, user_id)
         
-        context_parts = []
+        question = cacheable_question(messages, context)
+        if question:
+            cached, match = response_cache.get(question, response_fingerprint())
+            RESPONSE_CACHE_LOOKUPS.inc(result=match)
+            if cached is not None:
+                logger.info(f"Response cache {match} hit for thread {thread_id}, user {user_id}")
+                return cached
         
-        if db_client and db_client.is_connected():
-            # Get thread summary if exists
-            thread_summary = db_client.get_thread_summary(thread_id)
-            if thread_summary:
-                logger.info(f"Using stored summary for thread {thread_id}")
-                context_parts.append(f"[SUMMARY: {thread_summary}]")
-        
-        # Also fetch recent messages for context - ALWAYS include them
-        thread_history = await get_thread_messages(thread_id, user_id, limit=20)
-        
-        if thread_history and len(thread_history) > 0:
-            logger.info(f"Found {len(thread_history)} previous messages for context")
-            # Include more messages for better context
-            recent_msgs = " | ".join([
-                f"{msg.get('role', 'user')[0].upper()}:{msg.get('content', '')[:40]}"
-                for msg in thread_history[-10:]  # Last 10 messages
-            ])
-            context_parts.append(f"[HISTORY: {recent_msgs}]")
-        
-        # Combine all context
-        context_text = " ".join(context_parts) if context_parts else ""
-        
-        # Prepare messages with context
-        formatted_messages = [
-            {
-                "role": "system",
-                "content": SYSTEM_PROMPT + (f"\n\nThread Context:\n{context_text}" if context_text else "")
-            }
-        ]
-        
-        # Add all messages
-        for msg in messages:
-            if not isinstance(msg, dict) or "role" not in msg or "content" not in msg:
-                raise ValueError("Invalid message format")
-            formatted_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        formatted_messages = await build_context_messages(messages, thread_id, user_id, context)
         
         logger.info(f"Calling Groq API with context for thread {thread_id}, user {user_id}")
         
         # Call Groq API
-        response = groq_service.client.chat.completions.create(
-            model=groq_service.model_name,
-            messages=formatted_messages,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS
-        )
-        
-        if not response.choices or not response.choices[0].message:
-            raise ValueError("Empty response from Groq API")
-        
-        return response.choices[0].message.content.strip()
+        async with llm_scheduler.slot(user_id):
+            response_text = await llm_router.create_completion(formatted_messages)
+        if question:
+            response_cache.put(question, response_text, response_fingerprint())
+        return response_text
         
     except ValueError as e:
         logger.warning(f"Validation error for thread {thread_id}: {str(e)}")
         raise
     except Exception as e:
         logger.error(f"Error generating context-aware response: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+async def stream_context_aware_response(messages: List[dict], thread_id: str, user_id: str,
+                                        context: Optional[Dict] = None) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_context_aware_response.
+    
+    Yields:
+        Response text fragments as they arrive from Groq
+    """
+    if not llm_router:
+        raise RuntimeError("LLM router is not available")
+    
+    try:
+        if context is None:
+            context = await load_context(thread_id, user_id)
+        
+        question = cacheable_question(messages, context)
+        if question:
+            cached, match = response_cache.get(question, response_fingerprint())
+            RESPONSE_CACHE_LOOKUPS.inc(result=match)
+            if cached is not None:
+                logger.info(f"Response cache {match} hit for thread {thread_id}, user {user_id}")
+                yield cached
+                return
+        
+        formatted_messages = await build_context_messages(messages, thread_id, user_id, context)
+        
+        logger.info(f"Streaming Groq API response with context for thread {thread_id}, user {user_id}")
+        
+        parts = []
+        async with llm_scheduler.slot(user_id):
+            async for token in llm_router.stream_completion(formatted_messages):
+                parts.append(token)
+                yield token
+        if question:
+            response_cache.put(question, "".join(parts).strip(), response_fingerprint())
+        
+    except ValueError as e:
+        logger.warning(f"Validation error for thread {thread_id}: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming context-aware response: {str(e)}")
+        raise
@@ -0,0 +1,133 @@
+"""
+Deterministic local stand-in for the Groq client, selected with LLM_BACKEND=fake.
+
+FakeLLMClient exposes the part of AsyncGroq that GroqService uses
+(`client.chat.completions.create(..., stream=False|True)`) and returns objects
+shaped like Groq responses, including `usage` / `x_groq.usage`. GroqService runs
+unchanged on top of it, so the concurrency cap, metrics and prompt assembly are
+exercised exactly as in production while no network call is made.
+
+Timing model: FAKE_LLM_LATENCY seconds to the first token, then
+FAKE_LLM_TOKENS_PER_SECOND. Replies are derived from the last message, so the
+same prompt always produces the same text. FAKE_LLM_ERROR_RATE of the calls
+raise FakeLLMError (seeded, so a run is reproducible); it carries status 503 so
+the retry policy and circuit breaker treat it like a provider outage.
+"""
+from app.LLM_Service.prompt_builder import count_message_tokens
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import asyncio
+import random
+import zlib
+
+_VOCABULARY = (
+    "open the app and go to your wallet then tap send money choose a contact "
+    "enter the amount confirm with your PIN the transfer usually completes within "
+    "a few seconds if it fails check your balance and network connection"
+).split()
+
+
+class FakeLLMError(RuntimeError):
+    """Injected completion failure, shaped like a 503 from the provider"""
+
+    status_code = 503
+
+
+def fake_reply(messages: List[Dict], max_tokens: int, reply_tokens: int) -> List[str]:
+    """Deterministic reply for `messages`, one word (~one token) per list item"""
+    seed = zlib.crc32(messages[-1].get("content", "").encode("utf-8")) if messages else 0
+    rng = random.Random(seed)
+    count = max(1, min(reply_tokens, max_tokens))
+    return [rng.choice(_VOCABULARY) + " " for _ in range(count)]
+
+
+class _FakeStream:
+    """Async iterator of chunks shaped like Groq ChatCompletionChunk"""
+
+    def __init__(self, words: List[str], usage, first_token_latency: float, token_interval: float):
+        self._words = words
+        self._usage = usage
+        self._first_token_latency = first_token_latency
+        self._token_interval = token_interval
+        self._closed = False
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._first_token_latency)
+        for index, word in enumerate(self._words):
+            if self._closed:
+                return
+            if index:
+                await asyncio.sleep(self._token_interval)
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=word), finish_reason=None)],
+                usage=None,
+                x_groq=None
+            )
+        # Groq sends usage on a final chunk with no content
+        yield SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason="stop")],
+            usage=None,
+            x_groq=SimpleNamespace(usage=self._usage)
+        )
+
+    async def close(self):
+        self._closed = True
+
+
+class _FakeCompletions:
+    def __init__(self, owner: "FakeLLMClient"):
+        self._owner = owner
+
+    async def create(self, model: str, messages: List[Dict], temperature: Optional[float] = None,
+                     max_tokens: Optional[int] = None, stream: bool = False, **kwargs):
+        owner = self._owner
+        owner.calls += 1
+        if owner.error_rate and owner._rng.random() < owner.error_rate:
+            owner.errors += 1
+            await asyncio.sleep(owner.latency)
+            raise FakeLLMError("Injected fake LLM failure")
+
+        words = fake_reply(messages, max_tokens or owner.reply_tokens, owner.reply_tokens)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(count_message_tokens(msg) for msg in messages),
+            completion_tokens=len(words)
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+        interval = 1.0 / owner.tokens_per_second if owner.tokens_per_second > 0 else 0.0
+
+        if stream:
+            return _FakeStream(words, usage, owner.latency, interval)
+
+        await asyncio.sleep(owner.latency + interval * (len(words) - 1))
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(
+                message=SimpleNamespace(role="assistant", content="".join(words)),
+                finish_reason="stop"
+            )],
+            usage=usage
+        )
+
+
+class FakeLLMClient:
+    """
+    Drop-in for AsyncGroq in GroqService.
+
+    Args:
+        latency: Seconds until the first token
+        tokens_per_second: Generation speed after the first token (0 = instant)
+        reply_tokens: Reply length, capped by max_tokens
+        error_rate: Fraction of calls that raise FakeLLMError
+        seed: Seed for error injection
+    """
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 200,
+                 reply_tokens: int = 60, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
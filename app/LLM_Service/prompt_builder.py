@@ -0,0 +1,179 @@
+from config import settings
+from functools import lru_cache
+from typing import List, Dict, NamedTuple, Optional, Tuple, Union
+import hashlib
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+# Chat-template tokens added around every message (role header + end-of-turn)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Words, numbers and single punctuation marks, roughly how BPE tokenizers split text
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    Approximate the Llama 3 token count of `text` without a model tokenizer.
+
+    English words cost one token per ~6 letters, digits are grouped by three and
+    each punctuation mark is one token. Non-Latin scripts (Bengali, Arabic, ...)
+    tokenize much less efficiently, so each such character counts as half a token.
+    Tends to overestimate slightly, which keeps packed prompts under budget.
+    Results are memoized: the system prompt and recent history repeat every turn.
+    """
+    if not text:
+        return 0
+
+    tokens = 0
+    non_latin = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece.isascii():
+            tokens += (1 + (len(piece) - 1) // 6) if piece.isalpha() else 1
+        else:
+            non_latin += 1
+    return tokens + math.ceil(non_latin / 2)
+
+
+def count_message_tokens(message: Dict) -> int:
+    """Approximate tokens one chat message occupies in the prompt"""
+    return MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content", ""))
+
+
+class PromptPrefix(NamedTuple):
+    """Static prompt text built once, with a content-hash version and its token cost"""
+    name: str
+    content: str
+    version: str
+    tokens: int
+
+
+@lru_cache(maxsize=16)
+def build_prefix(name: str, content: str) -> PromptPrefix:
+    """
+    Wrap a static prompt as a PromptPrefix.
+
+    The version is a hash of the content, so any edit to the prompt text yields a
+    new version (used in logs, /health and cache keys).
+    """
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+    return PromptPrefix(
+        name=name,
+        content=content,
+        version=f"{name}-{digest}",
+        tokens=count_message_tokens({"content": content})
+    )
+
+
+def summary_message(summary: str) -> Dict:
+    """Thread summary as its own system message after the static prefix"""
+    return {"role": "system", "content": f"Thread Context:\n[SUMMARY: {summary}]"}
+
+
+def prompt_token_budget() -> int:
+    """Prompt budget: the configured cap, never more than the context window minus the reply"""
+    return min(settings.PROMPT_TOKEN_BUDGET, settings.MODEL_CONTEXT_WINDOW - settings.MAX_TOKENS)
+
+
+def _drop_overlap(history: List[Dict], messages: List[Dict]) -> List[Dict]:
+    """
+    Remove the tail of `history` that the client re-sent within `messages`.
+
+    Clients may send only the new user message, the last few turns or the whole
+    conversation (which goes back further than the stored history window); either
+    way each stored message should appear in the prompt once. The longest tail of
+    `history` found as a contiguous run anywhere in `messages` is dropped.
+    """
+    stored = [(msg.get("role"), msg.get("content")) for msg in history]
+    sent = [(msg.get("role"), msg.get("content")) for msg in messages]
+    for overlap in range(min(len(stored), len(sent)), 0, -1):
+        tail = stored[-overlap:]
+        if any(
+            sent[start] == tail[0] and sent[start:start + overlap] == tail
+            for start in range(len(sent) - overlap + 1)
+        ):
+            return history[:-overlap]
+    return history
+
+
+def assemble_prompt(
+    system_prompt: Union[str, PromptPrefix],
+    messages: List[Dict],
+    summary: Optional[str] = None,
+    history: Optional[List[Dict]] = None,
+    budget: Optional[int] = None
+) -> Tuple[List[Dict], Dict]:
+    """
+    Pack a prompt into a token budget.
+
+    Always includes the system prompt and the latest client message. Then adds the
+    thread summary if it fits, then as many whole previous messages as fit, newest
+    first. Older messages are dropped entirely rather than truncated.
+
+    The system prompt is always the first message, unchanged; the summary goes in a
+    separate system message after it. Every request therefore starts with the same
+    prefix, which provider-side prompt caching can reuse.
+
+    Args:
+        system_prompt: Static system prompt (a PromptPrefix or plain text)
+        messages: Client-supplied messages, the last one is the current turn
+        summary: Stored thread summary, if any
+        history: Stored thread messages in chronological order
+        budget: Max prompt tokens (defaults to prompt_token_budget())
+
+    Returns:
+        (formatted_messages, stats) where stats has 'prompt_tokens', 'static_tokens',
+        'prefix_version', 'budget', 'messages_included' and 'messages_dropped'
+    """
+    if not messages:
+        raise ValueError("Messages list cannot be empty")
+
+    for msg in messages:
+        if not isinstance(msg, dict) or "role" not in msg or "content" not in msg:
+            raise ValueError("Invalid message format")
+
+    budget = prompt_token_budget() if budget is None else budget
+
+    # Earlier turns: stored history (minus anything re-sent) followed by earlier client messages
+    conversation = [
+        {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+        for msg in _drop_overlap(history or [], messages) + messages[:-1]
+    ]
+    current = {"role": messages[-1]["role"], "content": messages[-1]["content"]}
+
+    prefix = system_prompt if isinstance(system_prompt, PromptPrefix) else build_prefix("system", system_prompt)
+    used = prefix.tokens + count_message_tokens(current)
+    if used > budget:
+        logger.warning(f"System prompt and current message use {used} tokens, over the {budget} token budget")
+
+    context_messages = []
+    if summary:
+        summary_msg = summary_message(summary)
+        summary_tokens = count_message_tokens(summary_msg)
+        if used + summary_tokens <= budget:
+            context_messages.append(summary_msg)
+            used += summary_tokens
+
+    included = []
+    for msg in reversed(conversation):
+        cost = count_message_tokens(msg)
+        if used + cost > budget:
+            break
+        included.append(msg)
+        used += cost
+    included.reverse()
+
+    formatted_messages = [{"role": "system", "content": prefix.content}] + context_messages + included + [current]
+    stats = {
+        "prompt_tokens": used,
+        "static_tokens": prefix.tokens,
+        "prefix_version": prefix.version,
+        "budget": budget,
+        "messages_included": len(included) + 1,
+        "messages_dropped": len(conversation) - len(included)
+    }
+    return formatted_messages, stats
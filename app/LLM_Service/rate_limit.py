@@ -0,0 +1,169 @@
+"""
+Outbound traffic shaping for LLM backends: token buckets for requests and
+tokens per minute, a retry policy with jittered exponential backoff that honours
+Retry-After, and a circuit breaker.
+"""
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import random
+import time
+
+import groq
+
+
+class LLMUnavailableError(RuntimeError):
+    """The backend is throttled or failing; retry_after is a hint in seconds (may be None)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute up to `capacity` (default: one minute's worth).
+
+    Waiters are served in arrival order. The balance may go negative through
+    debit() or pause(), which delays the following acquisitions accordingly.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Take `amount` units, waiting for them if needed; returns seconds waited"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            wait = (amount - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+            self._refill()
+            self.tokens -= amount
+            return wait
+
+    def debit(self, amount: float):
+        """Charge units after the fact (e.g. completion tokens once usage is known)"""
+        self._refill()
+        self.tokens -= amount
+
+    def pause(self, seconds: float):
+        """Empty the bucket so no units are available for `seconds`"""
+        self._refill()
+        self.tokens = min(self.tokens, -self.rate * seconds)
+
+
+class RetryPolicy:
+    """Full-jitter exponential backoff; a Retry-After hint replaces the computed delay"""
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 20.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to wait before retry number `attempt` (1-based).
+
+        Returns:
+            The delay, or None to give up (retries exhausted, or the provider asks
+            to wait longer than max_delay - better to fail over than to hold the request)
+        """
+        if attempt > self.max_retries:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `cooldown` seconds. After the cooldown one trial call is let through
+    (half-open): success closes the circuit, failure re-opens it, and a trial
+    that ends without an outcome (cancelled) is released with release_trial()
+    so the next call becomes the trial.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def is_open(self) -> bool:
+        return self.state != "closed" and time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.cooldown:
+            # One trial per cooldown period
+            self.state = "half_open"
+            self.opened_at = now
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        if self.state == "half_open":
+            self.state = "open"
+            self.opened_at = time.monotonic() - self.cooldown
+
+
+def is_retryable(error: Exception) -> bool:
+    """Connection errors, timeouts, 408/409/429 and 5xx are worth retrying; other 4xx are not"""
+    if isinstance(error, (groq.APIConnectionError, LLMUnavailableError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After hint of an API error (retry-after-ms, retry-after seconds or HTTP date)"""
+    hint = getattr(error, "retry_after", None)
+    if hint is not None:
+        return float(hint)
+
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,192 @@
+from app.metrics.chat_metrics import LLM_FAILOVERS, LLM_HEDGES
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BackendStats:
+    """
+    Rolling latency and error rate of one LLM backend over its last `window` calls.
+
+    Only completed calls are recorded; requests cancelled because a hedge won
+    count as neither latency nor error.
+    """
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def record(self, seconds: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(seconds)
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict:
+        return {
+            "samples": len(self.outcomes),
+            "error_rate": self.error_rate(),
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95)
+        }
+
+
+class LLMRouter:
+    """
+    Routes completions over several backends (GroqService instances).
+
+    Each purpose ('chat', 'summary') has an ordered list of backend names. A call
+    goes to the first healthy backend; backends whose rolling error rate is at or
+    above `error_threshold` (after `min_samples` calls) move to the back. With
+    policy 'latency', healthy backends are ordered by rolling p50 instead of the
+    configured order. A backend whose circuit breaker is open is unhealthy too.
+
+    Failover: a failed completion is retried on the next backend. Streams fail
+    over only until the first token has been sent.
+
+    Hedging (non-streaming only): when the first backend has not answered within
+    its rolling `hedge_quantile` latency, the same request is sent to the next
+    backend and the first answer wins; the slower request is cancelled.
+    """
+
+    def __init__(self, backends: Dict[str, object], routes: Dict[str, List[str]],
+                 policy: str = "priority", error_threshold: float = 0.5, min_samples: int = 10,
+                 hedge: bool = False, hedge_quantile: float = 0.95, hedge_min_delay: float = 0.5):
+        self.backends = backends
+        self.routes = {
+            purpose: [name for name in names if name in backends]
+            for purpose, names in routes.items()
+        }
+        self.policy = policy
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+
+        for purpose, names in self.routes.items():
+            if not names:
+                raise ValueError(f"No LLM backends configured for '{purpose}'")
+
+    def _healthy(self, backend) -> bool:
+        breaker = getattr(backend, "breaker", None)
+        if breaker is not None and breaker.is_open():
+            return False
+        stats = backend.stats
+        return len(stats.outcomes) < self.min_samples or stats.error_rate() < self.error_threshold
+
+    def candidates(self, purpose: str) -> List:
+        """Backends for `purpose` in the order they should be tried"""
+        names = self.routes.get(purpose) or self.routes["chat"]
+        backends = [self.backends[name] for name in names]
+        if self.policy == "latency":
+            backends.sort(key=lambda backend: backend.stats.quantile(0.5) or 0.0)
+        # Stable sort: healthy backends first, configured (or latency) order otherwise kept
+        backends.sort(key=lambda backend: not self._healthy(backend))
+        return backends
+
+    def _hedge_delay(self, backend) -> Optional[float]:
+        if not self.hedge or len(backend.stats.latencies) < self.min_samples:
+            return None
+        return max(self.hedge_min_delay, backend.stats.quantile(self.hedge_quantile))
+
+    async def create_completion(self, messages: List[dict], purpose: str = "chat",
+                                temperature: Optional[float] = None,
+                                max_tokens: Optional[int] = None) -> str:
+        """Run a completion with failover (and hedging, if enabled) across the route for `purpose`"""
+        candidates = self.candidates(purpose)
+        owners = {}
+        pending = set()
+        next_index = 0
+        hedged = False
+        last_error = None
+
+        def launch():
+            nonlocal next_index
+            backend = candidates[next_index]
+            next_index += 1
+            task = asyncio.create_task(backend.create_completion(messages, temperature, max_tokens))
+            owners[task] = backend
+            pending.add(task)
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if not hedged and len(pending) == 1 and next_index < len(candidates):
+                    timeout = self._hedge_delay(owners[next(iter(pending))])
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    LLM_HEDGES.inc(purpose=purpose)
+                    logger.info(
+                        f"Hedging {purpose} completion: {owners[next(iter(pending))].name} "
+                        f"slower than {timeout:.2f}s, also trying {candidates[next_index].name}"
+                    )
+                    launch()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"LLM backend {owners[task].name} failed for {purpose}: {str(last_error)}")
+
+                if not pending and next_index < len(candidates):
+                    LLM_FAILOVERS.inc(purpose=purpose)
+                    launch()
+
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream_completion(self, messages: List[dict], purpose: str = "chat",
+                                temperature: Optional[float] = None,
+                                max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream a completion, failing over to the next backend if one fails before its first token"""
+        candidates = self.candidates(purpose)
+        for index, backend in enumerate(candidates):
+            started = False
+            try:
+                async for delta in backend.stream_completion(messages, temperature, max_tokens):
+                    started = True
+                    yield delta
+                return
+            except Exception as e:
+                if started or index == len(candidates) - 1:
+                    raise
+                LLM_FAILOVERS.inc(purpose=purpose)
+                logger.warning(f"LLM backend {backend.name} failed before streaming for {purpose}: {str(e)}")
+
+    def stats(self) -> Dict:
+        """Routes and rolling per-backend latency / error rate"""
+        return {
+            "policy": self.policy,
+            "hedge": self.hedge,
+            "routes": self.routes,
+            "backends": {
+                name: {
+                    "model": backend.model_name,
+                    "healthy": self._healthy(backend),
+                    "circuit": backend.breaker.state,
+                    **backend.stats.snapshot()
+                }
+                for name, backend in self.backends.items()
+            }
+        }
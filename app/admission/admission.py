@@ -0,0 +1,194 @@
+"""
+Per-user admission control for the chat endpoints: a cap on concurrent requests
+and a requests-per-minute quota, rejected with 429 and a Retry-After hint.
+
+Request counts go through a QuotaStore. MemoryQuotaStore counts per worker
+process; MongoQuotaStore shares the counts between processes and hosts through
+MongoDB. Other shared backends (e.g. Redis INCR + EXPIRE) only need to implement
+QuotaStore.hit. Concurrent requests are always tracked per process.
+"""
+from app.metrics.chat_metrics import ADMISSION_REJECTIONS
+from pymongo import ReturnDocument
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Request not admitted; status_code is 429 (user over quota) or 503 (server busy)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None,
+                 reason: str = "rate", status_code: int = 429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+        self.status_code = status_code
+
+
+class QuotaStore:
+    """Fixed-window request counter; subclasses provide the storage"""
+
+    async def hit(self, key: str, window_seconds: float) -> Tuple[int, float]:
+        """
+        Count one request against `key` in the current window.
+
+        Returns:
+            (requests in the current window including this one, seconds until it resets)
+        """
+        raise NotImplementedError
+
+
+class MemoryQuotaStore(QuotaStore):
+    """Counters in this worker process; expired windows are pruned every `prune_every` hits"""
+
+    def __init__(self, prune_every: int = 1000):
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._prune_every = prune_every
+        self._hits = 0
+
+    async def hit(self, key: str, window_seconds: float) -> Tuple[int, float]:
+        now = time.time()
+        window_end = (int(now // window_seconds) + 1) * window_seconds
+        ends_at, count = self._windows.get(key, (0.0, 0))
+        count = count + 1 if ends_at == window_end else 1
+        self._windows[key] = (window_end, count)
+
+        self._hits += 1
+        if self._hits % self._prune_every == 0:
+            self._windows = {k: v for k, v in self._windows.items() if v[0] > now}
+        return count, window_end - now
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+
+class MongoQuotaStore(QuotaStore):
+    """
+    Counters shared by all workers in the `rate_limits` collection: one document
+    per key and window, removed by a TTL index once the window has passed.
+
+    Falls back to in-process counting while MongoDB is unavailable, so an outage
+    of the quota store does not take chat down with it.
+    """
+
+    COLLECTION = "rate_limits"
+
+    def __init__(self, db_client):
+        self.db_client = db_client
+        self.fallback = MemoryQuotaStore()
+        self._indexed = False
+
+    async def _collection(self):
+        collection = self.db_client.db[self.COLLECTION]
+        if not self._indexed:
+            await collection.create_index("expires_at", name="expires_at_ttl", expireAfterSeconds=0)
+            self._indexed = True
+        return collection
+
+    async def hit(self, key: str, window_seconds: float) -> Tuple[int, float]:
+        if not self.db_client or not self.db_client.is_connected():
+            return await self.fallback.hit(key, window_seconds)
+
+        now = time.time()
+        window = int(now // window_seconds)
+        window_end = (window + 1) * window_seconds
+        try:
+            collection = await self._collection()
+            doc = await collection.find_one_and_update(
+                {"_id": f"{key}:{window}"},
+                {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": datetime.utcfromtimestamp(window_end)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return doc["count"], window_end - now
+        except Exception as e:
+            logger.error(f"Error counting request for {key}, using in-process quota: {str(e)}")
+            return await self.fallback.hit(key, window_seconds)
+
+
+class Lease:
+    """An admitted request; release() is idempotent"""
+
+    def __init__(self, controller: "AdmissionController", user_id: str):
+        self.controller = controller
+        self.user_id = user_id
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self.user_id)
+
+
+class AdmissionController:
+    """
+    Admits a user's request when they have fewer than `max_concurrent` requests in
+    flight and have made at most `requests_per_minute` requests in the current
+    minute (0 disables either limit).
+    """
+
+    def __init__(self, store: QuotaStore, requests_per_minute: int = 60, max_concurrent: int = 4):
+        self.store = store
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrent = max_concurrent
+        self._in_flight: Dict[str, int] = {}
+
+        self.admitted = 0
+        self.rejected = {"concurrency": 0, "rate": 0}
+
+    def _reject(self, reason: str, message: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        return AdmissionRejected(message, retry_after=retry_after, reason=reason)
+
+    async def acquire(self, user_id: str) -> Lease:
+        """
+        Admit one request for `user_id`; call release() on the lease when it is done.
+
+        Raises:
+            AdmissionRejected: Concurrency or rate quota exceeded
+        """
+        in_flight = self._in_flight.get(user_id, 0)
+        if self.max_concurrent and in_flight >= self.max_concurrent:
+            raise self._reject(
+                "concurrency",
+                f"Too many concurrent requests ({self.max_concurrent} allowed)",
+                retry_after=1
+            )
+
+        # Count as in flight before awaiting the store so concurrent checks see it
+        self._in_flight[user_id] = in_flight + 1
+        lease = Lease(self, user_id)
+        if self.requests_per_minute:
+            count, reset_in = await self.store.hit(f"user:{user_id}", 60)
+            if count > self.requests_per_minute:
+                lease.release()
+                raise self._reject(
+                    "rate",
+                    f"Rate limit exceeded ({self.requests_per_minute} requests per minute)",
+                    retry_after=reset_in
+                )
+
+        self.admitted += 1
+        return lease
+
+    def _release(self, user_id: str):
+        remaining = self._in_flight.get(user_id, 0) - 1
+        if remaining > 0:
+            self._in_flight[user_id] = remaining
+        else:
+            self._in_flight.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            "store": type(self.store).__name__,
+            "requests_per_minute": self.requests_per_minute,
+            "max_concurrent": self.max_concurrent,
+            "users_in_flight": len(self._in_flight),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected)
+        }
@@ -0,0 +1,150 @@
+from app.admission.admission import AdmissionRejected
+from app.metrics.chat_metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_WAIT, ADMISSION_REJECTIONS
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class FairScheduler:
+    """
+    Fair queueing in front of the LLM calls.
+
+    At most `slots` calls run at once. While a slot is free a call starts right
+    away; once all are taken, callers wait in a queue per user and freed slots are
+    handed out weighted round-robin over the users with waiters: a user with weight
+    w gets up to w slots per turn (default 1), so one user with many queued
+    requests cannot delay everyone else by more than one turn.
+
+    A caller that waits longer than `queue_timeout` seconds gets AdmissionRejected (503).
+    """
+
+    def __init__(self, slots: int, weights: Optional[Dict[str, int]] = None, queue_timeout: float = 30.0):
+        self.slots = slots
+        self.weights = weights or {}
+        self.queue_timeout = queue_timeout
+
+        self.active = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        # Users with waiters, in service order; the head is served next
+        self._ring: Deque[str] = deque()
+        self._credit: Dict[str, int] = {}
+
+        self.granted = 0
+        self.queued = 0
+        self.timeouts = 0
+
+    def _waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _discard(self, user_id: str, future: asyncio.Future):
+        queue = self._queues.get(user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[user_id]
+            self._credit.pop(user_id, None)
+            self._ring.remove(user_id)
+
+    def _dispatch(self):
+        while self.active < self.slots and self._ring:
+            user_id = self._ring[0]
+            queue = self._queues[user_id]
+            future = queue.popleft()
+            self.active += 1
+            self.granted += 1
+            future.set_result(None)
+
+            credit = self._credit.get(user_id, 0) + 1
+            if not queue:
+                del self._queues[user_id]
+                self._credit.pop(user_id, None)
+                self._ring.popleft()
+            elif credit >= self.weights.get(user_id, 1):
+                self._credit[user_id] = 0
+                self._ring.rotate(-1)
+            else:
+                self._credit[user_id] = credit
+        ADMISSION_QUEUE_DEPTH.set(self._waiting())
+
+    async def acquire(self, user_id: str):
+        """
+        Wait for a slot.
+
+        Raises:
+            AdmissionRejected: No slot within queue_timeout seconds
+        """
+        if self.active < self.slots and not self._ring:
+            self.active += 1
+            self.granted += 1
+            ADMISSION_QUEUE_WAIT.observe(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if user_id not in self._queues:
+            self._queues[user_id] = deque()
+            self._ring.append(user_id)
+        self._queues[user_id].append(future)
+        self.queued += 1
+        ADMISSION_QUEUE_DEPTH.set(self._waiting())
+
+        start = time.perf_counter()
+        try:
+            # shield: on timeout the future stays ours to inspect instead of being cancelled
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                if isinstance(e, asyncio.TimeoutError):
+                    # Granted just as the timeout fired: keep the slot
+                    return
+                # Cancelled after being granted: pass the slot on
+                self.release()
+            else:
+                future.cancel()
+                self._discard(user_id, future)
+                ADMISSION_QUEUE_DEPTH.set(self._waiting())
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                ADMISSION_REJECTIONS.inc(reason="queue_timeout")
+                logger.warning(f"User {user_id} waited {self.queue_timeout}s for an LLM slot, rejecting")
+                raise AdmissionRejected(
+                    "Server busy, no LLM capacity available", retry_after=self.queue_timeout,
+                    reason="queue_timeout", status_code=503
+                )
+            raise
+        finally:
+            ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start)
+
+    def release(self):
+        """Free a slot and hand it to the next user in turn"""
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        """Hold one slot for the duration of the block"""
+        await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "waiting": self._waiting(),
+            "waiting_users": len(self._ring),
+            "granted": self.granted,
+            "queued": self.queued,
+            "timeouts": self.timeouts
+        }
@@ -0,0 +1,33 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence
+import asyncio
+
+
+async def map_unordered(items: Sequence, fn: Callable[[int, Any], Awaitable[Any]],
+                        concurrency: int) -> AsyncIterator[Any]:
+    """
+    Apply `fn(index, item)` to every item with at most `concurrency` calls running,
+    yielding results in completion order.
+
+    An exception raised by `fn` is yielded in place of its result. Closing the
+    generator early (e.g. the client went away) cancels the calls still running.
+    """
+    results: asyncio.Queue = asyncio.Queue()
+    # Shared by all workers; each takes the next index when it is free
+    indexes = iter(range(len(items)))
+
+    async def worker():
+        for index in indexes:
+            try:
+                result = await fn(index, items[index])
+            except Exception as e:
+                result = e
+            await results.put(result)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
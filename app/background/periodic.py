@@ -0,0 +1,64 @@
+from typing import Callable, Dict, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Calls `run()` every `interval` seconds in a background task (e.g. to submit the
+    purge sweep to a BackgroundTaskQueue). Exceptions are logged and the schedule
+    continues.
+
+    Args:
+        name: Task name for logs and stats
+        run: Function called on each tick; may return an awaitable
+        interval: Seconds between calls
+        initial_delay: Seconds before the first call
+    """
+
+    def __init__(self, name: str, run: Callable, interval: float, initial_delay: Optional[float] = None):
+        self.name = name
+        self.run = run
+        self.interval = interval
+        self.initial_delay = interval if initial_delay is None else initial_delay
+
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the schedule (needs a running event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            self.runs += 1
+            self.last_run = time.time()
+            try:
+                result = self.run()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Periodic task {self.name} failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run
+        }
@@ -0,0 +1,106 @@
+"""
+Background purge of soft-deleted threads.
+
+delete_thread / delete_user_threads only set a tombstone; the jobs here remove
+the messages batch by batch and then the thread document. They run on a
+BackgroundTaskQueue (see main.py) and are idempotent, so a job that is dropped,
+interrupted by a restart or run by two workers at once is finished by the
+periodic sweep() without harm.
+"""
+from app.metrics.chat_metrics import PURGED
+from app.storage.base import ChatStorage
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_messages(storage: ChatStorage, thread_id: str, user_id: str,
+                         batch_size: int = 500, pause: float = 0.05) -> int:
+    """
+    Delete all messages of a thread, `batch_size` at a time with `pause` seconds
+    between batches so the purge does not crowd out chat traffic.
+
+    Returns:
+        Number of messages deleted
+    """
+    deleted = 0
+    while True:
+        batch = await storage.purge_messages(thread_id, user_id, batch_size)
+        deleted += batch
+        if batch < batch_size:
+            return deleted
+        await asyncio.sleep(pause)
+
+
+async def purge_thread(storage: ChatStorage, thread_id: str, user_id: str,
+                       batch_size: int = 500, pause: float = 0.05) -> int:
+    """
+    Purge one tombstoned thread: its messages first, then the thread document.
+
+    A crash in between leaves the tombstone, so the next sweep retries; messages
+    a turn adds after the last batch are left without a thread and removed by the
+    orphan sweep.
+
+    Returns:
+        Number of messages deleted
+    """
+    deleted = await purge_messages(storage, thread_id, user_id, batch_size, pause)
+    PURGED.inc(deleted, kind="messages")
+    if await storage.drop_deleted_thread(thread_id, user_id):
+        PURGED.inc(kind="threads")
+    logger.info(f"Purged thread {thread_id}: {deleted} messages")
+    return deleted
+
+
+async def purge_deleted_threads(storage: ChatStorage, user_id: Optional[str] = None,
+                                batch_size: int = 500, pause: float = 0.05) -> int:
+    """
+    Purge every tombstoned thread (of one user, or of all users).
+
+    Returns:
+        Number of threads purged
+    """
+    purged = 0
+    while True:
+        threads = await storage.deleted_threads(user_id=user_id, limit=100)
+        for thread in threads:
+            await purge_thread(storage, thread["thread_id"], thread["user_id"], batch_size, pause)
+        purged += len(threads)
+        if len(threads) < 100:
+            return purged
+
+
+async def sweep(storage: ChatStorage, batch_size: int = 500, pause: float = 0.05,
+                orphan_grace: float = 600) -> Dict:
+    """
+    Finish purges left behind and remove orphaned messages.
+
+    Args:
+        orphan_grace: Seconds since the newest message before a thread without a
+            thread document counts as orphaned
+
+    Returns:
+        Dict with 'threads' purged and 'orphan_messages' deleted
+    """
+    if not storage.is_connected():
+        logger.warning("Purge sweep skipped: storage not connected")
+        return {"threads": 0, "orphan_messages": 0}
+
+    threads = await purge_deleted_threads(storage, batch_size=batch_size, pause=pause)
+
+    orphan_messages = 0
+    cutoff = datetime.utcnow() - timedelta(seconds=orphan_grace)
+    while True:
+        orphans = await storage.orphaned_threads(cutoff, limit=100)
+        for orphan in orphans:
+            deleted = await purge_messages(storage, orphan["thread_id"], orphan["user_id"], batch_size, pause)
+            PURGED.inc(deleted, kind="orphan_messages")
+            orphan_messages += deleted
+        if len(orphans) < 100:
+            break
+
+    logger.info(f"Purge sweep: {threads} deleted threads purged, {orphan_messages} orphaned messages removed")
+    return {"threads": threads, "orphan_messages": orphan_messages}
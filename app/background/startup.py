@@ -0,0 +1,78 @@
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundConnector:
+    """
+    Connects a dependency (e.g. the storage backend) in a background task, retrying
+    with exponential backoff, so the app starts serving right away and a database
+    that is down or slow to answer does not hold up startup.
+
+    `ready` turns True once `connect()` succeeds; readiness probes report it while
+    liveness does not depend on it.
+
+    Args:
+        name: Dependency name for logs and /health/ready
+        connect: Coroutine function returning True on success (exceptions count as failure)
+        initial_delay: Seconds before the first retry
+        max_delay: Cap on the backoff between retries
+    """
+
+    def __init__(self, name: str, connect: Callable[[], Awaitable[bool]],
+                 initial_delay: float = 0.5, max_delay: float = 30.0):
+        self.name = name
+        self.connect = connect
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+
+        self.ready = False
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self.ready_after: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start connecting (needs a running event loop)"""
+        if self._task is None:
+            self._started_at = time.perf_counter()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Give up connecting if still trying"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        delay = self.initial_delay
+        while True:
+            self.attempts += 1
+            try:
+                if await self.connect():
+                    break
+                self.last_error = "connect returned False"
+            except Exception as e:
+                self.last_error = str(e)
+            logger.warning(f"{self.name} not available (attempt {self.attempts}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_delay)
+
+        self.ready = True
+        self.last_error = None
+        self.ready_after = time.perf_counter() - self._started_at
+        logger.info(f"{self.name} ready after {self.ready_after:.2f}s ({self.attempts} attempts)")
+
+    def status(self) -> Dict:
+        """Readiness details for /health/ready"""
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "ready_after_seconds": self.ready_after
+        }
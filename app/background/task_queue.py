@@ -0,0 +1,179 @@
+from app.metrics.chat_metrics import BACKGROUND_JOB_DURATION, BACKGROUND_JOB_WAIT, BACKGROUND_QUEUE_DEPTH
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+JobFactory = Callable[[], Awaitable[None]]
+
+
+class BackgroundTaskQueue:
+    """
+    Bounded queue of background jobs run by a fixed pool of worker tasks.
+
+    Jobs are keyed (e.g. by (thread_id, user_id)). Submitting a key that is already
+    queued replaces the queued job instead of adding a second one; submitting a key
+    that is currently running schedules exactly one re-run after it finishes. So a
+    burst of turns on one thread produces at most one running and one pending job.
+
+    When `maxsize` jobs are queued, new keys are dropped (and counted) rather than
+    blocking the request handler; re-runs of a finished job are always queued.
+    stop() stops accepting jobs, waits up to `drain_timeout` seconds for queued
+    jobs to finish, then cancels the workers.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1000, workers: int = 4):
+        self.name = name
+        self.maxsize = maxsize
+        self.workers = workers
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._pending: Dict[Hashable, Dict] = {}
+        self._running: set = set()
+        self._rerun: Dict[Hashable, JobFactory] = {}
+        self._accepting = False
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+        self._run_seconds_total = 0.0
+        self._run_seconds_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        if self._accepting:
+            return
+        # The bound is enforced in submit() so re-runs are never dropped
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._accepting = True
+        logger.info(f"Background queue '{self.name}' started with {self.workers} workers (max {self.maxsize} queued)")
+
+    def _enqueue(self, key: Hashable, factory: JobFactory):
+        self._pending[key] = {"factory": factory, "enqueued_at": time.monotonic()}
+        self._queue.put_nowait(key)
+        BACKGROUND_QUEUE_DEPTH.set(self._queue.qsize(), queue=self.name)
+
+    def submit(self, key: Hashable, factory: JobFactory) -> bool:
+        """
+        Queue `factory()` to run in the background.
+
+        Args:
+            key: Coalescing key; at most one job per key is queued at a time
+            factory: Zero-argument callable returning the coroutine to run
+
+        Returns:
+            True if the job was queued or merged into an existing one, False if it
+            was dropped (queue full or not running)
+        """
+        if not self._accepting:
+            self.dropped += 1
+            return False
+
+        self.submitted += 1
+        if key in self._pending:
+            # Keep the queue position, run with the newest arguments
+            self._pending[key]["factory"] = factory
+            self.coalesced += 1
+            return True
+        if key in self._running:
+            self._rerun[key] = factory
+            self.coalesced += 1
+            return True
+        if len(self._pending) >= self.maxsize:
+            self.dropped += 1
+            logger.warning(f"Background queue '{self.name}' is full, dropping job {key}")
+            return False
+        self._enqueue(key, factory)
+        return True
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            job = self._pending.pop(key)
+            self._running.add(key)
+            BACKGROUND_QUEUE_DEPTH.set(self._queue.qsize(), queue=self.name)
+
+            started = time.monotonic()
+            wait = started - job["enqueued_at"]
+            self._wait_seconds_total += wait
+            self._wait_seconds_max = max(self._wait_seconds_max, wait)
+            BACKGROUND_JOB_WAIT.observe(wait, queue=self.name)
+            outcome = "cancelled"
+            try:
+                await job["factory"]()
+                self.completed += 1
+                outcome = "ok"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                outcome = "error"
+                logger.error(f"Background job {key} in '{self.name}' failed: {str(e)}")
+            finally:
+                elapsed = time.monotonic() - started
+                BACKGROUND_JOB_DURATION.observe(elapsed, queue=self.name, outcome=outcome)
+                self._run_seconds_total += elapsed
+                self._run_seconds_max = max(self._run_seconds_max, elapsed)
+                self._running.discard(key)
+                rerun = self._rerun.pop(key, None)
+                if rerun is not None:
+                    self._enqueue(key, rerun)
+                self._queue.task_done()
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Stop accepting jobs, drain the queue (bounded by `drain_timeout`) and stop the workers"""
+        if not self._accepting:
+            return
+        self._accepting = False
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Background queue '{self.name}' did not drain in {drain_timeout}s, "
+                f"abandoning {self._queue.qsize()} queued and {len(self._running)} running jobs"
+            )
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._pending.clear()
+        self._rerun.clear()
+        logger.info(f"Background queue '{self.name}' stopped")
+
+    def stats(self) -> Dict:
+        """Queue depth, throughput counters and latency for monitoring"""
+        started = self.completed + self.failed
+        return {
+            "name": self.name,
+            "running": self._accepting,
+            "workers": self.workers,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "max_depth": self.maxsize,
+            "in_progress": len(self._running),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_seconds": self._wait_seconds_total / started if started else 0.0,
+            "max_wait_seconds": self._wait_seconds_max,
+            "avg_run_seconds": self._run_seconds_total / started if started else 0.0,
+            "max_run_seconds": self._run_seconds_max
+        }
@@ -0,0 +1,241 @@
+from app.metrics.chat_metrics import WRITE_BUFFER_FLUSH_SECONDS, WRITE_BUFFER_FLUSHED, WRITE_BUFFER_PENDING
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import copy
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _processed(error: Exception) -> int:
+    """Operations a failed ordered bulk write applied before stopping (BulkWriteError.details)"""
+    details = getattr(error, "details", None) or {}
+    return details.get("nMatched", 0) + details.get("nUpserted", 0)
+
+
+class WriteBehindBuffer:
+    """
+    Write-behind buffer for chat turns.
+
+    add() appends a turn's message documents and folds its thread update
+    (message count, updated_at, denormalized fields such as the last-message
+    preview, title for new threads) into one pending update per thread, then returns without touching the database. A background flusher writes
+    everything pending with one ordered insert_many and one bulk thread update when
+    `max_batch` messages are pending or every `flush_interval` seconds.
+
+    Ordering: one flush runs at a time and a failed batch is put back in front
+    of newer writes, so a turn is never written before an earlier one. A failed
+    message batch is retried whole, so `insert_messages` must tolerate documents
+    an earlier attempt already wrote; thread updates are applied in order and only
+    the ones a failed attempt did not apply are retried.
+
+    Read-your-writes: pending messages and thread updates - including a batch that
+    is being flushed - stay visible through pending_messages() / overlay_thread()
+    until the write is acknowledged.
+
+    Args:
+        insert_messages: Writes message documents, ignoring ones already written
+        update_threads: Applies {thread_id: pending update} with an ordered bulk write
+        max_batch: Pending messages that trigger an immediate flush
+        flush_interval: Max seconds a write stays buffered
+        max_pending: Back-pressure bound; add() flushes inline when it is reached
+    """
+
+    def __init__(self, insert_messages: Callable[[List[Dict]], Awaitable[None]],
+                 update_threads: Callable[[Dict[str, Dict]], Awaitable[None]],
+                 max_batch: int = 500, flush_interval: float = 0.05, max_pending: int = 10000):
+        self.insert_messages = insert_messages
+        self.update_threads = update_threads
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._messages: List[Dict] = []
+        self._threads: Dict[str, Dict] = {}
+        # Batch currently being written; still visible to reads
+        self._flushing_messages: List[Dict] = []
+        self._flushing_threads: Dict[str, Dict] = {}
+
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.failures = 0
+        self.flushed_messages = 0
+
+    def start(self):
+        """Start the background flusher (needs a running event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Write-behind buffer started (batch {self.max_batch}, interval {self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop the flusher and write everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._messages or self._threads:
+            await self.flush()
+        if self._messages or self._threads:
+            logger.error(f"Write-behind buffer stopped with {len(self._messages)} unwritten messages")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._messages or self._threads:
+                if not await self.flush():
+                    # Back off instead of retrying a failing database in a tight loop
+                    await asyncio.sleep(min(1.0, self.flush_interval * 10))
+
+    def pending_count(self) -> int:
+        return len(self._messages) + len(self._flushing_messages)
+
+    async def add(self, thread_id: str, user_id: str, documents: List[Dict], title: str = "",
+                  fields: Optional[Dict] = None, create: bool = True) -> bool:
+        """
+        Buffer one turn.
+
+        Args:
+            documents: The turn's message documents (non-empty, with 'thread_id', 'user_id'
+                and 'created_at'), oldest first
+            fields: Thread fields this turn sets; a later turn's value wins
+            create: Whether the turn may create the thread (kept from the first pending turn)
+
+        Returns:
+            False when the buffer is full and could not be flushed (nothing was added)
+        """
+        if self.pending_count() >= self.max_pending:
+            await self.flush()
+            if self.pending_count() >= self.max_pending:
+                logger.error(f"Write-behind buffer full ({self.pending_count()} messages), rejecting write")
+                return False
+
+        self._messages.extend(documents)
+        update = self._threads.get(thread_id)
+        if update is None:
+            update = self._threads[thread_id] = {
+                "user_id": user_id, "title": title, "count": 0, "created_at": documents[0]["created_at"], "fields": {},
+                "create": create
+            }
+        update["count"] += len(documents)
+        update["updated_at"] = documents[-1]["created_at"]
+        update["fields"].update(fields or {})
+
+        WRITE_BUFFER_PENDING.set(self.pending_count())
+        if len(self._messages) >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> bool:
+        """
+        Write everything pending now; waits for a flush already in progress.
+
+        Returns:
+            False if the write failed (the batch stays pending and is retried)
+        """
+        async with self._lock:
+            if not self._messages and not self._threads:
+                return True
+            self._flushing_messages, self._messages = self._messages, []
+            self._flushing_threads, self._threads = self._threads, {}
+
+            start = time.perf_counter()
+            try:
+                if self._flushing_messages:
+                    await self.insert_messages(self._flushing_messages)
+                    WRITE_BUFFER_FLUSHED.inc(len(self._flushing_messages), kind="messages")
+                    self.flushed_messages += len(self._flushing_messages)
+                    self._flushing_messages = []
+
+                if self._flushing_threads:
+                    try:
+                        await self.update_threads(self._flushing_threads)
+                    except Exception as e:
+                        # Keep only the updates the ordered bulk write did not apply
+                        for thread_id in list(self._flushing_threads)[:_processed(e)]:
+                            del self._flushing_threads[thread_id]
+                        raise
+                    WRITE_BUFFER_FLUSHED.inc(len(self._flushing_threads), kind="threads")
+                    self._flushing_threads = {}
+
+                self.flushes += 1
+                return True
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Write-behind flush failed, {len(self._flushing_messages)} messages kept: {str(e)}")
+                # Back in front of anything added meanwhile, preserving order
+                self._messages = self._flushing_messages + self._messages
+                for thread_id, update in self._threads.items():
+                    pending = self._flushing_threads.get(thread_id)
+                    if pending is None:
+                        self._flushing_threads[thread_id] = update
+                    else:
+                        pending["count"] += update["count"]
+                        pending["updated_at"] = update["updated_at"]
+                        pending["fields"].update(update["fields"])
+                self._threads = self._flushing_threads
+                return False
+            finally:
+                self._flushing_messages = []
+                self._flushing_threads = {}
+                WRITE_BUFFER_PENDING.set(self.pending_count())
+                WRITE_BUFFER_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+    def pending_messages(self, thread_id: str, user_id: Optional[str] = None) -> List[Dict]:
+        """Unwritten messages of a thread, oldest first"""
+        return [
+            msg for msg in self._flushing_messages + self._messages
+            if msg["thread_id"] == thread_id and (user_id is None or msg["user_id"] == user_id)
+        ]
+
+    def overlay_thread(self, thread_id: str, thread: Optional[Dict]) -> Optional[Dict]:
+        """
+        Apply unwritten updates to a thread document read from the database
+        (or build it, when the thread has not been written yet). Updates whose
+        updated_at the stored document already has were applied by a flush that
+        finished while the read was in flight. Turns that may not create the
+        thread do not bring back one that is missing (deleted).
+        """
+        applied = thread.get("updated_at") if thread else None
+        updates = [
+            update for update in (self._flushing_threads.get(thread_id), self._threads.get(thread_id))
+            if update is not None and (applied is None or update["updated_at"] > applied)
+        ]
+        if not updates:
+            return thread
+
+        count = sum(update["count"] for update in updates)
+        if thread is None:
+            if not updates[0]["create"]:
+                return None
+            thread = {
+                "thread_id": thread_id,
+                "user_id": updates[0]["user_id"],
+                "title": updates[0]["title"],
+                "created_at": updates[0]["created_at"],
+                "message_count": 0
+            }
+        else:
+            thread = copy.copy(thread)
+        thread["message_count"] = thread.get("message_count", 0) + count
+        thread["updated_at"] = updates[-1]["updated_at"]
+        for update in updates:
+            thread.update(update["fields"])
+        return thread
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            "pending_messages": self.pending_count(),
+            "pending_threads": len(self._threads) + len(self._flushing_threads),
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "flushed_messages": self.flushed_messages
+        }
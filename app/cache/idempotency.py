@@ -0,0 +1,156 @@
+from app.metrics.chat_metrics import DEDUPLICATED_REQUESTS
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(ValueError):
+    """An Idempotency-Key was reused with a different request body"""
+
+
+def request_fingerprint(messages: List[Dict]) -> str:
+    """Stable hash of a message list (key order and whitespace in the JSON do not matter)"""
+    payload = json.dumps(messages, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same key
+    await the same result (or exception).
+
+    The call runs in its own task, so a caller that disconnects does not cancel it
+    for the others, and its side effects (e.g. the saved turn) complete either way.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Returns:
+            (result, shared) - shared is True when another caller's call was joined
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved; callers that are still waiting re-raise it
+        if not task.cancelled():
+            task.exception()
+
+
+class IdempotencyStore:
+    """
+    Successful responses by idempotency key, in this worker process. LRU-bounded
+    by `max_entries`; entries expire after `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Dict]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created_at"] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, fingerprint: str, response: Any):
+        self._entries[key] = {"fingerprint": fingerprint, "response": response, "created_at": time.monotonic()}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RequestDeduplicator:
+    """
+    Dedupes chat turns.
+
+    - Without an Idempotency-Key, concurrent requests with the same scope (e.g.
+      thread + user) and fingerprint share one in-flight turn.
+    - With one, a retry after the first request finished gets the stored response
+      instead of a new generation; reusing the key for a different body raises
+      IdempotencyConflict.
+
+    Only successful results are stored, so a retry after a failure runs again.
+    """
+
+    def __init__(self, store: Optional[IdempotencyStore] = None):
+        self.flights = SingleFlight()
+        self.store = store
+        self.counts = {"fresh": 0, "coalesced": 0, "replayed": 0}
+
+    def _count(self, result: str):
+        self.counts[result] += 1
+        DEDUPLICATED_REQUESTS.inc(result=result)
+
+    def replay(self, scope: Tuple, fingerprint: str, idempotency_key: Optional[str]) -> Optional[Any]:
+        """
+        Stored response for a retry with the same Idempotency-Key, else None.
+
+        Raises:
+            IdempotencyConflict: The key was used for a different request body
+        """
+        if not idempotency_key or self.store is None:
+            return None
+        stored = self.store.get(scope + (idempotency_key,))
+        if stored is None:
+            return None
+        if stored["fingerprint"] != fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+        self._count("replayed")
+        logger.info(f"Replaying stored response for idempotency key {idempotency_key}")
+        return stored["response"]
+
+    async def run(self, scope: Tuple, fingerprint: str, factory: Callable[[], Awaitable[Any]],
+                  idempotency_key: Optional[str] = None) -> Any:
+        """
+        Run `factory`, or join an identical turn already in flight; check replay() first.
+
+        Args:
+            scope: Who the request belongs to, e.g. (thread_id, user_id)
+            fingerprint: request_fingerprint() of the request body
+            factory: Coroutine function producing the response
+            idempotency_key: Client-supplied Idempotency-Key header; the response is stored under it
+
+        Returns:
+            The response
+        """
+        response, shared = await self.flights.do(scope + (fingerprint,), factory)
+        if idempotency_key and self.store is not None:
+            self.store.put(scope + (idempotency_key,), fingerprint, response)
+        self._count("coalesced" if shared else "fresh")
+        return response
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            **self.counts,
+            "in_flight": len(self.flights),
+            "stored": len(self.store) if self.store is not None else 0
+        }
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import hashlib
+import logging
+import math
+import re
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Character trigrams make "withdraw" / "withdrawal" and typos partially match;
+# whole words carry more weight so word order and vocabulary dominate
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.5
+
+
+def normalize_question(text: str) -> str:
+    """Case-folded words only: 'How do I withdraw?!' and 'how do i  withdraw' share a key"""
+    return " ".join(_WORD_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold()))
+
+
+def embed(normalized: str) -> Dict[str, float]:
+    """
+    L2-normalized sparse bag of words + character trigrams, computed locally.
+
+    Works for any script (Bengali questions get trigram features like English
+    ones) and needs no model; cosine similarity is the dot product of two vectors.
+    """
+    vector: Dict[str, float] = {}
+    for word in normalized.split():
+        key = "w:" + word
+        vector[key] = vector.get(key, 0.0) + WORD_WEIGHT
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            key = "c:" + padded[i:i + 3]
+            vector[key] = vector.get(key, 0.0) + TRIGRAM_WEIGHT
+
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if not norm:
+        return {}
+    return {feature: weight / norm for feature, weight in vector.items()}
+
+
+@lru_cache(maxsize=16)
+def prompt_fingerprint(*parts: str) -> str:
+    """Short hash of everything that shapes an answer (system prompt, model, ...)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Cache of LLM answers to context-free questions (first turn, no summary or history).
+
+    Lookups first try an exact match on the normalized question, then, when
+    `semantic` is on, the most similar cached question whose cosine similarity is
+    at least `similarity_threshold`. Candidates are found through an inverted index
+    over the sparse features, so only entries sharing a word or trigram are scored.
+
+    The cache remembers the prompt fingerprint its entries were generated under; a
+    lookup or store with a different fingerprint (SYSTEM_PROMPT or a chat backend changed)
+    clears it first.
+    Entries expire after `ttl_seconds`; eviction beyond `max_entries` is LRU.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 semantic: bool = False, similarity_threshold: float = 0.9):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._fingerprint: Optional[str] = None
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for feature in entry["vector"]:
+            postings = self._postings.get(feature)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[feature]
+
+    def _check_fingerprint(self, fingerprint: str):
+        if fingerprint != self._fingerprint:
+            if self._entries:
+                logger.info("Prompt changed, clearing the response cache")
+                self.invalidations += 1
+            self.clear()
+            self._fingerprint = fingerprint
+
+    def _live(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created_at"] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        return entry
+
+    def _nearest(self, vector: Dict[str, float]) -> Tuple[Optional[str], float]:
+        scores: Dict[str, float] = {}
+        for feature, weight in vector.items():
+            for key, other in self._postings.get(feature, {}).items():
+                scores[key] = scores.get(key, 0.0) + weight * other
+
+        for key, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            if score < self.similarity_threshold:
+                break
+            if self._live(key) is not None:
+                return key, score
+        return None, 0.0
+
+    def get(self, question: str, fingerprint: str) -> Tuple[Optional[str], str]:
+        """
+        Look up a cached answer.
+
+        Args:
+            question: The user's message text
+            fingerprint: prompt_fingerprint() of the current prompt configuration
+
+        Returns:
+            (response, match) where match is 'exact', 'semantic' or 'miss'
+            (response is None on a miss)
+        """
+        self._check_fingerprint(fingerprint)
+        normalized = normalize_question(question)
+        if not normalized:
+            self.misses += 1
+            return None, "miss"
+
+        entry = self._live(normalized)
+        if entry is not None:
+            self._entries.move_to_end(normalized)
+            self.exact_hits += 1
+            return entry["response"], "exact"
+
+        if self.semantic:
+            key, score = self._nearest(embed(normalized))
+            if key is not None:
+                self._entries.move_to_end(key)
+                self.semantic_hits += 1
+                logger.info(f"Semantic cache hit ({score:.2f}): '{normalized}' ~ '{key}'")
+                return self._entries[key]["response"], "semantic"
+
+        self.misses += 1
+        return None, "miss"
+
+    def put(self, question: str, response: str, fingerprint: str):
+        """Store the answer to a context-free question"""
+        self._check_fingerprint(fingerprint)
+        normalized = normalize_question(question)
+        if not normalized or not response:
+            return
+
+        self._remove(normalized)
+        vector = embed(normalized) if self.semantic else {}
+        self._entries[normalized] = {
+            "response": response,
+            "vector": vector,
+            "created_at": time.monotonic()
+        }
+        for feature, weight in vector.items():
+            self._postings.setdefault(feature, {})[normalized] = weight
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._postings.clear()
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "semantic": self.semantic,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions
+        }
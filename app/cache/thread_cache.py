@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import copy
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message / per-entry overhead (dict, keys, datetime) added to the text size
+MESSAGE_OVERHEAD_BYTES = 200
+ENTRY_OVERHEAD_BYTES = 500
+
+
+class ThreadContextCache:
+    """
+    In-process cache of the context a chat turn needs: thread document, summary
+    and the most recent `window` messages, keyed by (thread_id, user_id).
+
+    Entries are filled from load_thread_context (threads that exist; a missing
+    thread may be created by another worker) and kept current write-through by
+    the database client (new messages are appended, summaries replaced), so a
+    follow-up turn in the same worker does not re-read MongoDB.
+
+    Eviction is LRU, bounded by both entry count and approximate memory size;
+    entries also expire after `ttl_seconds`, which bounds staleness when several
+    worker processes write to the same thread.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300,
+                 max_bytes: int = 64 * 1024 * 1024, window: int = 20):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.window = window
+
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._thread_keys: Dict[str, set] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _entry_size(entry: Dict) -> int:
+        size = ENTRY_OVERHEAD_BYTES + len(entry.get("summary") or "")
+        for msg in entry["messages"]:
+            size += MESSAGE_OVERHEAD_BYTES + len(msg.get("content", ""))
+        return size
+
+    def _lookup(self, thread_id: str, user_id: str) -> Optional[Dict]:
+        """Return a live entry (refreshing its LRU position) without touching hit/miss counters"""
+        key = (thread_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if time.monotonic() - entry["loaded_at"] > self.ttl_seconds:
+            self._remove(key)
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry["size"]
+        keys = self._thread_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._thread_keys[key[0]]
+
+    def _resize(self, entry: Dict):
+        new_size = self._entry_size(entry)
+        self._bytes += new_size - entry["size"]
+        entry["size"] = new_size
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def get(self, thread_id: str, user_id: str, limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Get cached context in the load_thread_context format.
+
+        Args:
+            limit: Number of recent messages needed; a miss is reported if the cached
+                window cannot satisfy it
+
+        Returns:
+            Dict with 'thread', 'summary' and 'messages', or None on miss
+        """
+        entry = self._lookup(thread_id, user_id)
+        limit = self.window if limit is None else limit
+
+        if entry is None or (len(entry["messages"]) < limit and not entry["complete"]):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return {
+            "thread": copy.copy(entry["thread"]),
+            "summary": entry["summary"],
+            "messages": list(entry["messages"][-limit:]) if limit > 0 else []
+        }
+
+    def put(self, thread_id: str, user_id: str, context: Dict, complete: bool):
+        """
+        Store context loaded from the database.
+
+        Args:
+            complete: True when `context['messages']` holds the whole thread (fewer
+                messages than were requested), so smaller windows can be served exactly
+        """
+        key = (thread_id, user_id)
+        self._remove(key)
+
+        entry = {
+            "thread": copy.copy(context.get("thread")),
+            "summary": context.get("summary"),
+            "messages": list(context.get("messages", []))[-self.window:],
+            "complete": complete and len(context.get("messages", [])) <= self.window,
+            "loaded_at": time.monotonic(),
+            "size": 0
+        }
+        self._entries[key] = entry
+        self._thread_keys.setdefault(thread_id, set()).add(key)
+        self._resize(entry)
+        self._evict()
+
+    def peek_thread(self, thread_id: str, user_id: str) -> Tuple[bool, Optional[Dict]]:
+        """
+        Cached thread document without counting a hit or miss.
+
+        Returns:
+            (cached, thread) - thread is None when not cached
+        """
+        entry = self._lookup(thread_id, user_id)
+        if entry is None:
+            return False, None
+        return True, copy.copy(entry["thread"])
+
+    def append_messages(self, thread_id: str, user_id: str, messages: List[Dict], thread: Optional[Dict] = None):
+        """Write-through for newly saved messages; no-op when the thread is not cached"""
+        entry = self._lookup(thread_id, user_id)
+        if entry is None:
+            return
+
+        entry["messages"].extend(
+            {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+            for msg in messages
+        )
+        if len(entry["messages"]) > self.window:
+            del entry["messages"][:-self.window]
+            entry["complete"] = False
+        if thread is not None:
+            entry["thread"] = copy.copy(thread)
+
+        self._resize(entry)
+        self._evict()
+
+    def set_summary(self, thread_id: str, summary: str):
+        """Write-through for a new thread summary"""
+        for key in list(self._thread_keys.get(thread_id, ())):
+            entry = self._entries[key]
+            entry["summary"] = summary
+            if entry["thread"] is not None:
+                entry["thread"]["summary"] = summary
+            self._resize(entry)
+        self._evict()
+
+    def invalidate(self, thread_id: str, user_id: Optional[str] = None):
+        """Drop cached context for a thread (all users when user_id is None)"""
+        if user_id is not None:
+            self._remove((thread_id, user_id))
+            return
+        for key in list(self._thread_keys.get(thread_id, ())):
+            self._remove(key)
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached thread of a user"""
+        for key in [key for key in self._entries if key[1] == user_id]:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._thread_keys.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -1,20 +1,194 @@
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo import MongoClient, AsyncMongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, ServerSelectionTimeoutError
+from bson import ObjectId
+from bson.errors import InvalidId
 from config import settings
+from app.background.write_buffer import WriteBehindBuffer
+from app.cache.thread_cache import ThreadContextCache
+from app.metrics.chat_metrics import STAGE_SECONDS
+from app.metrics.mongo_pool import pool_listener
+from app.storage.base import (
+    THREAD_LIST_FIELDS, ChatStorage, ThreadNotFoundError, decode_cursor_key, encode_cursor, thread_preview_fields, turn_documents
+)
 import logging
+import time
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Indexes per collection, shaped after the hot queries:
+# - get_thread_messages / load_thread_context / delete_thread filter thread_id + user_id, sort created_at
+# - get_user_threads filters user_id, sorts updated_at
+# - get_thread_info / commit_turn look threads up by thread_id (one document per thread)
+# - keyset pagination sorts on (created_at, _id) / (updated_at, _id), so _id is the last key
+# - the purge sweep looks up tombstoned threads (partial index: live threads are not in it)
+REQUIRED_INDEXES = {
+    "messages": [
+        {"keys": [("thread_id", 1), ("user_id", 1), ("created_at", -1), ("_id", -1)], "name": "thread_user_created_id"},
+        {"keys": [("user_id", 1)], "name": "user_id_1"}
+    ],
+    "threads": [
+        {"keys": [("thread_id", 1)], "name": "thread_id_unique", "unique": True},
+        {"keys": [("user_id", 1), ("updated_at", -1), ("_id", -1)], "name": "user_updated_id"},
+        {"keys": [("deleted_at", 1)], "name": "deleted_at_partial",
+         "partialFilterExpression": {"deleted_at": {"$exists": True}}}
+    ]
+}
+
+# Live (not soft-deleted) threads
+NOT_DELETED = {"deleted_at": {"$exists": False}}
+
+# Single-field indexes of the first schema, replaced by the compound/unique indexes above.
+# Dropped by `python -m app.db_diagnostics --drop-superseded`, never on startup; the old
+# non-unique threads.thread_id_1 blocks thread_id_unique until it is gone.
+SUPERSEDED_INDEXES = {
+    "messages": ["thread_id_1", "created_at_-1"],
+    "threads": ["thread_id_1", "user_id_1"]
+}
+
+# Fields ThreadInfo needs (including the denormalized last-message preview); used
+# as projection for the thread list
+THREAD_LIST_PROJECTION = {field: 1 for field in THREAD_LIST_FIELDS}
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if it is malformed"""
+    value, doc_id = decode_cursor_key(cursor)
+    try:
+        return value, ObjectId(doc_id)
+    except (InvalidId, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def after_position(base_filter: Dict, field: str, value: datetime, doc_id: ObjectId) -> Dict:
+    """Filter for documents after (value, doc_id) in (field, _id) order"""
+    query = dict(base_filter)
+    # Range on the indexed field bounds the scan, the $or breaks ties on _id
+    query[field] = {"$gte": value}
+    query["$or"] = [{field: {"$gt": value}}, {"_id": {"$gt": doc_id}}]
+    return query
+
+
+def keyset_query(base_filter: Dict, field: str, before: Optional[str], after: Optional[str]) -> Tuple[Dict, List, bool]:
+    """
+    Build the filter and sort for one keyset page on (field, _id).
+    
+    Returns:
+        (filter, sort, backward) where backward=True means newest-first traversal
+    """
+    if before and after:
+        raise ValueError("Use either 'before' or 'after', not both")
+    
+    if after:
+        value, doc_id = decode_cursor(after)
+        return after_position(base_filter, field, value, doc_id), [(field, 1), ("_id", 1)], False
+    
+    query = dict(base_filter)
+    if before:
+        value, doc_id = decode_cursor(before)
+        query[field] = {"$lte": value}
+        query["$or"] = [{field: {"$lt": value}}, {"_id": {"$lt": doc_id}}]
+    return query, [(field, -1), ("_id", -1)], True
+
+
+def _index_options(spec: Dict) -> Dict:
+    """create_index keyword arguments of a REQUIRED_INDEXES entry besides keys and name"""
+    options = {"unique": spec.get("unique", False)}
+    if "partialFilterExpression" in spec:
+        options["partialFilterExpression"] = spec["partialFilterExpression"]
+    return options
+
+
+def _missing_indexes(collection_name: str, index_information: Dict) -> List[str]:
+    """Return names of required indexes not present in `index_information()` output (matched by keys and uniqueness)"""
+    existing = {
+        (tuple(tuple(k) for k in info.get("key", [])), bool(info.get("unique", False)))
+        for info in index_information.values()
+    }
+    return [
+        f"{collection_name}.{spec['name']}"
+        for spec in REQUIRED_INDEXES[collection_name]
+        if (tuple(spec["keys"]), spec.get("unique", False)) not in existing
+    ]
+
+
+def _thread_context_pipeline(thread_id: str, user_id: str, limit: int) -> List[Dict]:
+    """Aggregation on threads that joins the last 'limit' messages in a single round trip"""
+    return [
+        {"$match": {"thread_id": thread_id, **NOT_DELETED}},
+        {"$lookup": {
+            "from": "messages",
+            "pipeline": [
+                {"$match": {"thread_id": thread_id, "user_id": user_id}},
+                {"$sort": {"created_at": -1}},
+                {"$limit": limit},
+                {"$project": {"role": 1, "content": 1}}
+            ],
+            "as": "recent_messages"
+        }},
+        {"$project": {"_id": 0}}
+    ]
+
+
+def _format_thread_context(thread: Optional[Dict]) -> Dict:
+    """Split the aggregation result into thread info, summary and chronological messages"""
+    if not thread:
+        return {"thread": None, "summary": None, "messages": []}
+    
+    messages = thread.pop("recent_messages", [])
+    messages.reverse()
+    return {
+        "thread": thread,
+        "summary": thread.get("summary"),
+        "messages": [
+            {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+            for msg in messages
+        ]
+    }
+
+
+def _turn_thread_update(thread_id: str, user_id: str, title: str, message_count: int,
+                        created_at: Optional[datetime] = None, updated_at: Optional[datetime] = None,
+                        fields: Optional[Dict] = None) -> Dict:
+    """
+    Upsert update that creates the thread on first turn and bumps message_count/updated_at,
+    setting `fields` (thread_preview_fields) in the same atomic update
+    """
+    now = datetime.utcnow()
+    return {
+        "$setOnInsert": {
+            "thread_id": thread_id,
+            "user_id": user_id,
+            "title": title,
+            "created_at": created_at or now
+        },
+        "$inc": {"message_count": message_count},
+        "$set": {"updated_at": updated_at or now, **(fields or {})}
+    }
+
+def mongo_client_options() -> Dict:
+    """Timeout and connection pool keyword arguments for MongoClient/AsyncMongoClient"""
+    return {
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS or None,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+        "maxConnecting": settings.MONGO_MAX_CONNECTING,
+        "event_listeners": [pool_listener]
+    }
+
 class MongoDBClient:
+    """
+    Blocking MongoDB client for maintenance scripts (see app/db_diagnostics.py):
+    connects and manages indexes. Request handlers use AsyncMongoDBClient.
+    """
+    
     def __init__(self):
         try:
-            self.client = MongoClient(
-                settings.MONGODB_URL,
-                serverSelectionTimeoutMS=5000,
-                connectTimeoutMS=10000
-            )
+            self.client = MongoClient(settings.MONGODB_URL, **mongo_client_options())
             # Test connection
             self.client.admin.command('ping')
             logger.info("Connected to MongoDB successfully")
@@ -24,14 +198,8 @@ class MongoDBClient:
             self.threads_collection = self.db['threads']
             
             # Create indexes for better performance
-            self.messages_collection.create_index([('thread_id', 1)])
-            self.messages_collection.create_index([('user_id', 1)])
-            self.messages_collection.create_index([('created_at', -1)])
-            
-            self.threads_collection.create_index([('thread_id', 1)])
-            self.threads_collection.create_index([('user_id', 1)])
-            
-            logger.info("Database indexes created successfully")
+            self.ensure_indexes()
+            self.verify_indexes()
             
         except ServerSelectionTimeoutError as e:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
@@ -50,13 +218,217 @@ class MongoDBClient:
         """Check if MongoDB is connected"""
         return self.client is not None and self.messages_collection is not None
     
-    def save_message(self, thread_id: str, user_id: str, role: str, content: str) -> bool:
+    def ensure_indexes(self):
+        """Create the REQUIRED_INDEXES"""
+        for collection_name, specs in REQUIRED_INDEXES.items():
+            collection = self.db[collection_name]
+            for spec in specs:
+                try:
+                    collection.create_index(spec["keys"], name=spec["name"], **_index_options(spec))
+                except Exception as e:
+                    logger.error(f"Error creating index {collection_name}.{spec['name']}: {str(e)}")
+        
+        logger.info("Database indexes created successfully")
+    
+    def verify_indexes(self) -> List[str]:
+        """
+        Check that every index in REQUIRED_INDEXES exists.
+        
+        Returns:
+            Names of missing indexes ("collection.name"), empty when all are present
+        """
+        missing = []
+        for collection_name in REQUIRED_INDEXES:
+            missing.extend(_missing_indexes(collection_name, self.db[collection_name].index_information()))
+        
+        if missing:
+            logger.warning(f"Missing database indexes: {', '.join(missing)} (run: python -m app.db_diagnostics)")
+        return missing
+    
+    def superseded_indexes(self) -> List[str]:
+        """Names ("collection.name") of SUPERSEDED_INDEXES that still exist"""
+        return [
+            f"{collection_name}.{name}"
+            for collection_name, names in SUPERSEDED_INDEXES.items()
+            for name in names
+            if name in self.db[collection_name].index_information()
+        ]
+    
+    def drop_superseded_indexes(self) -> List[str]:
+        """
+        Drop the SUPERSEDED_INDEXES that still exist, then create the REQUIRED_INDEXES
+        they were blocking.
+        
+        Returns:
+            Names of the dropped indexes ("collection.name")
+        """
+        dropped = self.superseded_indexes()
+        for qualified_name in dropped:
+            collection_name, name = qualified_name.split(".", 1)
+            self.db[collection_name].drop_index(name)
+            logger.info(f"Dropped superseded index {qualified_name}")
+        if dropped:
+            self.ensure_indexes()
+        return dropped
+    
+    def close_connection(self):
+        """Close MongoDB connection"""
+        if self.client:
+            self.client.close()
+            logger.info("MongoDB connection closed")
+
+class AsyncMongoDBClient(ChatStorage):
+    """
+    Async MongoDB client for use inside request handlers; the MongoDB ChatStorage
+    backend.
+    
+    Every method is awaited instead of blocking, so DB latency overlaps with other
+    in-flight requests. The client is created lazily;
+    call `connect()` once the event loop is running (see the FastAPI lifespan in main.py).
+    
+    Thread context (summary + recent messages) is served from an in-process
+    ThreadContextCache when enabled, kept up to date write-through by the save methods.
+    
+    With WRITE_BEHIND_ENABLED, commit_turn only appends to a WriteBehindBuffer that
+    a background task flushes in batches. load_thread_context, get_thread_messages
+    and get_thread_info merge the buffered writes in; the other reads flush first.
+    """
+    
+    name = "mongo"
+    
+    def __init__(self):
+        self.client = AsyncMongoClient(settings.MONGODB_URL, **mongo_client_options())
+        self.db = None
+        self.messages_collection = None
+        self.threads_collection = None
+        
+        self.context_cache = ThreadContextCache(
+            max_entries=settings.THREAD_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.THREAD_CACHE_TTL,
+            max_bytes=settings.THREAD_CACHE_MAX_BYTES,
+            window=settings.THREAD_CACHE_WINDOW
+        ) if settings.THREAD_CACHE_ENABLED else None
+        
+        self.write_buffer = WriteBehindBuffer(
+            self._insert_buffered_messages,
+            self._update_buffered_threads,
+            max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+            flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+            max_pending=settings.WRITE_BEHIND_MAX_PENDING
+        ) if settings.WRITE_BEHIND_ENABLED else None
+    
+    async def connect(self) -> bool:
+        """Ping the server, bind collections and create indexes"""
+        try:
+            await self.client.admin.command('ping')
+            logger.info("Connected to MongoDB successfully (async)")
+            
+            self.db = self.client[settings.DATABASE_NAME]
+            
+            await self.ensure_indexes()
+            await self.verify_indexes()
+            
+            self.messages_collection = self.db['messages']
+            self.threads_collection = self.db['threads']
+            if self.write_buffer:
+                self.write_buffer.start()
+            return True
+        except ServerSelectionTimeoutError as e:
+            logger.error(f"Failed to connect to MongoDB: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"Error initializing async MongoDB client: {str(e)}")
+            return False
+    
+    def is_connected(self) -> bool:
+        """Check if MongoDB is connected"""
+        return self.client is not None and self.messages_collection is not None
+    
+    async def ensure_indexes(self):
+        """Create the REQUIRED_INDEXES (indexes that already exist are left alone)"""
+        for collection_name, specs in REQUIRED_INDEXES.items():
+            collection = self.db[collection_name]
+            for spec in specs:
+                try:
+                    await collection.create_index(spec["keys"], name=spec["name"], **_index_options(spec))
+                except Exception as e:
+                    logger.error(f"Error creating index {collection_name}.{spec['name']}: {str(e)}")
+        
+        logger.info("Database indexes created successfully (async)")
+    
+    async def verify_indexes(self) -> List[str]:
+        """
+        Check that every index in REQUIRED_INDEXES exists.
+        
+        Returns:
+            Names of missing indexes ("collection.name"), empty when all are present
+        """
+        missing = []
+        for collection_name in REQUIRED_INDEXES:
+            missing.extend(_missing_indexes(collection_name, await self.db[collection_name].index_information()))
+        
+        if missing:
+            logger.warning(f"Missing database indexes: {', '.join(missing)} (run: python -m app.db_diagnostics)")
+        return missing
+    
+    async def _insert_buffered_messages(self, documents: List[Dict]):
+        """Write-behind flush: insert buffered messages; ones a failed attempt already wrote are skipped"""
+        try:
+            await self.messages_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Documents carry their _id from commit_turn, so a re-sent one fails with a duplicate key
+            errors = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors") or any(error.get("code") != 11000 for error in errors):
+                raise
+    
+    async def _update_buffered_threads(self, updates: Dict[str, Dict]):
+        """
+        Write-behind flush: apply the per-thread message_count/updated_at updates.
+        
+        Only the first turns of a new thread upsert (delete_thread flushes before it sets
+        the tombstone, so there is none to collide with). A turn on an existing thread
+        that was deleted meanwhile matches nothing; its messages are removed by the purge
+        or the orphan sweep.
+        """
+        await self.threads_collection.bulk_write([
+            UpdateOne(
+                {"thread_id": thread_id, **({} if update["create"] else NOT_DELETED)},
+                _turn_thread_update(
+                    thread_id, update["user_id"], update["title"], update["count"],
+                    created_at=update["created_at"], updated_at=update["updated_at"], fields=update["fields"]
+                ),
+                upsert=update["create"]
+            )
+            for thread_id, update in updates.items()
+        ], ordered=True)
+    
+    async def _flush_pending(self):
+        """Write buffered turns before a query that cannot merge them in"""
+        if self.write_buffer:
+            await self.write_buffer.flush()
+    
+    def _merge_pending(self, messages: List[Dict], thread_id: str, user_id: str, limit: int) -> List[Dict]:
+        """
+        Append buffered messages to chronological query results (read-your-writes).
+        
+        Messages a flush wrote while the query was in flight are skipped by _id.
+        """
+        pending = self.write_buffer.pending_messages(thread_id, user_id) if self.write_buffer else []
+        if not pending:
+            return messages
+        written = {msg.get("_id") for msg in messages}
+        messages = messages + [msg for msg in pending if msg["_id"] not in written]
+        return messages[-limit:] if limit > 0 else []
+    
+    async def save_message(self, thread_id: str, user_id: str, role: str, content: str) -> bool:
         """Save a message to the database"""
         if not self.is_connected():
             logger.error("Messages collection is not available")
             return False
         
+        start = time.perf_counter()
         try:
+            await self._flush_pending()
             message = {
                 "thread_id": thread_id,
                 "user_id": user_id,
@@ -64,48 +436,45 @@ class MongoDBClient:
                 "content": content,
                 "created_at": datetime.utcnow()
             }
-            result = self.messages_collection.insert_one(message)
+            result = await self.messages_collection.insert_one(message)
+            if self.context_cache:
+                self.context_cache.append_messages(thread_id, user_id, [message])
             logger.info(f"Message saved with ID: {result.inserted_id} to thread {thread_id}")
             return True
         except Exception as e:
             logger.error(f"Error saving message: {str(e)}")
             return False
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="db_write")
     
-    def get_thread_messages(self, thread_id: str, user_id: str, limit: int = 10) -> List[Dict]:
-        """
-        Get all messages from a thread (last 'limit' messages in chronological order).
-        
-        Args:
-            thread_id: ID of the thread
-            user_id: ID of the user
-            limit: Number of messages to fetch (default: 10, max 100)
-            
-        Returns:
-            List of messages with 'role' and 'content' fields
-        """
+    async def get_thread_messages(self, thread_id: str, user_id: str, limit: int = 10) -> List[Dict]:
+        """Get the last 'limit' messages of a thread in chronological order (max 100)"""
         if not self.is_connected():
             logger.error("Messages collection is not available")
             return []
         
         try:
-            # Limit max to 100 for safety
             limit = min(limit, 100)
             
-            messages = list(
+            if self.context_cache and limit <= self.context_cache.window:
+                cached = self.context_cache.get(thread_id, user_id, limit)
+                if cached is not None:
+                    return cached["messages"]
+            
+            messages = await (
                 self.messages_collection.find(
                     {
                         "thread_id": thread_id,
                         "user_id": user_id
                     }
                 )
-                .sort("created_at", -1)  # Most recent first
+                .sort("created_at", -1)
                 .limit(limit)
+                .to_list(length=None)
             )
-            
-            # Reverse to get chronological order (oldest first)
             messages.reverse()
+            messages = self._merge_pending(messages, thread_id, user_id, limit)
             
-            # Format messages - remove MongoDB's _id field
             formatted_messages = [
                 {
                     "role": msg.get("role", "user"),
@@ -121,7 +490,7 @@ class MongoDBClient:
             logger.error(f"Error retrieving thread messages: {str(e)}")
             return []
     
-    def create_thread(self, thread_id: str, user_id: str, title: str = "") -> bool:
+    async def create_thread(self, thread_id: str, user_id: str, title: str = "") -> bool:
         """Create a new thread"""
         if not self.is_connected():
             logger.error("Threads collection is not available")
@@ -136,22 +505,27 @@ class MongoDBClient:
                 "updated_at": datetime.utcnow(),
                 "message_count": 0
             }
-            self.threads_collection.insert_one(thread)
+            await self.threads_collection.insert_one(thread)
+            if self.context_cache:
+                self.context_cache.invalidate(thread_id)
             logger.info(f"Thread {thread_id} created for user {user_id}")
             return True
         except Exception as e:
             logger.error(f"Error creating thread: {str(e)}")
             return False
     
-    def update_thread_message_count(self, thread_id: str) -> bool:
+    async def update_thread_message_count(self, thread_id: str) -> bool:
         """Update the message count for a thread"""
         if not self.is_connected():
             logger.error("Collections are not available")
             return False
         
         try:
-            count = self.messages_collection.count_documents({"thread_id": thread_id})
-            self.threads_collection.update_one(
+            await self._flush_pending()
+            count = await self.messages_collection.count_documents({"thread_id": thread_id})
+            if self.context_cache:
+                self.context_cache.invalidate(thread_id)
+            await self.threads_collection.update_one(
                 {"thread_id": thread_id},
                 {
                     "$set": {
@@ -166,51 +540,437 @@ class MongoDBClient:
             logger.error(f"Error updating thread message count: {str(e)}")
             return False
     
-    def get_thread_info(self, thread_id: str) -> Optional[Dict]:
+    async def count_thread_messages(self, thread_id: str) -> int:
+        """Count the messages stored in a thread"""
+        if not self.is_connected():
+            logger.error("Messages collection is not available")
+            return 0
+        
+        try:
+            await self._flush_pending()
+            return await self.messages_collection.count_documents({"thread_id": thread_id})
+        except Exception as e:
+            logger.error(f"Error counting thread messages: {str(e)}")
+            return 0
+    
+    async def load_thread_context(self, thread_id: str, user_id: str, limit: int = 20) -> Dict:
+        """
+        Load thread info, summary and the last 'limit' messages in one query.
+        
+        Returns:
+            Dict with 'thread' (thread document, None if the thread does not exist yet),
+            'summary' and 'messages' (chronological list of 'role'/'content' dicts)
+        
+        Raises:
+            ThreadNotFoundError: The thread is deleted
+        """
+        if not self.is_connected():
+            logger.error("Collections are not available")
+            return _format_thread_context(None)
+        
+        start = time.perf_counter()
+        try:
+            limit = min(limit, 100)
+            
+            if self.context_cache:
+                cached = self.context_cache.get(thread_id, user_id, limit)
+                if cached is not None:
+                    return cached
+                # Load at least a full cache window so later turns can be served from it
+                query_limit = max(limit, self.context_cache.window)
+            else:
+                query_limit = limit
+            
+            cursor = await self.threads_collection.aggregate(
+                _thread_context_pipeline(thread_id, user_id, query_limit)
+            )
+            results = await cursor.to_list(length=None)
+            thread = results[0] if results else None
+            if self.write_buffer:
+                thread = self._overlay_pending(thread, thread_id, user_id, query_limit)
+            if thread is None and await self.threads_collection.find_one(
+                {"thread_id": thread_id, "deleted_at": {"$exists": True}}, {"_id": 1}
+            ):
+                raise ThreadNotFoundError(thread_id)
+            context = _format_thread_context(thread)
+            
+            # A thread that does not exist yet is not cached: another worker may create it
+            if self.context_cache and context["thread"] is not None:
+                self.context_cache.put(
+                    thread_id, user_id, context,
+                    complete=len(context["messages"]) < query_limit
+                )
+            context["messages"] = context["messages"][-limit:] if limit > 0 else []
+            
+            logger.info(f"Loaded context for thread {thread_id}: {len(context['messages'])} messages")
+            return context
+        except ThreadNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Error loading thread context: {str(e)}")
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="context_load")
+    
+    def _overlay_pending(self, thread: Optional[Dict], thread_id: str, user_id: str, limit: int) -> Optional[Dict]:
+        """Merge buffered writes into a _thread_context_pipeline result (newest 'limit' messages)"""
+        recent = thread.pop("recent_messages", []) if thread else []
+        thread = self.write_buffer.overlay_thread(thread_id, thread)
+        if thread is None:
+            return None
+        recent.reverse()
+        recent = self._merge_pending(recent, thread_id, user_id, limit)
+        recent.reverse()
+        thread["recent_messages"] = recent
+        return thread
+    
+    async def _buffer_turn(self, thread_id: str, user_id: str, documents: List[Dict], title: str,
+                           fields: Dict, create: bool) -> Optional[Dict]:
+        """
+        Write-behind commit_turn: buffer the turn and update the cached thread.
+        
+        Returns:
+            The thread as it will be once flushed, or None when it is not cached
+            (callers re-read it with get_thread_info, which sees the buffer)
+        """
+        for document in documents:
+            # Assigned up front so reads can tell buffered from written copies and a retried flush is idempotent
+            document["_id"] = ObjectId()
+        if not await self.write_buffer.add(thread_id, user_id, documents, title, fields, create):
+            raise RuntimeError("write-behind buffer is full")
+        
+        thread = None
+        if self.context_cache:
+            cached, thread = self.context_cache.peek_thread(thread_id, user_id)
+            if cached:
+                thread["message_count"] = thread.get("message_count", 0) + len(documents)
+                thread["updated_at"] = documents[-1]["created_at"]
+                thread.update(fields)
+                self.context_cache.append_messages(thread_id, user_id, documents, thread=thread)
+        logger.info(f"Buffered turn for thread {thread_id} ({self.write_buffer.pending_count()} messages pending)")
+        return thread
+    
+    async def commit_turn(self, thread_id: str, user_id: str, user_message: Dict, assistant_content: str,
+                          title: str = "", user_created_at: Optional[datetime] = None,
+                          unread: bool = False, create: bool = True) -> Optional[Dict]:
+        """
+        Persist one chat turn in two round trips.
+        
+        Inserts the user and assistant messages with insert_many, then upserts the
+        thread (creating it if needed) with $inc on message_count, a fresh updated_at
+        and the last-message preview fields, so the thread list never reads messages.
+        The thread update skips tombstoned threads; when it matches nothing the turn's
+        messages are deleted again and ThreadNotFoundError is raised.
+        In write-behind mode the turn is buffered and written by the next flush instead.
+        
+        Args:
+            unread: Mark the thread unread (the reply was not shown to the user)
+            create: Create the thread if it does not exist (False for turns on an existing thread)
+        
+        Returns:
+            The updated thread document, or None on failure (in write-behind mode also
+            when the thread is not cached)
+        """
+        if not self.is_connected():
+            logger.error("Collections are not available")
+            return None
+        
+        start = time.perf_counter()
+        try:
+            documents = turn_documents(thread_id, user_id, user_message, assistant_content, user_created_at)
+            fields = thread_preview_fields(documents, unread)
+            if self.write_buffer:
+                return await self._buffer_turn(thread_id, user_id, documents, title, fields, create)
+            await self.messages_collection.insert_many(documents)
+            
+            async def update_thread(upsert: bool) -> Optional[Dict]:
+                return await self.threads_collection.find_one_and_update(
+                    {"thread_id": thread_id, **NOT_DELETED},
+                    _turn_thread_update(thread_id, user_id, title, 2, fields=fields),
+                    projection={"_id": 0},
+                    upsert=upsert,
+                    return_document=ReturnDocument.AFTER
+                )
+            
+            try:
+                thread = await update_thread(create)
+            except DuplicateKeyError:
+                # The upsert hit a tombstone (or lost an insert race): update only a live thread
+                thread = await update_thread(False)
+            if thread is None:
+                # Deleted while the reply was generated: take the turn back out
+                await self.messages_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in documents]}})
+                logger.warning(f"Turn for thread {thread_id} not saved: thread missing or deleted")
+                raise ThreadNotFoundError(thread_id)
+            
+            if self.context_cache:
+                self.context_cache.append_messages(thread_id, user_id, documents, thread=thread)
+            logger.info(f"Committed turn to thread {thread_id} ({thread.get('message_count')} messages)")
+            return thread
+        except ThreadNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Error committing turn: {str(e)}")
+            return None
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="db_write")
+    
+    async def mark_thread_read(self, thread_id: str, user_id: str) -> bool:
+        """Clear the thread's unread marker; True if the thread exists"""
+        if not self.is_connected():
+            logger.error("Threads collection is not available")
+            return False
+        
+        try:
+            # A buffered turn flushed afterwards would set the marker again
+            await self._flush_pending()
+            result = await self.threads_collection.update_one(
+                {"thread_id": thread_id, "user_id": user_id, **NOT_DELETED},
+                {"$set": {"unread": False}}
+            )
+            return result.matched_count > 0
+        except Exception as e:
+            logger.error(f"Error marking thread {thread_id} read: {str(e)}")
+            return False
+    
+    async def get_thread_info(self, thread_id: str) -> Optional[Dict]:
         """Get thread information"""
         if not self.is_connected():
             logger.error("Threads collection is not available")
             return None
         
         try:
-            thread = self.threads_collection.find_one({"thread_id": thread_id})
+            thread = await self.threads_collection.find_one({"thread_id": thread_id, **NOT_DELETED})
             if thread:
-                thread.pop("_id", None)  # Remove MongoDB _id
+                thread.pop("_id", None)
+            if self.write_buffer:
+                thread = self.write_buffer.overlay_thread(thread_id, thread)
             return thread
         except Exception as e:
             logger.error(f"Error retrieving thread info: {str(e)}")
             return None
     
-    def save_thread_summary(self, thread_id: str, summary: str) -> bool:
-        """Save or update thread summary in database"""
+    async def _keyset_page(self, collection, base_filter: Dict, field: str, projection: Dict,
+                           limit: int, before: Optional[str], after: Optional[str]) -> Tuple[List[Dict], Optional[str], bool, bool]:
+        """
+        Fetch one keyset page in traversal order.
+        
+        Returns:
+            (documents, next_cursor, has_more, backward); next_cursor points past the last
+            document in traversal order and is None for an empty page
+        """
+        query, sort, backward = keyset_query(base_filter, field, before, after)
+        documents = await (
+            collection.find(query, projection)
+            .sort(sort)
+            .limit(limit + 1)
+            .to_list(length=None)
+        )
+        has_more = len(documents) > limit
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1][field], documents[-1]["_id"]) if documents else None
+        for document in documents:
+            document.pop("_id", None)
+        return documents, next_cursor, has_more, backward
+    
+    async def get_user_threads_page(self, user_id: str, limit: int = 20,
+                                    before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        """
+        Get one page of a user's threads, most recently updated first.
+        
+        Args:
+            limit: Page size (max 100)
+            before: Cursor from a previous page; returns threads updated before it (older)
+            after: Cursor from a previous page; returns threads updated after it (newer)
+            
+        Returns:
+            Dict with 'threads' (only the ThreadInfo fields), 'next_cursor' (continue in the
+            same direction) and 'has_more'
+        """
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        await self._flush_pending()
+        threads, next_cursor, has_more, backward = await self._keyset_page(
+            self.threads_collection, {"user_id": user_id, **NOT_DELETED}, "updated_at",
+            THREAD_LIST_PROJECTION, min(limit, 100), before, after
+        )
+        if not backward:
+            threads.reverse()
+        
+        logger.info(f"Retrieved page of {len(threads)} threads for user {user_id}")
+        return {"threads": threads, "next_cursor": next_cursor, "has_more": has_more}
+    
+    async def get_thread_messages_page(self, thread_id: str, user_id: str, limit: int = 50,
+                                       before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        """
+        Get one page of a thread's messages in chronological order.
+        
+        Without a cursor the latest 'limit' messages are returned.
+        
+        Args:
+            limit: Page size (max 100)
+            before: Cursor from a previous page; returns older messages
+            after: Cursor from a previous page; returns newer messages
+            
+        Returns:
+            Dict with 'messages' ('role'/'content'), 'next_cursor' (continue in the same
+            direction) and 'has_more'
+        """
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        await self._flush_pending()
+        messages, next_cursor, has_more, backward = await self._keyset_page(
+            self.messages_collection, {"thread_id": thread_id, "user_id": user_id}, "created_at",
+            {"role": 1, "content": 1, "created_at": 1}, min(limit, 100), before, after
+        )
+        if backward:
+            messages.reverse()
+        
+        logger.info(f"Retrieved page of {len(messages)} messages from thread {thread_id}")
+        return {
+            "messages": [
+                {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+                for msg in messages
+            ],
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+    
+    async def get_user_threads(self, user_id: str) -> List[Dict]:
+        """Get all threads for a user, most recently updated first"""
+        if not self.is_connected():
+            logger.error("Threads collection is not available")
+            return []
+        
+        try:
+            await self._flush_pending()
+            threads = await (
+                self.threads_collection.find({"user_id": user_id, **NOT_DELETED})
+                .sort("updated_at", -1)
+                .to_list(length=None)
+            )
+            for thread in threads:
+                thread.pop("_id", None)
+            return threads
+        except Exception as e:
+            logger.error(f"Error retrieving user threads: {str(e)}")
+            return []
+    
+    async def save_thread_summary(self, thread_id: str, summary: str,
+                                  summarized_until: Optional[datetime] = None,
+                                  summarized_count: Optional[int] = None,
+                                  expected_summarized_count: Optional[int] = None,
+                                  summarized_until_id: Optional[ObjectId] = None) -> bool:
+        """
+        Save or update thread summary in database.
+        
+        Args:
+            summarized_until: created_at of the newest message the summary covers (high-water mark)
+            summarized_until_id: _id of that message, breaking created_at ties
+            summarized_count: Number of messages the summary covers
+            expected_summarized_count: Only save if the stored summarized_count still has this
+                value, so two concurrent folds cannot overwrite each other
+                
+        Returns:
+            True if the summary was saved
+        """
         if not self.is_connected():
             logger.error("Threads collection is not available")
             return False
         
+        start = time.perf_counter()
         try:
-            self.threads_collection.update_one(
-                {"thread_id": thread_id},
+            # The thread document of a new thread may still be buffered
+            await self._flush_pending()
+            query = {"thread_id": thread_id, **NOT_DELETED}
+            if expected_summarized_count == 0:
+                # Threads summarized before high-water marks existed have no summarized_count
+                query["summarized_count"] = {"$in": [0, None]}
+            elif expected_summarized_count is not None:
+                query["summarized_count"] = expected_summarized_count
+            
+            fields = {
+                "summary": summary,
+                "summary_updated_at": datetime.utcnow()
+            }
+            if summarized_until is not None:
+                fields["summarized_until"] = summarized_until
+                fields["summarized_until_id"] = summarized_until_id
+            if summarized_count is not None:
+                fields["summarized_count"] = summarized_count
+            
+            result = await self.threads_collection.update_one(
+                query,
                 {
-                    "$set": {
-                        "summary": summary,
-                        "summary_updated_at": datetime.utcnow()
-                    }
+                    "$set": fields,
+                    "$inc": {"summary_version": 1}
                 }
             )
+            if result.matched_count == 0:
+                logger.warning(f"Summary for thread {thread_id} not saved: thread missing or summarized concurrently")
+                return False
+            
+            if self.context_cache:
+                self.context_cache.set_summary(thread_id, summary)
             logger.info(f"Summary saved for thread {thread_id}")
             return True
         except Exception as e:
             logger.error(f"Error saving thread summary: {str(e)}")
             return False
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="db_write")
     
-    def get_thread_summary(self, thread_id: str) -> Optional[str]:
+    async def get_messages_since(self, thread_id: str, user_id: str, since: Optional[datetime] = None,
+                                 limit: int = 50, since_id: Optional[ObjectId] = None) -> List[Dict]:
+        """
+        Get the oldest 'limit' messages after (since, since_id) in (created_at, _id) order.
+        
+        Used for incremental summaries: (since, since_id) is the thread's
+        (summarized_until, summarized_until_id) mark. Without since_id (threads
+        summarized before the mark had one) it falls back to created_at > since.
+        
+        Returns:
+            List of messages with 'role', 'content', 'created_at' and 'id' (_id) fields
+        """
+        if not self.is_connected():
+            logger.error("Messages collection is not available")
+            return []
+        
+        try:
+            await self._flush_pending()
+            query = {"thread_id": thread_id, "user_id": user_id}
+            if since is not None and since_id is not None:
+                query = after_position(query, "created_at", since, since_id)
+            elif since is not None:
+                query["created_at"] = {"$gt": since}
+            
+            messages = await (
+                self.messages_collection.find(query, {"role": 1, "content": 1, "created_at": 1})
+                .sort([("created_at", 1), ("_id", 1)])
+                .limit(limit)
+                .to_list(length=None)
+            )
+            for msg in messages:
+                msg["id"] = msg.pop("_id")
+            logger.info(f"Retrieved {len(messages)} unsummarized messages from thread {thread_id}")
+            return messages
+        except Exception as e:
+            logger.error(f"Error retrieving messages since {since}: {str(e)}")
+            return []
+    
+    async def get_thread_summary(self, thread_id: str) -> Optional[str]:
         """Get thread summary from database"""
         if not self.is_connected():
             logger.error("Threads collection is not available")
             return None
         
         try:
-            thread = self.threads_collection.find_one({"thread_id": thread_id})
+            thread = await self.threads_collection.find_one(
+                {"thread_id": thread_id, **NOT_DELETED},
+                {"summary": 1}
+            )
             if thread:
                 summary = thread.get("summary")
                 if summary:
@@ -221,19 +981,124 @@ class MongoDBClient:
             logger.error(f"Error retrieving thread summary: {str(e)}")
             return None
     
-    def close_connection(self):
-        """Close MongoDB connection"""
+    async def delete_thread(self, thread_id: str, user_id: str) -> bool:
+        """
+        Soft-delete a thread: set its deleted_at tombstone in one update, which hides it
+        from listings and context loads. Messages are purged in batches afterwards.
+        
+        Returns:
+            True if the thread existed and was not deleted yet
+        """
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        # Write buffered turns first so the tombstone lands on an existing thread
+        await self._flush_pending()
+        result = await self.threads_collection.update_one(
+            {"thread_id": thread_id, "user_id": user_id, **NOT_DELETED},
+            {"$set": {"deleted_at": datetime.utcnow()}}
+        )
+        if self.context_cache:
+            self.context_cache.invalidate(thread_id)
+        if result.matched_count:
+            logger.info(f"Deleted thread {thread_id} (messages purged in the background)")
+        return result.matched_count > 0
+    
+    async def delete_user_threads(self, user_id: str) -> int:
+        """
+        Soft-delete all threads of a user with one update_many.
+        
+        Returns:
+            Number of threads tombstoned
+        """
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        await self._flush_pending()
+        result = await self.threads_collection.update_many(
+            {"user_id": user_id, **NOT_DELETED},
+            {"$set": {"deleted_at": datetime.utcnow()}}
+        )
+        if self.context_cache:
+            self.context_cache.invalidate_user(user_id)
+        logger.info(f"Deleted {result.modified_count} threads of user {user_id}")
+        return result.modified_count
+    
+    async def deleted_threads(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Tombstoned threads awaiting purge, oldest deletion first (deleted_at_partial index)"""
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        query = {"deleted_at": {"$exists": True}}
+        if user_id is not None:
+            query["user_id"] = user_id
+        return await (
+            self.threads_collection.find(query, {"_id": 0, "thread_id": 1, "user_id": 1})
+            .sort("deleted_at", 1)
+            .limit(limit)
+            .to_list(length=None)
+        )
+    
+    async def purge_messages(self, thread_id: str, user_id: str, batch_size: int = 500) -> int:
+        """
+        Delete one batch of a thread's messages: the _ids of up to `batch_size` messages
+        from the thread_user_created_id index, then one delete_many on those _ids, so no
+        single delete runs long or holds up other writes.
+        """
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        batch = await (
+            self.messages_collection.find({"thread_id": thread_id, "user_id": user_id}, {"_id": 1})
+            .limit(batch_size)
+            .to_list(length=None)
+        )
+        if not batch:
+            return 0
+        result = await self.messages_collection.delete_many({"_id": {"$in": [msg["_id"] for msg in batch]}})
+        return result.deleted_count
+    
+    async def drop_deleted_thread(self, thread_id: str, user_id: str) -> bool:
+        """Remove a tombstoned thread document (live threads are never matched)"""
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        result = await self.threads_collection.delete_one(
+            {"thread_id": thread_id, "user_id": user_id, "deleted_at": {"$exists": True}}
+        )
+        return result.deleted_count > 0
+    
+    async def orphaned_threads(self, older_than: datetime, limit: int = 100) -> List[Dict]:
+        """
+        Threads with messages but no thread document, via one aggregation over
+        messages grouped by thread (a full index scan - meant for the periodic sweep).
+        """
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+        
+        await self._flush_pending()
+        cursor = await self.messages_collection.aggregate([
+            {"$group": {
+                "_id": {"thread_id": "$thread_id", "user_id": "$user_id"},
+                "newest": {"$max": "$created_at"}
+            }},
+            {"$match": {"newest": {"$lt": older_than}}},
+            {"$lookup": {
+                "from": "threads",
+                "localField": "_id.thread_id",
+                "foreignField": "thread_id",
+                "as": "thread"
+            }},
+            {"$match": {"thread": {"$size": 0}}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "thread_id": "$_id.thread_id", "user_id": "$_id.user_id"}}
+        ])
+        return await cursor.to_list(length=None)
+    
+    async def close_connection(self):
+        """Flush the write-behind buffer and close MongoDB connection"""
+        if self.write_buffer and self.is_connected():
+            await self.write_buffer.stop()
         if self.client:
-            self.client.close()
-            logger.info("MongoDB connection closed")
-
-# Initialize MongoDB client singleton
-try:
-    db_client = MongoDBClient()
-    if db_client.is_connected():
-        logger.info("Database client initialized successfully")
-    else:
-        logger.warning("Database client initialized but not connected")
-except Exception as e:
-    logger.error(f"Failed to initialize database client: {str(e)}")
-    db_client = None
+            await self.client.close()
+            logger.info("MongoDB connection closed (async)")
@@ -0,0 +1,181 @@
+"""
+Index diagnostics for the hot MongoDB queries.
+
+Runs explain() on each query shape the request handlers use, including the
+thread context aggregation and its $lookup sub-pipeline, and fails if any of
+them does a collection scan (COLLSCAN) or a blocking in-memory sort (SORT), or
+if a required index is missing.
+
+Connecting with MongoDBClient already runs ensure_indexes(), so a failure here
+means an index could not be built (e.g. duplicate thread_id values blocking the
+unique index, or the first schema's indexes still present) or a query shape no
+longer matches the index definitions.
+
+The first schema's single-field indexes (SUPERSEDED_INDEXES) are only dropped
+here, on request, never by the app on startup.
+
+Usage:
+    python -m app.db_diagnostics                     # exit code 1 on problems
+    python -m app.db_diagnostics --drop-superseded   # once, when upgrading from the first schema
+"""
+import argparse
+import sys
+from datetime import datetime
+from typing import Dict, List, Set
+
+from bson import ObjectId
+
+from app.database import (
+    MongoDBClient, NOT_DELETED, THREAD_LIST_PROJECTION, _thread_context_pipeline, after_position, encode_cursor,
+    keyset_query
+)
+
+# Stages that mean the query is not served by an index
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+def _plan_stages(plan) -> Set[str]:
+    """Collect every 'stage' name in an explain() winning plan (classic and SBE formats)"""
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= _plan_stages(item)
+    return stages
+
+
+def _winning_plans(explain) -> List:
+    """Every winningPlan in an explain() result, skipping rejected plans (find and aggregate formats)"""
+    plans = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                plans.append(value)
+            elif key != "rejectedPlans":
+                plans.extend(_winning_plans(value))
+    elif isinstance(explain, list):
+        for item in explain:
+            plans.extend(_winning_plans(item))
+    return plans
+
+
+def _lookup_collection_scans(explain) -> int:
+    """Collection scans reported by $lookup stages (executionStats verbosity, MongoDB 5.0+)"""
+    scans = 0
+    for stage in explain.get("stages", []) if isinstance(explain, dict) else []:
+        if "$lookup" in stage:
+            scans += stage.get("collectionScans", 0)
+    return scans
+
+
+def hot_queries(db: MongoDBClient) -> Dict[str, object]:
+    """Cursors with the same filter/sort/limit shape as the request handlers"""
+    thread_id = "diagnostics-thread"
+    user_id = "diagnostics-user"
+    cursor = encode_cursor(datetime.utcnow(), ObjectId())
+    messages = db.messages_collection
+    threads = db.threads_collection
+    
+    messages_query, messages_sort, _ = keyset_query(
+        {"thread_id": thread_id, "user_id": user_id}, "created_at", cursor, None
+    )
+    threads_query, threads_sort, _ = keyset_query({"user_id": user_id, **NOT_DELETED}, "updated_at", cursor, None)
+    
+    return {
+        "get_thread_messages": messages.find({"thread_id": thread_id, "user_id": user_id}).sort("created_at", -1).limit(20),
+        "get_thread_messages_page": messages.find(messages_query).sort(messages_sort).limit(51),
+        "purge_messages": messages.find({"thread_id": thread_id, "user_id": user_id}, {"_id": 1}).limit(500),
+        "get_messages_since": messages.find(
+            after_position({"thread_id": thread_id, "user_id": user_id}, "created_at", datetime.utcnow(), ObjectId())
+        ).sort([("created_at", 1), ("_id", 1)]).limit(50),
+        "count_thread_messages": messages.find({"thread_id": thread_id}),
+        "get_thread_info": threads.find({"thread_id": thread_id, **NOT_DELETED}).limit(1),
+        "get_user_threads": threads.find({"user_id": user_id, **NOT_DELETED}).sort("updated_at", -1),
+        "deleted_threads": threads.find({"deleted_at": {"$exists": True}}).sort("deleted_at", 1).limit(100),
+        "get_user_threads_page": threads.find(threads_query, THREAD_LIST_PROJECTION).sort(threads_sort).limit(21)
+    }
+
+
+def hot_pipelines(db: MongoDBClient) -> Dict[str, tuple]:
+    """(collection, pipeline) pairs for the aggregations the request handlers run"""
+    pipeline = _thread_context_pipeline("diagnostics-thread", "diagnostics-user", 20)
+    lookup = next(stage["$lookup"] for stage in pipeline if "$lookup" in stage)
+    
+    return {
+        "load_thread_context": (db.threads_collection, pipeline),
+        # The sub-pipeline only uses literal values, so run on its own it gets the plan $lookup uses
+        "load_thread_context.$lookup": (db.db[lookup["from"]], lookup["pipeline"])
+    }
+
+
+def _explain_aggregate(db: MongoDBClient, collection, pipeline: List[Dict]) -> Dict:
+    """explain() for an aggregation; executionStats so $lookup stages report their collection scans"""
+    return db.db.command(
+        "explain", {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}},
+        verbosity="executionStats"
+    )
+
+
+def _check(name: str, explain: Dict) -> List[str]:
+    """Print the winning plan stages of one explain() result and return its problems"""
+    stages = set()
+    for plan in _winning_plans(explain):
+        stages |= _plan_stages(plan)
+    bad = stages & BAD_STAGES
+    if _lookup_collection_scans(explain):
+        bad.add("COLLSCAN in $lookup")
+    status = "FAIL" if bad else "ok"
+    print(f"[{status:>4}] {name}: {', '.join(sorted(stages))}")
+    return [f"{name} uses {', '.join(sorted(bad))}"] if bad else []
+
+
+def check_queries(db: MongoDBClient) -> List[str]:
+    """Explain each hot query and aggregation and return a list of problems"""
+    problems = []
+    for name, cursor in hot_queries(db).items():
+        problems.extend(_check(name, cursor.explain()))
+    for name, (collection, pipeline) in hot_pipelines(db).items():
+        problems.extend(_check(name, _explain_aggregate(db, collection, pipeline)))
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Verify indexes for the hot MongoDB queries")
+    parser.add_argument("--drop-superseded", action="store_true",
+                        help="Drop the first schema's single-field indexes and build the ones they block")
+    args = parser.parse_args()
+
+    db = MongoDBClient()
+    if not db.is_connected():
+        print("MongoDB is not reachable at MONGODB_URL")
+        return 2
+
+    try:
+        if args.drop_superseded:
+            for name in db.drop_superseded_indexes():
+                print(f"Dropped superseded index {name}")
+        else:
+            for name in db.superseded_indexes():
+                print(f"Superseded index {name} still present (drop with --drop-superseded)")
+
+        problems = [f"missing index {name}" for name in db.verify_indexes()]
+        problems.extend(check_queries(db))
+    finally:
+        db.close_connection()
+
+    if problems:
+        print("\nIndex check failed:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+
+    print("\nAll hot queries are index-backed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Metrics recorded by the chat pipeline, rendered at GET /metrics.
+
+Stage names used with STAGE_SECONDS:
+    context_load     thread summary + recent messages (cache or MongoDB)
+    prompt_assembly  token-budgeted prompt packing
+    llm_ttft         time to the first streamed token
+    llm_total        whole completion (streamed or not)
+    db_write         commit_turn / save_message / save_thread_summary
+"""
+from app.metrics.registry import registry
+
+STAGE_SECONDS = registry.histogram(
+    "chat_stage_duration_seconds",
+    "Time spent in each stage of a chat turn",
+    ["stage"]
+)
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"]
+)
+HTTP_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration, including the streamed body",
+    ["method", "route"]
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served"
+)
+
+LLM_IN_FLIGHT = registry.gauge(
+    "llm_requests_in_flight",
+    "LLM completions holding a concurrency slot"
+)
+LLM_REQUESTS = registry.counter(
+    "llm_requests_total",
+    "LLM completions by backend and outcome",
+    ["backend", "outcome"]
+)
+LLM_FAILOVERS = registry.counter(
+    "llm_failovers_total",
+    "Completions retried on the next backend after a failure",
+    ["purpose"]
+)
+LLM_HEDGES = registry.counter(
+    "llm_hedged_requests_total",
+    "Completions also sent to a second backend because the first was slower than its p95",
+    ["purpose"]
+)
+LLM_RETRIES = registry.counter(
+    "llm_retries_total",
+    "Completion attempts retried on the same backend, by reason (429, 5xx, ...)",
+    ["backend", "reason"]
+)
+LLM_THROTTLE_SECONDS = registry.counter(
+    "llm_throttle_wait_seconds_total",
+    "Time completions waited on the client-side rate limiter or a Retry-After pause",
+    ["backend"]
+)
+LLM_CIRCUIT_OPEN = registry.gauge(
+    "llm_circuit_open",
+    "1 while a backend's circuit breaker is open",
+    ["backend"]
+)
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM provider's usage field (cached = prompt tokens served from the provider's prefix cache)",
+    ["direction"]
+)
+
+RESPONSE_CACHE_LOOKUPS = registry.counter(
+    "response_cache_lookups_total",
+    "Response cache lookups for context-free questions by result",
+    ["result"]
+)
+
+DEDUPLICATED_REQUESTS = registry.counter(
+    "chat_turn_dedup_total",
+    "Chat turns by deduplication result (fresh, coalesced with an in-flight turn, replayed by Idempotency-Key)",
+    ["result"]
+)
+
+ADMISSION_REJECTIONS = registry.counter(
+    "admission_rejections_total",
+    "Chat requests rejected by admission control (concurrency, rate, queue_timeout)",
+    ["reason"]
+)
+ADMISSION_QUEUE_WAIT = registry.histogram(
+    "admission_queue_wait_seconds",
+    "Time an LLM call waited for a slot in the fair scheduler"
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "admission_queue_depth",
+    "LLM calls waiting for a slot in the fair scheduler"
+)
+
+WRITE_BUFFER_PENDING = registry.gauge(
+    "write_buffer_pending_messages",
+    "Messages in the write-behind buffer not yet written to the database"
+)
+WRITE_BUFFER_FLUSHED = registry.counter(
+    "write_buffer_flushed_total",
+    "Documents written by write-behind flushes (messages, threads)",
+    ["kind"]
+)
+WRITE_BUFFER_FLUSH_SECONDS = registry.histogram(
+    "write_buffer_flush_seconds",
+    "Duration of one write-behind flush (insert_many + bulk thread update)"
+)
+
+MONGO_POOL_CHECKOUT_WAIT = registry.histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time to check out a MongoDB connection, including waiting for a free slot and opening a new one",
+    ["address", "outcome"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+MONGO_POOL_CHECKOUT_FAILURES = registry.counter(
+    "mongo_pool_checkout_failures_total",
+    "MongoDB connection checkouts that failed (timeout = wait queue timeout, connectionError, poolClosed)",
+    ["address", "reason"]
+)
+MONGO_POOL_WAITING = registry.gauge(
+    "mongo_pool_checkouts_waiting",
+    "Operations waiting to check out a MongoDB connection",
+    ["address"]
+)
+MONGO_POOL_CONNECTIONS = registry.gauge(
+    "mongo_pool_connections",
+    "Open MongoDB connections in the pool (idle + checked out)",
+    ["address"]
+)
+MONGO_POOL_CHECKED_OUT = registry.gauge(
+    "mongo_pool_connections_checked_out",
+    "MongoDB connections currently in use by an operation",
+    ["address"]
+)
+MONGO_POOL_CONNECTIONS_CREATED = registry.counter(
+    "mongo_pool_connections_created_total",
+    "MongoDB connections opened",
+    ["address"]
+)
+MONGO_POOL_CONNECTIONS_CLOSED = registry.counter(
+    "mongo_pool_connections_closed_total",
+    "MongoDB connections closed by reason (idle, stale, error, poolClosed)",
+    ["address", "reason"]
+)
+MONGO_POOL_CLEARED = registry.counter(
+    "mongo_pool_cleared_total",
+    "Times a MongoDB connection pool was cleared after a network or server error",
+    ["address"]
+)
+
+PURGED = registry.counter(
+    "storage_purged_total",
+    "Documents removed by background purges of deleted threads (messages, threads, orphan_messages)",
+    ["kind"]
+)
+
+BACKGROUND_JOB_WAIT = registry.histogram(
+    "background_job_wait_seconds",
+    "Time a background job spent queued before a worker picked it up",
+    ["queue"]
+)
+BACKGROUND_JOB_DURATION = registry.histogram(
+    "background_job_duration_seconds",
+    "Background job run time",
+    ["queue", "outcome"]
+)
+BACKGROUND_QUEUE_DEPTH = registry.gauge(
+    "background_queue_depth",
+    "Jobs waiting in a background queue",
+    ["queue"]
+)
+
+
+def record_usage(usage):
+    """Add prompt/completion token counts from a provider usage object (ignored when missing)"""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, direction="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, direction="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is not None:
+        LLM_TOKENS.inc(getattr(details, "cached_tokens", 0) or 0, direction="cached")
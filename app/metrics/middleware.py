@@ -0,0 +1,40 @@
+from app.metrics.chat_metrics import HTTP_DURATION, HTTP_IN_FLIGHT, HTTP_REQUESTS
+import time
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request count, duration and in-flight requests.
+
+    Unlike an @app.middleware("http") function it does not wrap the response in a
+    second stream, and the duration covers the whole streamed (SSE) body. Requests
+    are labelled by route template (/api/threads/{user_id}) to keep cardinality low.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_DURATION.observe(time.perf_counter() - start, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=str(status))
@@ -0,0 +1,79 @@
+"""
+MongoDB connection pool telemetry: a pymongo ConnectionPoolListener exporting
+checkout wait time, pool size and connection churn to the metrics registry.
+
+Register it on the client with `event_listeners=[pool_listener]`. Events of an
+AsyncMongoClient fire on the event loop; the sync MongoClient (diagnostics only)
+fires them on its calling threads.
+"""
+from app.metrics.chat_metrics import (
+    MONGO_POOL_CHECKED_OUT,
+    MONGO_POOL_CHECKOUT_FAILURES,
+    MONGO_POOL_CHECKOUT_WAIT,
+    MONGO_POOL_CLEARED,
+    MONGO_POOL_CONNECTIONS,
+    MONGO_POOL_CONNECTIONS_CLOSED,
+    MONGO_POOL_CONNECTIONS_CREATED,
+    MONGO_POOL_WAITING
+)
+from pymongo import monitoring
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}" if port else host
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Records per server address:
+        - time from checkout start to a connection (including opening a new one)
+        - open, checked-out and waiting connections
+        - connections created/closed (by close reason) and pool clears
+    """
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        MONGO_POOL_CLEARED.inc(address=_address(event))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        address = _address(event)
+        MONGO_POOL_CONNECTIONS_CREATED.inc(address=address)
+        MONGO_POOL_CONNECTIONS.inc(address=address)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        address = _address(event)
+        MONGO_POOL_CONNECTIONS_CLOSED.inc(address=address, reason=event.reason)
+        MONGO_POOL_CONNECTIONS.dec(address=address)
+
+    def connection_check_out_started(self, event):
+        MONGO_POOL_WAITING.inc(address=_address(event))
+
+    def connection_check_out_failed(self, event):
+        address = _address(event)
+        MONGO_POOL_WAITING.dec(address=address)
+        MONGO_POOL_CHECKOUT_FAILURES.inc(address=address, reason=event.reason)
+        MONGO_POOL_CHECKOUT_WAIT.observe(event.duration, address=address, outcome="failed")
+
+    def connection_checked_out(self, event):
+        address = _address(event)
+        MONGO_POOL_WAITING.dec(address=address)
+        MONGO_POOL_CHECKED_OUT.inc(address=address)
+        MONGO_POOL_CHECKOUT_WAIT.observe(event.duration, address=address, outcome="ok")
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.dec(address=_address(event))
+
+
+pool_listener = PoolMetricsListener()
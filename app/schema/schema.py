@@ -76,10 +76,16 @@ class ThreadInfo(BaseModel):
     message_count: int = 0
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
+    last_message_preview: Optional[str] = None  # Start of the newest message
+    last_message_role: Optional[str] = None
+    unread: bool = False  # Has a reply the user has not opened yet (see POST .../read)
+    summary_version: int = 0
 
 class ThreadListResponse(BaseModel):
     threads: List[ThreadInfo]
-    total: int
+    total: int  # Threads in this page
+    next_cursor: Optional[str] = None  # Pass as 'before' (or 'after') to continue paging
+    has_more: bool = False
     success: bool = True
 
 class ThreadDeleteResponse(BaseModel):
@@ -87,6 +93,11 @@ class ThreadDeleteResponse(BaseModel):
     success: bool = True
     message: str = "Thread deleted successfully"
 
+class UserThreadsDeleteResponse(BaseModel):
+    user_id: str
+    threads_deleted: int  # Threads hidden now; their messages are purged in the background
+    success: bool = True
+
 class ContextAwareChatRequest(BaseModel):
     """Chat request with optional thread_id for context-aware responses"""
     messages: List[Message]
@@ -96,4 +107,37 @@ class ContextAwareChatRequest(BaseModel):
 class ThreadMessagesRequest(BaseModel):
     """Combined request for thread messages (fetch mode) or chat (chat mode)"""
     messages: Optional[List[Message]] = None  # If provided: chat mode, else: fetch mode
-    # limit: Optional[int] = None  # For fetch mode: max messages to retrieve
\ No newline at end of file
+    # limit: Optional[int] = None  # For fetch mode: max messages to retrieve
+
+class BatchChatItem(BaseModel):
+    """One conversation in a batch; 'id' is echoed back with its result"""
+    id: Optional[str] = None
+    messages: List[Message]
+    
+    @field_validator('messages')
+    @classmethod
+    def validate_messages(cls, v):
+        if not v:
+            raise ValueError('messages list cannot be empty')
+        return v
+
+class BatchChatRequest(BaseModel):
+    """Independent conversations answered with bounded concurrency, results streamed as NDJSON"""
+    items: List[BatchChatItem]
+    user_id: str
+    persist: bool = False  # Save each conversation as a new thread
+    max_concurrency: Optional[int] = None  # Capped by BATCH_MAX_CONCURRENCY
+    
+    @field_validator('items')
+    @classmethod
+    def validate_items(cls, v):
+        if not v:
+            raise ValueError('items list cannot be empty')
+        return v
+    
+    @field_validator('user_id')
+    @classmethod
+    def validate_user_id(cls, v):
+        if not v or not v.strip():
+            raise ValueError('user_id cannot be empty')
+        return v
@@ -0,0 +1,289 @@
+"""
+Storage interface for chat threads and messages.
+
+Everything the request handlers persist goes through a ChatStorage:
+AsyncMongoDBClient (app/database.py) for MongoDB, SQLiteStorage for an embedded
+SQLite file and MemoryStorage for a single process without persistence.
+create_storage (app/storage/factory.py) picks one from STORAGE_BACKEND.
+
+All backends return the same shapes: thread documents as dicts with thread_id,
+user_id, title, message_count, created_at / updated_at (naive UTC datetimes),
+the thread-list preview fields (THREAD_LIST_FIELDS) and the summary fields once
+set; messages as 'role' / 'content' dicts.
+"""
+from config import settings
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import json
+
+# Thread fields returned by get_user_threads_page. The preview fields are written
+# with every turn commit, so the list needs no per-thread message query.
+THREAD_LIST_FIELDS = (
+    "thread_id", "user_id", "title", "message_count", "created_at", "updated_at",
+    "last_message_preview", "last_message_role", "unread", "summary_version"
+)
+
+
+class ThreadNotFoundError(LookupError):
+    """A turn was committed to a thread that does not exist (any more), e.g. one deleted while its reply was generated"""
+
+
+def encode_cursor(value: datetime, doc_id: Any) -> str:
+    """Encode a (sort value, unique id) position as an opaque URL-safe cursor"""
+    payload = json.dumps({"v": value.isoformat(), "id": str(doc_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor_key(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by encode_cursor into (sort value, id string); raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["v"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def to_millis(value: datetime) -> datetime:
+    """Truncate to millisecond precision (what MongoDB stores)"""
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def turn_documents(thread_id: str, user_id: str, user_message: Dict, assistant_content: str,
+                   user_created_at: Optional[datetime] = None) -> List[Dict]:
+    """Build the user/assistant message documents for one turn with strictly ordered timestamps"""
+    now = to_millis(datetime.utcnow())
+    user_created_at = to_millis(user_created_at or now)
+    # MongoDB stores milliseconds, keep the assistant reply strictly after the user message
+    assistant_created_at = max(now, user_created_at + timedelta(milliseconds=1))
+    return [
+        {
+            "thread_id": thread_id,
+            "user_id": user_id,
+            "role": user_message.get("role", "user"),
+            "content": user_message.get("content", ""),
+            "created_at": user_created_at
+        },
+        {
+            "thread_id": thread_id,
+            "user_id": user_id,
+            "role": "assistant",
+            "content": assistant_content,
+            "created_at": assistant_created_at
+        }
+    ]
+
+
+def thread_preview_fields(documents: List[Dict], unread: bool = False) -> Dict:
+    """
+    Denormalized thread-list fields for a committed turn.
+
+    Args:
+        documents: The turn's message documents, oldest first
+        unread: Whether the reply has not been shown to the user yet
+
+    Returns:
+        Dict with 'last_message_preview' (whitespace collapsed, cut to
+        THREAD_PREVIEW_CHARS), 'last_message_role' and 'unread'
+    """
+    last = documents[-1]
+    preview = " ".join(last.get("content", "").split())
+    if len(preview) > settings.THREAD_PREVIEW_CHARS:
+        preview = preview[:settings.THREAD_PREVIEW_CHARS - 1].rstrip() + "…"
+    return {"last_message_preview": preview, "last_message_role": last.get("role"), "unread": unread}
+
+
+def format_messages(messages: List[Dict]) -> List[Dict]:
+    """Reduce stored messages to the 'role' / 'content' dicts the handlers use"""
+    return [
+        {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+        for msg in messages
+    ]
+
+
+class ChatStorage:
+    """
+    Thread and message storage used by main.py and the LLM service.
+
+    Read methods return empty results ([] / None) when the backend fails, write
+    methods return False / None; paginated reads and the delete / purge methods
+    raise RuntimeError when not connected and ValueError for a malformed cursor.
+
+    Deletes are soft: delete_thread sets a `deleted_at` tombstone that hides the
+    thread from listings and context loads at once. The messages and the thread
+    document are removed later, batch by batch, with purge_messages and
+    drop_deleted_thread (see app/background/purge.py).
+    """
+
+    name = "base"
+    # Optional in-process ThreadContextCache / WriteBehindBuffer (see AsyncMongoDBClient)
+    context_cache = None
+    write_buffer = None
+
+    async def connect(self) -> bool:
+        """Open the backend (create tables / indexes); False if it is unreachable"""
+        raise NotImplementedError
+
+    def is_connected(self) -> bool:
+        raise NotImplementedError
+
+    async def close_connection(self):
+        raise NotImplementedError
+
+    async def load_thread_context(self, thread_id: str, user_id: str, limit: int = 20) -> Dict:
+        """
+        Load thread info, summary and the last 'limit' messages.
+
+        Returns:
+            Dict with 'thread' (thread document, None if the thread does not exist yet),
+            'summary' and 'messages' (chronological list of 'role'/'content' dicts)
+
+        Raises:
+            ThreadNotFoundError: The thread is deleted
+        """
+        raise NotImplementedError
+
+    async def get_thread_messages(self, thread_id: str, user_id: str, limit: int = 10) -> List[Dict]:
+        """Get the last 'limit' messages of a thread in chronological order (max 100)"""
+        raise NotImplementedError
+
+    async def commit_turn(self, thread_id: str, user_id: str, user_message: Dict, assistant_content: str,
+                          title: str = "", user_created_at: Optional[datetime] = None,
+                          unread: bool = False, create: bool = True) -> Optional[Dict]:
+        """
+        Save the user and assistant message of one turn and create or update the
+        thread (message_count += 2, fresh updated_at, thread_preview_fields; title
+        is set on creation) atomically. A deleted thread is never updated.
+
+        Args:
+            unread: Mark the thread unread (the reply was not shown to the user, e.g. batch answers)
+            create: Create the thread if it does not exist; False for a turn on an existing
+                thread, so a turn racing a delete cannot bring the thread back
+
+        Returns:
+            The updated thread document, or None on failure
+
+        Raises:
+            ThreadNotFoundError: The thread is deleted, or missing and `create` is False
+                (nothing is saved)
+        """
+        raise NotImplementedError
+
+    async def mark_thread_read(self, thread_id: str, user_id: str) -> bool:
+        """
+        Clear the thread's unread marker.
+
+        Returns:
+            True if the thread exists
+        """
+        raise NotImplementedError
+
+    async def get_thread_info(self, thread_id: str) -> Optional[Dict]:
+        """Get the thread document"""
+        raise NotImplementedError
+
+    async def get_messages_since(self, thread_id: str, user_id: str, since: Optional[datetime] = None,
+                                 limit: int = 50, since_id: Any = None) -> List[Dict]:
+        """
+        Get the oldest 'limit' messages after the (since, since_id) position, in
+        (created_at, id) order - the tie-breaker the keyset cursors use, so a limit
+        that falls between two messages with the same created_at skips neither.
+
+        Args:
+            since: created_at of the last message already seen (summarized_until)
+            since_id: Its id (summarized_until_id); without it, messages created after `since`
+
+        Returns:
+            List of messages with 'role', 'content', 'created_at' and 'id' fields
+        """
+        raise NotImplementedError
+
+    async def save_thread_summary(self, thread_id: str, summary: str,
+                                  summarized_until: Optional[datetime] = None,
+                                  summarized_count: Optional[int] = None,
+                                  expected_summarized_count: Optional[int] = None,
+                                  summarized_until_id: Any = None) -> bool:
+        """
+        Save or update the thread summary.
+
+        Args:
+            summarized_until: created_at of the newest message the summary covers (high-water mark)
+            summarized_until_id: id of that message (get_messages_since), breaking created_at ties
+            summarized_count: Number of messages the summary covers
+            expected_summarized_count: Only save if the stored summarized_count still has this
+                value (0 also matches a thread without one)
+
+        Returns:
+            True if the summary was saved
+        """
+        raise NotImplementedError
+
+    async def get_user_threads_page(self, user_id: str, limit: int = 20,
+                                    before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        """
+        Get one page of a user's threads, most recently updated first.
+
+        Returns:
+            Dict with 'threads' (THREAD_LIST_FIELDS), 'next_cursor' and 'has_more'
+        """
+        raise NotImplementedError
+
+    async def get_thread_messages_page(self, thread_id: str, user_id: str, limit: int = 50,
+                                       before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        """
+        Get one page of a thread's messages in chronological order (latest page without a cursor).
+
+        Returns:
+            Dict with 'messages' ('role'/'content'), 'next_cursor' and 'has_more'
+        """
+        raise NotImplementedError
+
+    async def delete_thread(self, thread_id: str, user_id: str) -> bool:
+        """
+        Soft-delete a thread: tombstone it (one atomic write); messages are purged later.
+
+        Returns:
+            True if the thread existed and was not deleted yet
+        """
+        raise NotImplementedError
+
+    async def delete_user_threads(self, user_id: str) -> int:
+        """
+        Soft-delete all threads of a user.
+
+        Returns:
+            Number of threads tombstoned
+        """
+        raise NotImplementedError
+
+    async def deleted_threads(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Tombstoned threads awaiting purge ('thread_id' / 'user_id' dicts), oldest deletion first"""
+        raise NotImplementedError
+
+    async def purge_messages(self, thread_id: str, user_id: str, batch_size: int = 500) -> int:
+        """
+        Delete up to `batch_size` messages of a thread.
+
+        Returns:
+            Number of messages deleted; fewer than batch_size means none are left
+        """
+        raise NotImplementedError
+
+    async def drop_deleted_thread(self, thread_id: str, user_id: str) -> bool:
+        """Remove a tombstoned thread document; True if one was removed"""
+        raise NotImplementedError
+
+    async def orphaned_threads(self, older_than: datetime, limit: int = 100) -> List[Dict]:
+        """
+        Threads that have messages but no thread document (left by a crash between
+        purge steps, or a turn committed while its thread was being purged).
+
+        Args:
+            older_than: Only threads whose newest message is older (a brand-new thread's
+                messages are written just before its thread document)
+
+        Returns:
+            'thread_id' / 'user_id' dicts
+        """
+        raise NotImplementedError
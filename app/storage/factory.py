@@ -0,0 +1,44 @@
+"""
+Builds the ChatStorage singleton the request handlers use, from STORAGE_BACKEND.
+
+The MongoDB client module is only imported for the "mongo" backend, so SQLite and
+in-memory deployments do not need a reachable MongoDB server.
+"""
+from config import settings
+from app.storage.base import ChatStorage
+from app.storage.memory_storage import MemoryStorage
+from app.storage.sqlite_storage import SQLiteStorage
+import logging
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ("mongo", "sqlite", "memory")
+
+
+def create_storage(backend: str) -> ChatStorage:
+    """
+    Create a storage backend; call connect() on it once the event loop is running.
+
+    Args:
+        backend: "mongo", "sqlite" (file at SQLITE_PATH) or "memory"
+
+    Raises:
+        ValueError: Unknown backend name
+    """
+    if backend == "mongo":
+        from app.database import AsyncMongoDBClient
+        return AsyncMongoDBClient()
+    if backend == "sqlite":
+        return SQLiteStorage(settings.SQLITE_PATH)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected one of: {', '.join(STORAGE_BACKENDS)}")
+
+
+# Storage singleton used by the request handlers (connected in main.py lifespan)
+try:
+    storage = create_storage(settings.STORAGE_BACKEND)
+    logger.info(f"Using {storage.name} storage backend")
+except Exception as e:
+    logger.error(f"Failed to initialize storage backend: {str(e)}")
+    storage = None
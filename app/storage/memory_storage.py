@@ -0,0 +1,274 @@
+"""
+In-memory storage backend: threads and messages in dicts of this worker process.
+
+Nothing is persisted and nothing is shared between workers, so it is meant for
+tests, local development and benchmarking the app without a database round trip.
+"""
+from app.storage.base import (
+    THREAD_LIST_FIELDS, ChatStorage, ThreadNotFoundError, decode_cursor_key, encode_cursor, format_messages, thread_preview_fields,
+    turn_documents
+)
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStorage(ChatStorage):
+    """ChatStorage on in-process dicts; returned thread documents are copies"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._threads: Dict[str, Dict] = {}
+        # (thread_id, user_id) -> messages in (created_at, seq) order
+        self._messages: Dict[Tuple[str, str], List[Dict]] = {}
+        self._seq = itertools.count(1)
+        self._connected = False
+
+    async def connect(self) -> bool:
+        self._connected = True
+        logger.info("Using in-memory storage (not persisted)")
+        return True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def close_connection(self):
+        self._connected = False
+
+    def _recent(self, thread_id: str, user_id: str, limit: int) -> List[Dict]:
+        messages = self._messages.get((thread_id, user_id), [])
+        return format_messages(messages[-limit:]) if limit > 0 else []
+
+    async def load_thread_context(self, thread_id: str, user_id: str, limit: int = 20) -> Dict:
+        if "deleted_at" in self._threads.get(thread_id, {}):
+            raise ThreadNotFoundError(thread_id)
+        thread = await self.get_thread_info(thread_id)
+        if thread is None:
+            return {"thread": None, "summary": None, "messages": []}
+        return {
+            "thread": thread,
+            "summary": thread.get("summary"),
+            "messages": self._recent(thread_id, user_id, min(limit, 100))
+        }
+
+    async def get_thread_messages(self, thread_id: str, user_id: str, limit: int = 10) -> List[Dict]:
+        return self._recent(thread_id, user_id, min(limit, 100))
+
+    async def commit_turn(self, thread_id: str, user_id: str, user_message: Dict, assistant_content: str,
+                          title: str = "", user_created_at: Optional[datetime] = None,
+                          unread: bool = False, create: bool = True) -> Optional[Dict]:
+        thread = self._threads.get(thread_id)
+        if (thread is None and not create) or (thread is not None and "deleted_at" in thread):
+            raise ThreadNotFoundError(thread_id)
+
+        documents = turn_documents(thread_id, user_id, user_message, assistant_content, user_created_at)
+        messages = self._messages.setdefault((thread_id, user_id), [])
+        for document in documents:
+            document["_seq"] = next(self._seq)
+            if messages and messages[-1]["created_at"] > document["created_at"]:
+                # A turn received earlier finished later: keep (created_at, seq) order
+                index = bisect_right([msg["created_at"] for msg in messages], document["created_at"])
+                messages.insert(index, document)
+            else:
+                messages.append(document)
+
+        if thread is None:
+            thread = self._threads[thread_id] = {
+                "thread_id": thread_id,
+                "user_id": user_id,
+                "title": title,
+                "created_at": documents[0]["created_at"],
+                "message_count": 0,
+                "_seq": next(self._seq)
+            }
+        thread["message_count"] += len(documents)
+        thread["updated_at"] = documents[-1]["created_at"]
+        thread.update(thread_preview_fields(documents, unread))
+        thread["_seq"] = next(self._seq)
+        return self._public(thread)
+
+    async def mark_thread_read(self, thread_id: str, user_id: str) -> bool:
+        thread = self._threads.get(thread_id)
+        if thread is None or thread["user_id"] != user_id or "deleted_at" in thread:
+            return False
+        thread["unread"] = False
+        return True
+
+    @staticmethod
+    def _public(document: Dict) -> Dict:
+        return {key: value for key, value in document.items() if key != "_seq"}
+
+    async def get_thread_info(self, thread_id: str) -> Optional[Dict]:
+        thread = self._threads.get(thread_id)
+        return self._public(thread) if thread and "deleted_at" not in thread else None
+
+    async def get_messages_since(self, thread_id: str, user_id: str, since: Optional[datetime] = None,
+                                 limit: int = 50, since_id: Any = None) -> List[Dict]:
+        messages = self._messages.get((thread_id, user_id), [])
+        if since is None:
+            start = 0
+        elif since_id is None:
+            start = bisect_right([msg["created_at"] for msg in messages], since)
+        else:
+            start = bisect_right([(msg["created_at"], msg["_seq"]) for msg in messages], (since, since_id))
+        return [
+            {"role": msg["role"], "content": msg["content"], "created_at": msg["created_at"], "id": msg["_seq"]}
+            for msg in messages[start:start + limit]
+        ]
+
+    async def save_thread_summary(self, thread_id: str, summary: str,
+                                  summarized_until: Optional[datetime] = None,
+                                  summarized_count: Optional[int] = None,
+                                  expected_summarized_count: Optional[int] = None,
+                                  summarized_until_id: Any = None) -> bool:
+        thread = self._threads.get(thread_id)
+        if thread is None or "deleted_at" in thread or (
+            expected_summarized_count is not None
+            and (thread.get("summarized_count") or 0) != expected_summarized_count
+        ):
+            logger.warning(f"Summary for thread {thread_id} not saved: thread missing or summarized concurrently")
+            return False
+
+        thread["summary"] = summary
+        thread["summary_updated_at"] = datetime.utcnow()
+        thread["summary_version"] = thread.get("summary_version", 0) + 1
+        if summarized_until is not None:
+            thread["summarized_until"] = summarized_until
+            thread["summarized_until_id"] = summarized_until_id
+        if summarized_count is not None:
+            thread["summarized_count"] = summarized_count
+        return True
+
+    @staticmethod
+    def _keyset_page(documents: List[Dict], field: str, limit: int,
+                     before: Optional[str], after: Optional[str]) -> Tuple[List[Dict], Optional[str], bool, bool]:
+        """
+        One keyset page over `documents` sorted by (field, _seq).
+
+        Returns:
+            (documents, next_cursor, has_more, backward)
+        """
+        if before and after:
+            raise ValueError("Use either 'before' or 'after', not both")
+        keys = [(doc[field], doc["_seq"]) for doc in documents]
+        if after:
+            start = bisect_right(keys, _position(after))
+            page = documents[start:start + limit + 1]
+            backward = False
+        else:
+            end = bisect_left(keys, _position(before)) if before else len(documents)
+            page = documents[max(0, end - limit - 1):end][::-1]
+            backward = True
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1][field], page[-1]["_seq"]) if page else None
+        return page, next_cursor, has_more, backward
+
+    async def get_user_threads_page(self, user_id: str, limit: int = 20,
+                                    before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        threads = sorted(
+            (thread for thread in self._threads.values()
+             if thread["user_id"] == user_id and "deleted_at" not in thread),
+            key=lambda thread: (thread["updated_at"], thread["_seq"])
+        )
+        page, next_cursor, has_more, backward = self._keyset_page(threads, "updated_at", min(limit, 100), before, after)
+        page = [{field: thread[field] for field in THREAD_LIST_FIELDS if field in thread} for thread in page]
+        if not backward:
+            page.reverse()
+        return {"threads": page, "next_cursor": next_cursor, "has_more": has_more}
+
+    async def get_thread_messages_page(self, thread_id: str, user_id: str, limit: int = 50,
+                                       before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        page, next_cursor, has_more, backward = self._keyset_page(
+            self._messages.get((thread_id, user_id), []), "created_at", min(limit, 100), before, after
+        )
+        if backward:
+            page.reverse()
+        return {"messages": format_messages(page), "next_cursor": next_cursor, "has_more": has_more}
+
+    async def delete_thread(self, thread_id: str, user_id: str) -> bool:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        thread = self._threads.get(thread_id)
+        if thread is None or thread["user_id"] != user_id or "deleted_at" in thread:
+            return False
+        thread["deleted_at"] = datetime.utcnow()
+        logger.info(f"Deleted thread {thread_id} (messages purged in the background)")
+        return True
+
+    async def delete_user_threads(self, user_id: str) -> int:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        now = datetime.utcnow()
+        deleted = 0
+        for thread in self._threads.values():
+            if thread["user_id"] == user_id and "deleted_at" not in thread:
+                thread["deleted_at"] = now
+                deleted += 1
+        logger.info(f"Deleted {deleted} threads of user {user_id}")
+        return deleted
+
+    async def deleted_threads(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        threads = sorted(
+            (thread for thread in self._threads.values()
+             if "deleted_at" in thread and (user_id is None or thread["user_id"] == user_id)),
+            key=lambda thread: thread["deleted_at"]
+        )
+        return [{"thread_id": thread["thread_id"], "user_id": thread["user_id"]} for thread in threads[:limit]]
+
+    async def purge_messages(self, thread_id: str, user_id: str, batch_size: int = 500) -> int:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        messages = self._messages.get((thread_id, user_id), [])
+        deleted = len(messages[:batch_size])
+        del messages[:batch_size]
+        if not messages:
+            self._messages.pop((thread_id, user_id), None)
+        return deleted
+
+    async def drop_deleted_thread(self, thread_id: str, user_id: str) -> bool:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        thread = self._threads.get(thread_id)
+        if thread is None or thread["user_id"] != user_id or "deleted_at" not in thread:
+            return False
+        del self._threads[thread_id]
+        return True
+
+    async def orphaned_threads(self, older_than: datetime, limit: int = 100) -> List[Dict]:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        orphans = [
+            {"thread_id": thread_id, "user_id": user_id}
+            for (thread_id, user_id), messages in self._messages.items()
+            if thread_id not in self._threads and messages and messages[-1]["created_at"] < older_than
+        ]
+        return orphans[:limit]
+
+
+def _position(cursor: str) -> Tuple[datetime, int]:
+    value, seq = decode_cursor_key(cursor)
+    try:
+        return value, int(seq)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
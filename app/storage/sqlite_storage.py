@@ -0,0 +1,535 @@
+"""
+Embedded SQLite storage backend for single-host deployments without MongoDB.
+
+The database file runs in WAL mode, so reads do not block the writer. sqlite3
+calls are blocking, so they run in worker threads (asyncio.to_thread), each with
+its own connection; writes are serialized with a lock instead of waiting on
+SQLite's busy timeout.
+"""
+from app.metrics.chat_metrics import STAGE_SECONDS
+from app.storage.base import (
+    THREAD_LIST_FIELDS, ChatStorage, ThreadNotFoundError, decode_cursor_key, encode_cursor, format_messages, thread_preview_fields,
+    turn_documents
+)
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS threads (
+        thread_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        message_count INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        summary TEXT,
+        summary_updated_at TEXT,
+        summarized_until TEXT,
+        summarized_until_id INTEGER,
+        summarized_count INTEGER,
+        summary_version INTEGER,
+        last_message_preview TEXT,
+        last_message_role TEXT,
+        unread INTEGER NOT NULL DEFAULT 0,
+        deleted_at TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )""",
+    # Same shapes as the MongoDB indexes; rowid is the implicit tie-breaker for keyset paging
+    "CREATE INDEX IF NOT EXISTS messages_thread_user_created ON messages (thread_id, user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS messages_user ON messages (user_id)",
+    "CREATE INDEX IF NOT EXISTS threads_user_updated ON threads (user_id, updated_at)",
+    # Tombstoned threads awaiting purge; live threads are not in the index
+    "CREATE INDEX IF NOT EXISTS threads_deleted ON threads (deleted_at) WHERE deleted_at IS NOT NULL"
+]
+DATETIME_FIELDS = ("created_at", "updated_at", "summary_updated_at", "summarized_until", "deleted_at")
+
+
+def _ts(value: datetime) -> str:
+    """Fixed-width ISO timestamp, so text order matches time order"""
+    return value.isoformat(timespec="microseconds")
+
+
+def _thread_dict(row: Optional[sqlite3.Row]) -> Optional[Dict]:
+    """Thread row as a document: datetimes parsed, unset columns left out (as in MongoDB)"""
+    if row is None:
+        return None
+    thread = {key: row[key] for key in row.keys() if row[key] is not None}
+    for field in DATETIME_FIELDS:
+        if field in thread:
+            thread[field] = datetime.fromisoformat(thread[field])
+    if "unread" in thread:
+        thread["unread"] = bool(thread["unread"])
+    return thread
+
+
+def _keyset_clause(field: str, before: Optional[str], after: Optional[str]) -> Tuple[str, List, str, bool]:
+    """
+    SQL condition, parameters and ORDER BY for one keyset page on (field, rowid).
+
+    Returns:
+        (condition, params, order, backward) where backward=True means newest-first traversal
+    """
+    if before and after:
+        raise ValueError("Use either 'before' or 'after', not both")
+    if after:
+        value, row_id = _decode_position(after)
+        return (f" AND ({field} > ? OR ({field} = ? AND rowid > ?))", [value, value, row_id],
+                f"{field} ASC, rowid ASC", False)
+    if before:
+        value, row_id = _decode_position(before)
+        return (f" AND ({field} < ? OR ({field} = ? AND rowid < ?))", [value, value, row_id],
+                f"{field} DESC, rowid DESC", True)
+    return "", [], f"{field} DESC, rowid DESC", True
+
+
+def _decode_position(cursor: str) -> Tuple[str, int]:
+    value, row_id = decode_cursor_key(cursor)
+    try:
+        return _ts(value), int(row_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class SQLiteStorage(ChatStorage):
+    """
+    ChatStorage on an SQLite database file (created on connect).
+
+    Args:
+        path: Database file; must be a file (each worker thread opens its own connection)
+        busy_timeout: Seconds to wait for a lock held by another process
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._connected = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL only syncs at checkpoints; a power loss can drop the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _read_sync(self, fn: Callable, *args):
+        return fn(self._connection(), *args)
+
+    def _write_sync(self, fn: Callable, *args):
+        conn = self._connection()
+        with self._write_lock, conn:
+            return fn(conn, *args)
+
+    async def _read(self, fn: Callable, *args):
+        return await asyncio.to_thread(self._read_sync, fn, *args)
+
+    async def _write(self, fn: Callable, *args):
+        return await asyncio.to_thread(self._write_sync, fn, *args)
+
+    async def connect(self) -> bool:
+        """Open the database file and create tables and indexes"""
+        def create_schema(conn):
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+        try:
+            await self._write(create_schema)
+            self._connected = True
+            logger.info(f"Connected to SQLite database {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error opening SQLite database {self.path}: {str(e)}")
+            return False
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def close_connection(self):
+        """Close every thread's connection (checkpoints the WAL)"""
+        self._connected = False
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.error(f"Error closing SQLite connection: {str(e)}")
+            self._connections.clear()
+        # Worker threads that cached a closed connection open a new one on next use
+        self._local = threading.local()
+        logger.info("SQLite connection closed")
+
+    @staticmethod
+    def _recent_messages(conn, thread_id: str, user_id: str, limit: int) -> List[Dict]:
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE thread_id = ? AND user_id = ? "
+            "ORDER BY created_at DESC, rowid DESC LIMIT ?",
+            (thread_id, user_id, limit)
+        ).fetchall()
+        return format_messages([dict(row) for row in reversed(rows)])
+
+    @staticmethod
+    def _get_thread(conn, thread_id: str) -> Optional[Dict]:
+        return _thread_dict(
+            conn.execute("SELECT * FROM threads WHERE thread_id = ? AND deleted_at IS NULL", (thread_id,)).fetchone()
+        )
+
+    async def load_thread_context(self, thread_id: str, user_id: str, limit: int = 20) -> Dict:
+        if not self.is_connected():
+            logger.error("SQLite database is not open")
+            return {"thread": None, "summary": None, "messages": []}
+
+        def load(conn):
+            thread = self._get_thread(conn, thread_id)
+            if thread is None:
+                if conn.execute(
+                    "SELECT 1 FROM threads WHERE thread_id = ? AND deleted_at IS NOT NULL", (thread_id,)
+                ).fetchone():
+                    raise ThreadNotFoundError(thread_id)
+                return {"thread": None, "summary": None, "messages": []}
+            return {
+                "thread": thread,
+                "summary": thread.get("summary"),
+                "messages": self._recent_messages(conn, thread_id, user_id, min(limit, 100))
+            }
+
+        start = time.perf_counter()
+        try:
+            context = await self._read(load)
+            logger.info(f"Loaded context for thread {thread_id}: {len(context['messages'])} messages")
+            return context
+        except ThreadNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Error loading thread context: {str(e)}")
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="context_load")
+
+    async def get_thread_messages(self, thread_id: str, user_id: str, limit: int = 10) -> List[Dict]:
+        if not self.is_connected():
+            logger.error("SQLite database is not open")
+            return []
+        try:
+            messages = await self._read(self._recent_messages, thread_id, user_id, min(limit, 100))
+            logger.info(f"Retrieved {len(messages)} messages from thread {thread_id} for user {user_id}")
+            return messages
+        except Exception as e:
+            logger.error(f"Error retrieving thread messages: {str(e)}")
+            return []
+
+    async def commit_turn(self, thread_id: str, user_id: str, user_message: Dict, assistant_content: str,
+                          title: str = "", user_created_at: Optional[datetime] = None,
+                          unread: bool = False, create: bool = True) -> Optional[Dict]:
+        """Insert both messages and upsert the thread in one transaction"""
+        if not self.is_connected():
+            logger.error("SQLite database is not open")
+            return None
+
+        documents = turn_documents(thread_id, user_id, user_message, assistant_content, user_created_at)
+        created_at = _ts(documents[0]["created_at"])
+        updated_at = _ts(documents[-1]["created_at"])
+        preview = thread_preview_fields(documents, unread)
+
+        def commit(conn):
+            existing = conn.execute("SELECT deleted_at FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+            if (existing is None and not create) or (existing is not None and existing["deleted_at"] is not None):
+                # Raised inside the transaction, so nothing is written
+                raise ThreadNotFoundError(thread_id)
+            conn.executemany(
+                "INSERT INTO messages (thread_id, user_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(doc["thread_id"], doc["user_id"], doc["role"], doc["content"], _ts(doc["created_at"]))
+                 for doc in documents]
+            )
+            conn.execute(
+                "INSERT INTO threads (thread_id, user_id, title, message_count, created_at, updated_at, "
+                "last_message_preview, last_message_role, unread) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET "
+                "message_count = message_count + excluded.message_count, updated_at = excluded.updated_at, "
+                "last_message_preview = excluded.last_message_preview, "
+                "last_message_role = excluded.last_message_role, unread = excluded.unread",
+                (thread_id, user_id, title, len(documents), created_at, updated_at,
+                 preview["last_message_preview"], preview["last_message_role"], int(preview["unread"]))
+            )
+            return self._get_thread(conn, thread_id)
+
+        start = time.perf_counter()
+        try:
+            thread = await self._write(commit)
+            logger.info(f"Committed turn to thread {thread_id} ({thread.get('message_count')} messages)")
+            return thread
+        except ThreadNotFoundError:
+            logger.warning(f"Turn for thread {thread_id} not saved: thread missing or deleted")
+            raise
+        except Exception as e:
+            logger.error(f"Error committing turn: {str(e)}")
+            return None
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="db_write")
+
+    async def mark_thread_read(self, thread_id: str, user_id: str) -> bool:
+        if not self.is_connected():
+            logger.error("SQLite database is not open")
+            return False
+
+        def mark_read(conn):
+            return conn.execute(
+                "UPDATE threads SET unread = 0 WHERE thread_id = ? AND user_id = ? AND deleted_at IS NULL",
+                (thread_id, user_id)
+            ).rowcount
+
+        try:
+            return await self._write(mark_read) > 0
+        except Exception as e:
+            logger.error(f"Error marking thread {thread_id} read: {str(e)}")
+            return False
+
+    async def get_thread_info(self, thread_id: str) -> Optional[Dict]:
+        if not self.is_connected():
+            logger.error("SQLite database is not open")
+            return None
+        try:
+            return await self._read(self._get_thread, thread_id)
+        except Exception as e:
+            logger.error(f"Error retrieving thread info: {str(e)}")
+            return None
+
+    async def get_messages_since(self, thread_id: str, user_id: str, since: Optional[datetime] = None,
+                                 limit: int = 50, since_id: Any = None) -> List[Dict]:
+        if not self.is_connected():
+            logger.error("SQLite database is not open")
+            return []
+
+        def since_query(conn):
+            sql = "SELECT rowid AS id, role, content, created_at FROM messages WHERE thread_id = ? AND user_id = ?"
+            params = [thread_id, user_id]
+            if since is not None and since_id is not None:
+                sql += " AND (created_at > ? OR (created_at = ? AND rowid > ?))"
+                params.extend([_ts(since), _ts(since), since_id])
+            elif since is not None:
+                sql += " AND created_at > ?"
+                params.append(_ts(since))
+            sql += " ORDER BY created_at ASC, rowid ASC LIMIT ?"
+            params.append(limit)
+            return [
+                {"role": row["role"], "content": row["content"],
+                 "created_at": datetime.fromisoformat(row["created_at"]), "id": row["id"]}
+                for row in conn.execute(sql, params).fetchall()
+            ]
+
+        try:
+            messages = await self._read(since_query)
+            logger.info(f"Retrieved {len(messages)} unsummarized messages from thread {thread_id}")
+            return messages
+        except Exception as e:
+            logger.error(f"Error retrieving messages since {since}: {str(e)}")
+            return []
+
+    async def save_thread_summary(self, thread_id: str, summary: str,
+                                  summarized_until: Optional[datetime] = None,
+                                  summarized_count: Optional[int] = None,
+                                  expected_summarized_count: Optional[int] = None,
+                                  summarized_until_id: Any = None) -> bool:
+        if not self.is_connected():
+            logger.error("SQLite database is not open")
+            return False
+
+        def save(conn):
+            sql = ("UPDATE threads SET summary = ?, summary_updated_at = ?, "
+                   "summary_version = COALESCE(summary_version, 0) + 1")
+            params = [summary, _ts(datetime.utcnow())]
+            if summarized_until is not None:
+                sql += ", summarized_until = ?, summarized_until_id = ?"
+                params.extend([_ts(summarized_until), summarized_until_id])
+            if summarized_count is not None:
+                sql += ", summarized_count = ?"
+                params.append(summarized_count)
+            sql += " WHERE thread_id = ? AND deleted_at IS NULL"
+            params.append(thread_id)
+            if expected_summarized_count == 0:
+                sql += " AND COALESCE(summarized_count, 0) = 0"
+            elif expected_summarized_count is not None:
+                sql += " AND summarized_count = ?"
+                params.append(expected_summarized_count)
+            return conn.execute(sql, params).rowcount
+
+        start = time.perf_counter()
+        try:
+            if not await self._write(save):
+                logger.warning(f"Summary for thread {thread_id} not saved: thread missing or summarized concurrently")
+                return False
+            logger.info(f"Summary saved for thread {thread_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving thread summary: {str(e)}")
+            return False
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="db_write")
+
+    async def _keyset_page(self, table: str, columns: str, condition: str, params: List, field: str,
+                           limit: int, before: Optional[str], after: Optional[str]) -> Tuple[List[Dict], Optional[str], bool, bool]:
+        """
+        Fetch one keyset page in traversal order.
+
+        Returns:
+            (rows, next_cursor, has_more, backward)
+        """
+        clause, clause_params, order, backward = _keyset_clause(field, before, after)
+
+        def page(conn):
+            return conn.execute(
+                f"SELECT rowid AS _rowid, {columns} FROM {table} WHERE {condition}{clause} ORDER BY {order} LIMIT ?",
+                params + clause_params + [limit + 1]
+            ).fetchall()
+
+        rows = [dict(row) for row in await self._read(page)]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = (
+            encode_cursor(datetime.fromisoformat(rows[-1][field]), rows[-1]["_rowid"]) if rows else None
+        )
+        for row in rows:
+            del row["_rowid"]
+        return rows, next_cursor, has_more, backward
+
+    async def get_user_threads_page(self, user_id: str, limit: int = 20,
+                                    before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        rows, next_cursor, has_more, backward = await self._keyset_page(
+            "threads", ", ".join(THREAD_LIST_FIELDS), "user_id = ? AND deleted_at IS NULL", [user_id], "updated_at",
+            min(limit, 100), before, after
+        )
+        threads = [_thread_dict(row) for row in rows]
+        if not backward:
+            threads.reverse()
+
+        logger.info(f"Retrieved page of {len(threads)} threads for user {user_id}")
+        return {"threads": threads, "next_cursor": next_cursor, "has_more": has_more}
+
+    async def get_thread_messages_page(self, thread_id: str, user_id: str, limit: int = 50,
+                                       before: Optional[str] = None, after: Optional[str] = None) -> Dict:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        messages, next_cursor, has_more, backward = await self._keyset_page(
+            "messages", "role, content, created_at", "thread_id = ? AND user_id = ?", [thread_id, user_id],
+            "created_at", min(limit, 100), before, after
+        )
+        if backward:
+            messages.reverse()
+
+        logger.info(f"Retrieved page of {len(messages)} messages from thread {thread_id}")
+        return {"messages": format_messages(messages), "next_cursor": next_cursor, "has_more": has_more}
+
+    async def delete_thread(self, thread_id: str, user_id: str) -> bool:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        def delete(conn):
+            return conn.execute(
+                "UPDATE threads SET deleted_at = ? WHERE thread_id = ? AND user_id = ? AND deleted_at IS NULL",
+                (_ts(datetime.utcnow()), thread_id, user_id)
+            ).rowcount
+
+        deleted = await self._write(delete) > 0
+        if deleted:
+            logger.info(f"Deleted thread {thread_id} (messages purged in the background)")
+        return deleted
+
+    async def delete_user_threads(self, user_id: str) -> int:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        def delete(conn):
+            return conn.execute(
+                "UPDATE threads SET deleted_at = ? WHERE user_id = ? AND deleted_at IS NULL",
+                (_ts(datetime.utcnow()), user_id)
+            ).rowcount
+
+        deleted = await self._write(delete)
+        logger.info(f"Deleted {deleted} threads of user {user_id}")
+        return deleted
+
+    async def deleted_threads(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        def query(conn):
+            sql = "SELECT thread_id, user_id FROM threads WHERE deleted_at IS NOT NULL"
+            params = []
+            if user_id is not None:
+                sql += " AND user_id = ?"
+                params.append(user_id)
+            sql += " ORDER BY deleted_at LIMIT ?"
+            return [dict(row) for row in conn.execute(sql, params + [limit]).fetchall()]
+
+        return await self._read(query)
+
+    async def purge_messages(self, thread_id: str, user_id: str, batch_size: int = 500) -> int:
+        """One short write transaction per batch, so chat turns are not held up by a large purge"""
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        def purge(conn):
+            return conn.execute(
+                "DELETE FROM messages WHERE rowid IN "
+                "(SELECT rowid FROM messages WHERE thread_id = ? AND user_id = ? LIMIT ?)",
+                (thread_id, user_id, batch_size)
+            ).rowcount
+
+        return await self._write(purge)
+
+    async def drop_deleted_thread(self, thread_id: str, user_id: str) -> bool:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        def drop(conn):
+            return conn.execute(
+                "DELETE FROM threads WHERE thread_id = ? AND user_id = ? AND deleted_at IS NOT NULL",
+                (thread_id, user_id)
+            ).rowcount
+
+        return await self._write(drop) > 0
+
+    async def orphaned_threads(self, older_than: datetime, limit: int = 100) -> List[Dict]:
+        if not self.is_connected():
+            raise RuntimeError("Database not connected")
+
+        def query(conn):
+            return [dict(row) for row in conn.execute(
+                "SELECT m.thread_id, m.user_id FROM messages m "
+                "LEFT JOIN threads t ON t.thread_id = m.thread_id "
+                "WHERE t.thread_id IS NULL "
+                "GROUP BY m.thread_id, m.user_id HAVING MAX(m.created_at) < ? LIMIT ?",
+                (_ts(older_than), limit)
+            ).fetchall()]
+
+        return await self._read(query)
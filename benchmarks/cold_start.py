@@ -0,0 +1,89 @@
+"""
+Cold-start time of a worker: importing main, entering the FastAPI lifespan, and
+the time until /health/ready reports ready.
+
+Each run is a fresh interpreter, so module imports and client construction are
+counted as a new worker would see them. Run it with MongoDB down to see how
+much a missing database delays startup.
+
+Usage:
+    python benchmarks/cold_start.py --runs 5
+    STORAGE_BACKEND=sqlite python benchmarks/cold_start.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+import httpx
+
+async def run():
+    result = {"import_s": imported - start}
+    async with main.app.router.lifespan_context(main.app):
+        result["startup_s"] = time.perf_counter() - start
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://cold-start") as client:
+            live = await client.get("/health/live")
+            result["live_s"] = time.perf_counter() - start if live.status_code == 200 else None
+            deadline = time.perf_counter() + TIMEOUT
+            result["ready_s"] = None
+            while time.perf_counter() < deadline:
+                ready = await client.get("/health/ready")
+                if ready.status_code == 200:
+                    result["ready_s"] = time.perf_counter() - start
+                    break
+                if ready.status_code == 404:
+                    # No readiness endpoint: ready once the lifespan has started
+                    result["ready_s"] = result["startup_s"]
+                    break
+                await asyncio.sleep(0.01)
+    print("RESULT " + json.dumps(result))
+
+asyncio.run(run())
+"""
+
+
+def run_once(timeout: float) -> dict:
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "cold-start-benchmark")
+    output = subprocess.run(
+        [sys.executable, "-c", f"TIMEOUT = {timeout}\n" + CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout + 120
+    )
+    for line in output.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"Cold start run failed:\n{output.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready-timeout", type=float, default=15.0, help="Seconds to wait for readiness")
+    args = parser.parse_args()
+
+    runs = [run_once(args.ready_timeout) for _ in range(args.runs)]
+
+    print(f"{'phase':<28} {'median':>9} {'max':>9}")
+    for key, label in (("import_s", "import main"), ("startup_s", "lifespan started"),
+                       ("live_s", "/health/live OK"), ("ready_s", "/health/ready OK")):
+        values = [run[key] for run in runs if run.get(key) is not None]
+        if not values:
+            print(f"{label:<28} {'n/a':>9}")
+            continue
+        print(f"{label:<28} {statistics.median(values):>8.2f}s {max(values):>8.2f}s"
+              + ("" if len(values) == len(runs) else f"  ({len(runs) - len(values)} runs never reached it)"))
+
+
+if __name__ == "__main__":
+    main()
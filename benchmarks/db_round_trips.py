@@ -0,0 +1,105 @@
+"""
+Count MongoDB round trips per chat turn: legacy per-call path vs load_thread_context + commit_turn.
+
+Replays the database calls that one POST /api/threads/{thread_id}/{user_id}/messages
+turn makes and counts the commands sent to the server with a pymongo CommandListener.
+The thread context cache and write-behind are off, so every call reaches MongoDB.
+Requires a running MongoDB (MONGODB_URL); writes go to a throwaway database.
+
+Usage:
+    python benchmarks/db_round_trips.py --turns 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_NAME", f"bench_round_trips_{uuid.uuid4().hex[:8]}")
+os.environ["THREAD_CACHE_ENABLED"] = "false"
+os.environ["WRITE_BEHIND_ENABLED"] = "false"
+
+from config import settings  # noqa: E402
+from app.database import AsyncMongoDBClient  # noqa: E402
+
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "createIndexes"}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def legacy_turn(db: AsyncMongoDBClient, thread_id: str, user_id: str, content: str):
+    """Database calls of a chat turn before the turn-commit operation"""
+    await db.get_thread_summary(thread_id)
+    await db.get_thread_messages(thread_id, user_id, limit=20)
+    if not await db.get_thread_info(thread_id):
+        await db.create_thread(thread_id, user_id, title=content[:50])
+    await db.save_message(thread_id, user_id, "user", content)
+    await db.save_message(thread_id, user_id, "assistant", "reply")
+    await db.update_thread_message_count(thread_id)
+    # auto_generate_summary
+    await db.count_thread_messages(thread_id)
+    await db.get_thread_info(thread_id)
+    # handler re-reads the thread for the summary
+    await db.get_thread_info(thread_id)
+
+
+async def committed_turn(db: AsyncMongoDBClient, thread_id: str, user_id: str, content: str):
+    """Database calls of a chat turn with load_thread_context + commit_turn"""
+    await db.load_thread_context(thread_id, user_id, limit=20)
+    await db.commit_turn(thread_id, user_id, {"role": "user", "content": content}, "reply", title=content[:50])
+
+
+async def measure(db: AsyncMongoDBClient, counter: CommandCounter, turn, turns: int) -> dict:
+    thread_id = str(uuid.uuid4())
+    counter.count = 0
+    start = time.perf_counter()
+    for i in range(turns):
+        await turn(db, thread_id, "bench_user", f"question {i}")
+    elapsed = time.perf_counter() - start
+    return {"round_trips": counter.count / turns, "latency_ms": elapsed / turns * 1000}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Round trips per chat turn")
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    db = AsyncMongoDBClient()
+    if not await db.connect():
+        sys.exit("MongoDB is not reachable at MONGODB_URL")
+
+    try:
+        legacy = await measure(db, counter, legacy_turn, args.turns)
+        committed = await measure(db, counter, committed_turn, args.turns)
+    finally:
+        await db.client.drop_database(settings.DATABASE_NAME)
+        await db.close_connection()
+
+    print(f"{'path':<12} {'round trips/turn':>17} {'db time/turn':>13}")
+    print(f"{'legacy':<12} {legacy['round_trips']:>17.1f} {legacy['latency_ms']:>11.2f}ms")
+    print(f"{'commit_turn':<12} {committed['round_trips']:>17.1f} {committed['latency_ms']:>11.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+"""
+Open-loop load generator for the chat API.
+
+Sends requests at a fixed target rate (independent of how fast the server
+answers) to /api/chat and to the thread chat endpoint
+POST /api/threads/{thread_id}/{user_id}/messages, then reports throughput and
+p50/p95/p99 latency per endpoint. Latency is measured from each request's
+scheduled send time, so queueing in the client is counted (no coordinated omission).
+
+Run the server against the fake LLM backend and a local MongoDB so the numbers
+reflect this service rather than the Groq API:
+    docker run -d -p 27017:27017 mongo:7
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=0.2 uvicorn main:app --port 8000
+    python benchmarks/load_generator.py --rps 50 --duration 30
+
+--in-process serves the app inside this script (ASGI transport, lifespan run
+here, LLM_BACKEND defaulting to fake), so no server or uvicorn is needed. Client
+and server then share one event loop: compare runs with each other, not with
+numbers from a real deployment.
+
+Usage:
+    python benchmarks/load_generator.py [--url URL | --in-process] [--rps N] [--duration S]
+        [--thread-ratio 0.8] [--threads 50] [--max-in-flight 1000]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUESTIONS = [
+    "How do I send money to a friend?",
+    "Why did my transfer fail?",
+    "How can I change my PIN?",
+    "What are the fees for withdrawing cash?",
+    "How do I add money to my wallet?"
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class LoadGenerator:
+    def __init__(self, url: str, rps: float, duration: float, thread_ratio: float,
+                 thread_pool_size: int, max_in_flight: int, seed: int, app=None):
+        self.url = url.rstrip("/")
+        self.app = app
+        self.rps = rps
+        self.duration = duration
+        self.thread_ratio = thread_ratio
+        self.thread_pool_size = thread_pool_size
+        self.max_in_flight = max_in_flight
+        self.rng = random.Random(seed)
+
+        # (thread_id, user_id) pairs created by /api/chat, reused by thread requests
+        self.threads: List[tuple] = []
+        self.latencies: Dict[str, List[float]] = {"chat": [], "thread": []}
+        self.errors: Dict[str, int] = {"chat": 0, "thread": 0}
+        self.skipped = 0
+        self.in_flight = 0
+
+    async def _chat(self, client: httpx.AsyncClient, index: int):
+        user_id = f"load_user_{index % 1000}"
+        response = await client.post(f"{self.url}/api/chat", json={
+            "messages": [{"role": "user", "content": self.rng.choice(QUESTIONS)}],
+            "user_id": user_id
+        })
+        response.raise_for_status()
+        thread_id = response.json().get("thread_id")
+        if thread_id and len(self.threads) < self.thread_pool_size:
+            self.threads.append((thread_id, user_id))
+
+    async def _thread_message(self, client: httpx.AsyncClient):
+        thread_id, user_id = self.rng.choice(self.threads)
+        response = await client.post(
+            f"{self.url}/api/threads/{thread_id}/{user_id}/messages",
+            json={"messages": [{"role": "user", "content": self.rng.choice(QUESTIONS)}]}
+        )
+        response.raise_for_status()
+
+    async def _send(self, client: httpx.AsyncClient, index: int, scheduled: float):
+        kind = "thread" if self.threads and self.rng.random() < self.thread_ratio else "chat"
+        self.in_flight += 1
+        try:
+            if kind == "chat":
+                await self._chat(client, index)
+            else:
+                await self._thread_message(client)
+            self.latencies[kind].append(time.perf_counter() - scheduled)
+        except Exception:
+            self.errors[kind] += 1
+        finally:
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def _client(self):
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        if self.app is None:
+            async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+                yield client
+            return
+        # In-process: run the app's lifespan (DB connect, background workers) around the run
+        async with self.app.router.lifespan_context(self.app):
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, timeout=120, limits=limits) as client:
+                yield client
+
+    async def run(self) -> float:
+        async with self._client() as client:
+            tasks = []
+            start = time.perf_counter()
+            interval = 1.0 / self.rps
+            for index in itertools.count():
+                scheduled = start + index * interval
+                if scheduled - start >= self.duration:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.in_flight >= self.max_in_flight:
+                    self.skipped += 1
+                    continue
+                tasks.append(asyncio.create_task(self._send(client, index, scheduled)))
+            await asyncio.gather(*tasks)
+            return time.perf_counter() - start
+
+    def report(self, elapsed: float):
+        print(f"target {self.rps:.1f} req/s for {self.duration:.0f}s, elapsed {elapsed:.1f}s, "
+              f"skipped {self.skipped} (over --max-in-flight)")
+        print(f"{'endpoint':>8} {'ok':>6} {'errors':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for kind, values in self.latencies.items():
+            values = sorted(values)
+            print(
+                f"{kind:>8} {len(values):>6} {self.errors[kind]:>6} {len(values) / elapsed:>8.2f} "
+                f"{percentile(values, 50):>7.3f}s {percentile(values, 95):>7.3f}s "
+                f"{percentile(values, 99):>7.3f}s {(values[-1] if values else 0.0):>7.3f}s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the chat API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Serve main:app inside this process instead of calling --url")
+    parser.add_argument("--rps", type=float, default=20, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to send requests for")
+    parser.add_argument("--thread-ratio", type=float, default=0.8,
+                        help="Fraction of requests sent to existing threads once some exist")
+    parser.add_argument("--threads", type=int, default=50, help="Threads to spread follow-up messages over")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = None
+    url = args.url
+    if args.in_process:
+        os.environ.setdefault("LLM_BACKEND", "fake")
+        from main import app  # noqa: E402
+        url = "http://loadtest"
+
+    generator = LoadGenerator(
+        url, args.rps, args.duration, args.thread_ratio,
+        args.threads, args.max_in_flight, args.seed, app=app
+    )
+    elapsed = asyncio.run(generator.run())
+    generator.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
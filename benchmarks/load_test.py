@@ -0,0 +1,78 @@
+"""
+Concurrency load test for the chat API.
+
+Fires batches of concurrent /api/chat requests at a running server and reports
+throughput for each concurrency level. With the async LLM path, throughput should
+grow with concurrency until LLM_MAX_CONCURRENCY (or the provider rate limit) is reached.
+
+Usage:
+    uvicorn main:app --port 8000
+    python benchmarks/load_test.py --url http://localhost:8000 --levels 1 8 32 128
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def send_chat(session: requests.Session, url: str, index: int) -> float:
+    """Send one chat request and return its latency in seconds"""
+    payload = {
+        "messages": [{"role": "user", "content": f"How do I withdraw money? (load test {index})"}],
+        "user_id": f"load_test_user_{index}"
+    }
+    start = time.perf_counter()
+    response = session.post(f"{url}/api/chat", json=payload, timeout=120)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_level(url: str, concurrency: int, requests_per_worker: int) -> dict:
+    """Run `concurrency` workers, each sending `requests_per_worker` requests"""
+    total = concurrency * requests_per_worker
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    errors = 0
+    latencies = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(send_chat, session, url, i) for i in range(total)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "avg_latency": sum(latencies) / len(latencies) if latencies else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat API concurrency load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests-per-worker", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>11} {'requests':>8} {'errors':>6} {'req/s':>8} {'avg latency':>12}")
+    for level in args.levels:
+        result = run_level(args.url, level, args.requests_per_worker)
+        print(
+            f"{result['concurrency']:>11} {result['requests']:>8} {result['errors']:>6} "
+            f"{result['throughput']:>8.2f} {result['avg_latency']:>11.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+MongoDB connection pool sizing: chat-turn database work at several concurrency
+levels for each pool size, reporting throughput, operation latency, checkout
+wait and connection churn.
+
+Each turn does what the thread chat endpoint does against MongoDB
+(load_thread_context + commit_turn) with the thread cache and write-behind off,
+so every call checks out a pooled connection. Every (pool size, concurrency)
+pair gets a fresh client; the data goes to a throwaway database.
+
+Usage:
+    python benchmarks/mongo_pool.py --pool-sizes 10 25 50 100 --concurrency 16 64 256
+    MONGODB_URL=mongodb://db:27017 python benchmarks/mongo_pool.py --turns 5000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_NAME", f"bench_pool_{uuid.uuid4().hex[:8]}")
+# Every turn should reach the pool; keep the app's storage singleton off MongoDB
+os.environ["THREAD_CACHE_ENABLED"] = "false"
+os.environ["WRITE_BEHIND_ENABLED"] = "false"
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from pymongo import monitoring  # noqa: E402
+
+from config import settings  # noqa: E402
+from app.database import AsyncMongoDBClient  # noqa: E402
+
+
+class CheckoutRecorder(monitoring.ConnectionPoolListener):
+    """Raw checkout waits and connection counts of the run in progress"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.waits = []
+        self.created = 0
+        self.closed = 0
+        self.failed = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.failed += 1
+
+    def connection_checked_out(self, event):
+        self.waits.append(event.duration)
+
+    def connection_checked_in(self, event):
+        pass
+
+
+recorder = CheckoutRecorder()
+monitoring.register(recorder)
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+async def run(pool_size: int, concurrency: int, turns: int, threads: int):
+    settings.MONGO_MAX_POOL_SIZE = pool_size
+    settings.MONGO_MIN_POOL_SIZE = min(settings.MONGO_MIN_POOL_SIZE, pool_size)
+    storage = AsyncMongoDBClient()
+    if not await storage.connect():
+        await storage.close_connection()
+        return None
+
+    thread_ids = [str(uuid.uuid4()) for _ in range(threads)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def turn(i: int):
+        nonlocal errors
+        thread_id = thread_ids[i % threads]
+        async with semaphore:
+            start = time.perf_counter()
+            await storage.load_thread_context(thread_id, "bench_user", limit=20)
+            thread = await storage.commit_turn(
+                thread_id, "bench_user", {"role": "user", "content": f"question {i}"}, "reply " * 50, title="bench"
+            )
+            latencies.append(time.perf_counter() - start)
+            if thread is None:
+                errors += 1
+
+    recorder.reset()
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(turn(i) for i in range(turns)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await storage.client.drop_database(settings.DATABASE_NAME)
+        await storage.close_connection()
+
+    return {
+        "turns_per_second": turns / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": percentile(latencies, 0.95),
+        "wait_p50": percentile(recorder.waits, 0.5),
+        "wait_p95": percentile(recorder.waits, 0.95),
+        "wait_max": max(recorder.waits, default=0) * 1000,
+        "connections": recorder.created,
+        "failed_checkouts": recorder.failed,
+        "errors": errors
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="MongoDB connection pool size vs concurrency")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--turns", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=200, help="Distinct threads the turns are spread over")
+    args = parser.parse_args()
+
+    print(f"{'pool':>5} {'conc':>5} {'turns/s':>8} {'p50':>9} {'p95':>9} "
+          f"{'wait p50':>9} {'wait p95':>9} {'wait max':>9} {'conns':>6} {'timeouts':>8}")
+    for pool_size in args.pool_sizes:
+        for concurrency in args.concurrency:
+            result = await run(pool_size, concurrency, args.turns, args.threads)
+            if result is None:
+                print(f"MongoDB not reachable at {settings.MONGODB_URL}")
+                return
+            print(f"{pool_size:>5} {concurrency:>5} {result['turns_per_second']:>8.0f} "
+                  f"{result['p50']:>7.2f}ms {result['p95']:>7.2f}ms "
+                  f"{result['wait_p50']:>7.2f}ms {result['wait_p95']:>7.2f}ms {result['wait_max']:>7.2f}ms "
+                  f"{result['connections']:>6} {result['failed_checkouts']:>8}"
+                  + (f"  ({result['errors']} turns not saved)" if result["errors"] else ""))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""
+Prompt size and assembly time: legacy context building vs token-budgeted assembly.
+
+Simulates a long thread where the client re-sends the whole conversation each turn
+(as API clients commonly do) and compares, per turn:
+- legacy: system prompt + summary + last 10 stored messages cut to 40 chars + every client message
+- budgeted: prompt_builder.assemble_prompt with PROMPT_TOKEN_BUDGET
+
+Also reports how much of each budgeted prompt is the static, versioned system
+prefix (identical across requests, so provider-side prefix caching can reuse it)
+and the tokens saved per summary request by sending SUMMARY_PROMPT once instead
+of twice.
+
+Prompt tokens are estimated with prompt_builder.count_tokens; prefill latency and
+input cost scale with them. No network or database access.
+
+Usage:
+    python benchmarks/prompt_assembly.py --turns 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.prompts.system_prompt import SYSTEM_PROMPT, SUMMARY_PROMPT  # noqa: E402
+from app.LLM_Service.prompt_builder import (  # noqa: E402
+    assemble_prompt, build_prefix, count_message_tokens, count_tokens
+)
+
+WORDS = "wallet payout bank account minimum tips marketplace escrow delivery proof camera verify".split()
+
+
+def make_message(role: str, rng: random.Random) -> dict:
+    length = rng.randint(10, 40) if role == "user" else rng.randint(60, 250)
+    return {"role": role, "content": " ".join(rng.choice(WORDS) for _ in range(length))}
+
+
+def legacy_build(messages, summary, history):
+    """Context building before prompt_builder (40-char history, unbounded client messages)"""
+    context_parts = [f"[SUMMARY: {summary}]"] if summary else []
+    if history:
+        recent = " | ".join(
+            f"{msg['role'][0].upper()}:{msg['content'][:40]}" for msg in history[-10:]
+        )
+        context_parts.append(f"[HISTORY: {recent}]")
+    context_text = " ".join(context_parts)
+    formatted = [{"role": "system", "content": SYSTEM_PROMPT + (f"\n\nThread Context:\n{context_text}" if context_text else "")}]
+    formatted.extend({"role": msg["role"], "content": msg["content"]} for msg in messages)
+    return formatted
+
+
+def summary_request_tokens(conversation_text: str) -> dict:
+    """Summary request size with SUMMARY_PROMPT in both messages (legacy) vs the system message only"""
+    user_content = f"Please summarize the following conversation thread.\n\nConversation:\n{conversation_text}"
+    system = {"role": "system", "content": SUMMARY_PROMPT}
+    legacy = [system, {"role": "user", "content": f"{user_content}\n\n{SUMMARY_PROMPT}"}]
+    current = [system, {"role": "user", "content": user_content}]
+    return {"legacy": prompt_tokens(legacy), "current": prompt_tokens(current)}
+
+
+def prompt_tokens(formatted):
+    return sum(count_message_tokens(msg) for msg in formatted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt assembly benchmark")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    summary = " ".join(rng.choice(WORDS) for _ in range(80))
+    thread = []
+    checkpoints = {10, 50, 100, args.turns}
+    totals = {"legacy": [0, 0.0], "budgeted": [0, 0.0]}
+    prefix = build_prefix("system", SYSTEM_PROMPT)
+    static_tokens = 0
+
+    print(f"{'turn':>5} {'legacy tokens':>14} {'budgeted tokens':>16} {'reduction':>10}")
+    for turn in range(1, args.turns + 1):
+        thread.append(make_message("user", rng))
+        history = thread[:-1][-20:]  # what load_thread_context returns
+        messages = list(thread)  # client re-sends the conversation
+
+        start = time.perf_counter()
+        legacy = legacy_build(messages, summary, history)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        budgeted, stats = assemble_prompt(prefix, messages, summary=summary, history=history)
+        budgeted_time = time.perf_counter() - start
+
+        legacy_tokens = prompt_tokens(legacy)
+        budgeted_tokens = prompt_tokens(budgeted)
+        totals["legacy"][0] += legacy_tokens
+        totals["legacy"][1] += legacy_time
+        totals["budgeted"][0] += budgeted_tokens
+        totals["budgeted"][1] += budgeted_time
+        static_tokens += stats["static_tokens"]
+
+        if turn in checkpoints:
+            reduction = 1 - budgeted_tokens / legacy_tokens
+            print(f"{turn:>5} {legacy_tokens:>14} {budgeted_tokens:>16} {reduction:>9.0%}")
+
+        thread.append(make_message("assistant", rng))
+
+    print()
+    for name, (tokens, elapsed) in totals.items():
+        print(
+            f"{name:<9} avg prompt {tokens / args.turns:>8.0f} tokens, "
+            f"avg assembly {elapsed / args.turns * 1000:.3f}ms"
+        )
+
+    print(
+        f"\nstatic prefix {prefix.version}: {prefix.tokens} tokens, "
+        f"{static_tokens / totals['budgeted'][0]:.0%} of budgeted prompt tokens are a cacheable prefix"
+    )
+
+    conversation_text = "\n".join(
+        f"{msg['role'].upper()}: {msg['content']}" for msg in thread[-10:]
+    )
+    summary_tokens = summary_request_tokens(conversation_text)
+    saved = summary_tokens["legacy"] - summary_tokens["current"]
+    print(
+        f"summary request: {summary_tokens['legacy']} -> {summary_tokens['current']} tokens "
+        f"({saved} saved per request, SUMMARY_PROMPT is ~{count_tokens(SUMMARY_PROMPT)} tokens)"
+    )
+
+
+if __name__ == "__main__":
+    main()
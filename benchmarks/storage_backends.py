@@ -0,0 +1,100 @@
+"""
+Storage backend latency under identical load: memory vs SQLite vs MongoDB.
+
+Each backend gets the same workload: --turns chat turns over --threads threads,
+--concurrency at a time, each turn doing what the thread chat endpoint does
+(load_thread_context + commit_turn), plus one thread list page per turn.
+MongoDB is skipped when MONGODB_URL is not reachable; SQLite and MongoDB write to
+throwaway databases.
+
+Usage:
+    python benchmarks/storage_backends.py --turns 2000 --concurrency 32
+    python benchmarks/storage_backends.py --backends memory sqlite
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_NAME", f"bench_storage_{uuid.uuid4().hex[:8]}")
+# The app's storage singleton is not used here; keep it from connecting to MongoDB at import
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from config import settings  # noqa: E402
+from app.storage.factory import STORAGE_BACKENDS, create_storage  # noqa: E402
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+async def run(backend: str, turns: int, concurrency: int, threads: int):
+    storage = create_storage(backend)
+    if not await storage.connect():
+        print(f"{backend:<8} skipped (not reachable)")
+        return None
+
+    thread_ids = [str(uuid.uuid4()) for _ in range(threads)]
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = {"load_thread_context": [], "commit_turn": [], "get_user_threads_page": []}
+
+    async def timed(name, call):
+        start = time.perf_counter()
+        result = await call
+        timings[name].append(time.perf_counter() - start)
+        return result
+
+    async def turn(i: int):
+        thread_id = thread_ids[i % threads]
+        async with semaphore:
+            await timed("load_thread_context", storage.load_thread_context(thread_id, "bench_user", limit=20))
+            await timed("commit_turn", storage.commit_turn(
+                thread_id, "bench_user", {"role": "user", "content": f"question {i}"}, "reply " * 50, title="bench"
+            ))
+            await timed("get_user_threads_page", storage.get_user_threads_page("bench_user", limit=20))
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(turn(i) for i in range(turns)))
+    finally:
+        elapsed = time.perf_counter() - start
+        if backend == "mongo":
+            await storage.client.drop_database(settings.DATABASE_NAME)
+        await storage.close_connection()
+
+    return {"turns_per_second": turns / elapsed, "timings": timings}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare storage backends under the same load")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=100, help="Distinct threads the turns are spread over")
+    parser.add_argument("--backends", nargs="+", default=list(STORAGE_BACKENDS), choices=STORAGE_BACKENDS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.SQLITE_PATH = os.path.join(tmp, "bench.db")
+        results = {}
+        for backend in args.backends:
+            results[backend] = await run(backend, args.turns, args.concurrency, args.threads)
+
+    print(f"{'backend':<8} {'operation':<22} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for backend, result in results.items():
+        if result is None:
+            continue
+        for name, values in result["timings"].items():
+            print(f"{backend:<8} {name:<22} {statistics.median(values) * 1000:>7.2f}ms "
+                  f"{percentile(values, 0.95):>7.2f}ms {percentile(values, 0.99):>7.2f}ms")
+        print(f"{backend:<8} {'turns/s':<22} {result['turns_per_second']:>9.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
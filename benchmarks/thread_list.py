@@ -0,0 +1,103 @@
+"""
+Thread list with last-message previews: the denormalized fields on the thread
+documents (one projected query per page) vs fetching each thread's last message
+separately (one query per thread, N+1).
+
+Users get --threads threads of two turns each; both variants then load the first
+page of --page-size threads. MongoDB is skipped when MONGODB_URL is not
+reachable; SQLite and MongoDB write to throwaway databases.
+
+Usage:
+    python benchmarks/thread_list.py --threads 20 200 2000
+    python benchmarks/thread_list.py --backends sqlite mongo --page-size 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_NAME", f"bench_thread_list_{uuid.uuid4().hex[:8]}")
+# Every page should reach the backend; keep the app's storage singleton off MongoDB
+os.environ["THREAD_CACHE_ENABLED"] = "false"
+os.environ["STORAGE_BACKEND"] = "memory"
+
+from config import settings  # noqa: E402
+from app.storage.factory import STORAGE_BACKENDS, create_storage  # noqa: E402
+
+
+async def projected_page(storage, user_id: str, page_size: int):
+    """Previews come with the page"""
+    return (await storage.get_user_threads_page(user_id, limit=page_size))["threads"]
+
+
+async def n_plus_one_page(storage, user_id: str, page_size: int):
+    """Previews from one last-message query per listed thread"""
+    threads = (await storage.get_user_threads_page(user_id, limit=page_size))["threads"]
+    for thread in threads:
+        last = await storage.get_thread_messages(thread["thread_id"], user_id, limit=1)
+        thread["preview"] = last[-1]["content"][:settings.THREAD_PREVIEW_CHARS] if last else None
+    return threads
+
+
+async def run(backend: str, thread_counts, page_size: int, repeats: int):
+    storage = create_storage(backend)
+    if not await storage.connect():
+        print(f"{backend:<8} skipped (not reachable)")
+        return []
+
+    rows = []
+    try:
+        for count in thread_counts:
+            user_id = f"bench_{uuid.uuid4().hex[:8]}"
+            for i in range(count):
+                thread_id = str(uuid.uuid4())
+                for turn in range(2):
+                    await storage.commit_turn(
+                        thread_id, user_id, {"role": "user", "content": f"question {i}.{turn}"},
+                        f"answer {i}.{turn} " + "text " * 60, title=f"thread {i}"
+                    )
+
+            timings = {}
+            for name, load in (("projected", projected_page), ("n+1", n_plus_one_page)):
+                samples = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    await load(storage, user_id, page_size)
+                    samples.append(time.perf_counter() - start)
+                timings[name] = statistics.median(samples) * 1000
+            rows.append((backend, count, timings))
+    finally:
+        if backend == "mongo":
+            await storage.client.drop_database(settings.DATABASE_NAME)
+        await storage.close_connection()
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Thread list with previews: projected page vs N+1 queries")
+    parser.add_argument("--threads", type=int, nargs="+", default=[20, 200, 2000], help="Threads per user")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", default=list(STORAGE_BACKENDS), choices=STORAGE_BACKENDS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.SQLITE_PATH = os.path.join(tmp, "bench.db")
+        rows = []
+        for backend in args.backends:
+            rows.extend(await run(backend, args.threads, args.page_size, args.repeats))
+
+    print(f"{'backend':<8} {'threads':>8} {'projected':>11} {'n+1':>11} {'speedup':>8}")
+    for backend, count, timings in rows:
+        print(f"{backend:<8} {count:>8} {timings['projected']:>9.2f}ms {timings['n+1']:>9.2f}ms "
+              f"{timings['n+1'] / timings['projected']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+commit_turn latency and MongoDB write commands: direct writes vs the write-behind buffer.
+
+Runs --turns chat turn commits, --concurrency at a time, through AsyncMongoDBClient
+once with WRITE_BEHIND_ENABLED off and once with it on, and reports per-call latency
+and the number of insert/update commands sent to the server.
+Requires a running MongoDB (MONGODB_URL); writes go to a throwaway database.
+
+Usage:
+    python benchmarks/write_behind.py --turns 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_NAME", f"bench_write_behind_{uuid.uuid4().hex[:8]}")
+
+from config import settings  # noqa: E402
+from app.database import AsyncMongoDBClient  # noqa: E402
+
+WRITE_COMMANDS = {"insert", "update", "findAndModify"}
+
+
+class WriteCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def run(write_behind: bool, turns: int, concurrency: int, threads: int, counter: WriteCounter) -> dict:
+    settings.WRITE_BEHIND_ENABLED = write_behind
+    db = AsyncMongoDBClient()
+    if not await db.connect():
+        sys.exit("MongoDB is not reachable at MONGODB_URL")
+
+    thread_ids = [str(uuid.uuid4()) for _ in range(threads)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def turn(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await db.commit_turn(
+                thread_ids[i % threads], "bench_user",
+                {"role": "user", "content": f"question {i}"}, "reply", title="bench"
+            )
+            latencies.append(time.perf_counter() - start)
+
+    counter.count = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(i) for i in range(turns)))
+    elapsed = time.perf_counter() - start
+    # close_connection flushes what is still buffered
+    await db.close_connection()
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "turns_per_second": turns / elapsed,
+        "write_commands": counter.count
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="commit_turn with and without write-behind")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=200, help="Distinct threads the turns are spread over")
+    args = parser.parse_args()
+
+    counter = WriteCounter()
+    monitoring.register(counter)
+
+    results = {}
+    try:
+        for write_behind in (False, True):
+            results[write_behind] = await run(write_behind, args.turns, args.concurrency, args.threads, counter)
+    finally:
+        cleanup = AsyncMongoDBClient()
+        await cleanup.client.drop_database(settings.DATABASE_NAME)
+        await cleanup.client.close()
+
+    print(f"{'mode':<13} {'p50':>9} {'p95':>9} {'turns/s':>9} {'write cmds':>11}")
+    for write_behind, label in ((False, "direct"), (True, "write-behind")):
+        r = results[write_behind]
+        print(f"{label:<13} {r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms "
+              f"{r['turns_per_second']:>9.0f} {r['write_commands']:>11}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
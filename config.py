@@ -12,11 +12,149 @@ class Settings:
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1000"))
     
+    # Prompt size: packed prompts stay under PROMPT_TOKEN_BUDGET and leave MAX_TOKENS
+    # of the model context window free for the reply
+    MODEL_CONTEXT_WINDOW = int(os.getenv("MODEL_CONTEXT_WINDOW", "131072"))
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+    
+    # Max concurrent Groq completions per worker process
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "256"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+    
+    # "groq" or "fake" (deterministic local stand-in for load tests, no API key needed)
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+    FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.2"))
+    FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "200"))
+    FAKE_LLM_REPLY_TOKENS = int(os.getenv("FAKE_LLM_REPLY_TOKENS", "60"))
+    FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+    FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+    
+    # LLM routing. LLM_BACKENDS is a JSON list of backends, e.g.
+    #   [{"name": "large", "model": "llama-3.3-70b-versatile"},
+    #    {"name": "small", "model": "llama-3.1-8b-instant"}]
+    # with optional "provider" ("groq" | "fake"), "base_url", "api_key_env", "max_concurrency",
+    # "timeout" and, for fake backends, "latency" / "tokens_per_second" / "error_rate".
+    # Unset: one backend from LLM_BACKEND / MODEL, plus SUMMARY_MODEL for summaries if set.
+    # Routes are comma-separated backend names tried in order (default: every backend).
+    LLM_BACKENDS = os.getenv("LLM_BACKENDS", "")
+    SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "")
+    LLM_CHAT_ROUTE = os.getenv("LLM_CHAT_ROUTE", "")
+    LLM_SUMMARY_ROUTE = os.getenv("LLM_SUMMARY_ROUTE", "")
+    # "priority" keeps the route order, "latency" prefers the backend with the lowest rolling p50
+    LLM_ROUTING_POLICY = os.getenv("LLM_ROUTING_POLICY", "priority").lower()
+    LLM_ERROR_THRESHOLD = float(os.getenv("LLM_ERROR_THRESHOLD", "0.5"))
+    LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", "100"))
+    # Hedging: resend a slow non-streaming completion to the next backend after its rolling p95
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+    LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+    
+    # Client-side throttling per backend and worker process (0 = unlimited); backends
+    # may override with "rpm" / "tpm" in LLM_BACKENDS. Set them a little under the
+    # provider's account limits divided by the number of worker processes.
+    LLM_RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT", "0"))
+    LLM_TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "0"))
+    # Retries on 429 / 5xx / timeouts with jittered exponential backoff; a Retry-After
+    # longer than LLM_RETRY_MAX_DELAY fails over (or returns 503) instead of waiting
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "10"))
+    # Circuit breaker: stop calling a backend for LLM_BREAKER_COOLDOWN seconds after
+    # LLM_BREAKER_FAILURES consecutive failed attempts
+    LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+    
+    # Per-user admission control on the chat endpoints (0 disables a limit); over-quota
+    # requests get 429 with Retry-After. ADMISSION_STORE "mongo" shares the per-minute
+    # counts between worker processes, "memory" counts per process.
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_USER_RPM = int(os.getenv("ADMISSION_USER_RPM", "60"))
+    ADMISSION_USER_MAX_CONCURRENT = int(os.getenv("ADMISSION_USER_MAX_CONCURRENT", "4"))
+    ADMISSION_STORE = os.getenv("ADMISSION_STORE", "memory").lower()
+    # Fair scheduling of LLM calls across users: at most ADMISSION_LLM_SLOTS at once,
+    # waiters served weighted round-robin (ADMISSION_USER_WEIGHTS: JSON {"user_id": weight})
+    ADMISSION_LLM_SLOTS = int(os.getenv("ADMISSION_LLM_SLOTS", str(LLM_MAX_CONCURRENCY)))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+    ADMISSION_USER_WEIGHTS = os.getenv("ADMISSION_USER_WEIGHTS", "")
+    
+    # Responses kept per worker for retries carrying the same Idempotency-Key header
+    IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    
+    # POST /api/chat/batch: max conversations per batch and concurrent items per batch
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+    
+    # Write-behind persistence: chat turns are buffered in process and written with one
+    # insert_many per WRITE_BEHIND_MAX_BATCH messages or WRITE_BEHIND_FLUSH_INTERVAL
+    # seconds. Turns still buffered when a worker crashes are lost; shutdown flushes.
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+    WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.05"))
+    WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+    
     # System prompt from system_prompt.py file
     SYSTEM_PROMPT = SYSTEM_PROMPT
     
+    # Storage backend: "mongo", "sqlite" (embedded file at SQLITE_PATH, WAL mode) or
+    # "memory" (per process, not persisted)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "chatbot.db")
+    # Storage connects in the background at startup, retrying with backoff up to this many seconds
+    STORAGE_CONNECT_RETRY_MAX_DELAY = float(os.getenv("STORAGE_CONNECT_RETRY_MAX_DELAY", "30"))
+    
     # MongoDB configuration
     MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME = os.getenv("DATABASE_NAME", "nikoo_ai")
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+    # Connection pool per worker process (a server gets up to worker processes x
+    # MONGO_MAX_POOL_SIZE connections). Operations wait up to MONGO_WAIT_QUEUE_TIMEOUT_MS
+    # for a free connection (0 = no limit); connections idle for MONGO_MAX_IDLE_TIME_MS
+    # are closed (0 = never) and at most MONGO_MAX_CONNECTING are opened at once.
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+    MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", "4"))
+    
+    # Rolling summaries: fold the summary forward every SUMMARY_INTERVAL new messages,
+    # taking at most SUMMARY_MAX_NEW_MESSAGES per update
+    SUMMARY_INTERVAL = int(os.getenv("SUMMARY_INTERVAL", "10"))
+    SUMMARY_MAX_NEW_MESSAGES = int(os.getenv("SUMMARY_MAX_NEW_MESSAGES", "50"))
+    # Background summary worker pool; shutdown waits SUMMARY_DRAIN_TIMEOUT seconds for queued jobs
+    SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+    SUMMARY_QUEUE_SIZE = int(os.getenv("SUMMARY_QUEUE_SIZE", "1000"))
+    SUMMARY_DRAIN_TIMEOUT = float(os.getenv("SUMMARY_DRAIN_TIMEOUT", "10"))
+    
+    # Deleted threads are tombstoned (hidden at once) and purged in the background:
+    # PURGE_BATCH_SIZE messages per delete, PURGE_BATCH_PAUSE seconds between batches.
+    # Every PURGE_SWEEP_INTERVAL seconds a sweep purges tombstones left behind (queue full,
+    # restart) and messages without a thread whose newest message is PURGE_ORPHAN_GRACE
+    # seconds old.
+    PURGE_WORKERS = int(os.getenv("PURGE_WORKERS", "2"))
+    PURGE_QUEUE_SIZE = int(os.getenv("PURGE_QUEUE_SIZE", "10000"))
+    PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+    PURGE_BATCH_PAUSE = float(os.getenv("PURGE_BATCH_PAUSE", "0.05"))
+    PURGE_SWEEP_INTERVAL = float(os.getenv("PURGE_SWEEP_INTERVAL", "3600"))
+    PURGE_ORPHAN_GRACE = float(os.getenv("PURGE_ORPHAN_GRACE", "600"))
+    
+    # Cached answers to first-turn questions (exact match on normalized text; optional
+    # nearest-neighbour match above RESPONSE_CACHE_SIMILARITY cosine similarity)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+    RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))
+    
+    # In-process thread context cache (summary + recent messages per thread)
+    THREAD_CACHE_ENABLED = os.getenv("THREAD_CACHE_ENABLED", "true").lower() == "true"
+    THREAD_CACHE_MAX_ENTRIES = int(os.getenv("THREAD_CACHE_MAX_ENTRIES", "10000"))
+    THREAD_CACHE_MAX_BYTES = int(os.getenv("THREAD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    THREAD_CACHE_TTL = float(os.getenv("THREAD_CACHE_TTL", "300"))
+    THREAD_CACHE_WINDOW = int(os.getenv("THREAD_CACHE_WINDOW", "20"))
+    
+    # Length of the last-message preview stored on each thread for the thread list
+    THREAD_PREVIEW_CHARS = int(os.getenv("THREAD_PREVIEW_CHARS", "120"))
 
 settings = Settings()
\ No newline at end of file
@@ -1,25 +1,115 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Header, Response
 from pydantic import BaseModel
 from typing import List, Optional
-from app.LLM_Service.ai_service import generate_gemini_response, generate_summary, generate_context_aware_response
+from app.LLM_Service.ai_service import (
+    generate_gemini_response, generate_summary, generate_context_aware_response,
+    stream_context_aware_response, response_cache, llm_router, llm_scheduler, warm_llm_clients, SYSTEM_PREFIX
+)
+from app.LLM_Service.rate_limit import LLMUnavailableError
+from app.admission.admission import AdmissionController, AdmissionRejected, MemoryQuotaStore, MongoQuotaStore
 from app.schema.schema import (
     AIRequest, AIResponse, SummaryRequest, SummaryResponse,
     ContextAwareChatRequest, ThreadListResponse, ThreadDeleteResponse, ThreadInfo,
-    ThreadMessagesRequest
+    ThreadMessagesRequest, BatchChatRequest, UserThreadsDeleteResponse
 )
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import db_client
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from app.storage.base import ThreadNotFoundError
+from app.storage.factory import storage as db_client
+from app.background.task_queue import BackgroundTaskQueue
+from app.background.batch import map_unordered
+from app.background.periodic import PeriodicTask
+from app.background.purge import purge_deleted_threads, purge_thread, sweep
+from app.background.startup import BackgroundConnector
+from app.cache.idempotency import IdempotencyConflict, IdempotencyStore, RequestDeduplicator, request_fingerprint
+from app.metrics.middleware import MetricsMiddleware
+from app.metrics.registry import registry as metrics_registry
 from config import settings
+from contextlib import asynccontextmanager
 import logging
 from datetime import datetime
 import asyncio
+import json
+import math
+import time
 import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI assistant")
+# Auto-summaries run here instead of as untracked tasks; one job per thread at a time
+summary_queue = BackgroundTaskQueue(
+    "summaries",
+    maxsize=settings.SUMMARY_QUEUE_SIZE,
+    workers=settings.SUMMARY_WORKERS
+)
+
+# Deletes only tombstone; messages and thread documents are purged here in batches.
+# The periodic sweep finishes purges that were dropped or cut short by a restart.
+purge_queue = BackgroundTaskQueue(
+    "purges",
+    maxsize=settings.PURGE_QUEUE_SIZE,
+    workers=settings.PURGE_WORKERS
+)
+purge_sweeper = PeriodicTask(
+    "purge-sweep",
+    lambda: purge_queue.submit(("sweep",), lambda: sweep(
+        db_client, settings.PURGE_BATCH_SIZE, settings.PURGE_BATCH_PAUSE, settings.PURGE_ORPHAN_GRACE
+    )),
+    interval=settings.PURGE_SWEEP_INTERVAL,
+    initial_delay=min(60.0, settings.PURGE_SWEEP_INTERVAL)
+) if db_client else None
+
+# Identical concurrent chat turns share one generation; Idempotency-Key retries replay the stored result
+chat_dedup = RequestDeduplicator(
+    IdempotencyStore(max_entries=settings.IDEMPOTENCY_MAX_ENTRIES, ttl_seconds=settings.IDEMPOTENCY_TTL)
+)
+
+# Per-user concurrency and rate quota on the chat endpoints
+admission = AdmissionController(
+    MongoQuotaStore(db_client) if settings.ADMISSION_STORE == "mongo" and settings.STORAGE_BACKEND == "mongo"
+    else MemoryQuotaStore(),
+    requests_per_minute=settings.ADMISSION_USER_RPM,
+    max_concurrent=settings.ADMISSION_USER_MAX_CONCURRENT
+) if settings.ADMISSION_ENABLED else None
+
+# Storage connects (and builds indexes) in the background; /health/ready waits for it
+storage_connector = BackgroundConnector(
+    "storage", db_client.connect, max_delay=settings.STORAGE_CONNECT_RETRY_MAX_DELAY
+) if db_client else None
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start connecting storage and the background workers without waiting for them,
+    so the worker serves (and passes liveness checks) immediately; requests made
+    before storage is ready take the no-database paths. Drain and close on shutdown.
+    """
+    if storage_connector:
+        storage_connector.start()
+    summary_queue.start()
+    purge_queue.start()
+    if purge_sweeper:
+        purge_sweeper.start()
+    llm_warmup = asyncio.get_running_loop().run_in_executor(None, warm_llm_clients)
+    yield
+    await asyncio.gather(llm_warmup, return_exceptions=True)
+    await summary_queue.stop(drain_timeout=settings.SUMMARY_DRAIN_TIMEOUT)
+    if purge_sweeper:
+        await purge_sweeper.stop()
+    # Unfinished purges keep their tombstones; the next sweep completes them
+    await purge_queue.stop(drain_timeout=1.0)
+    if storage_connector:
+        await storage_connector.stop()
+    if db_client:
+        await db_client.close_connection()
+
+
+app = FastAPI(title="AI assistant", lifespan=lifespan)
 
 app.add_middleware(
    CORSMiddleware,
@@ -28,110 +118,234 @@ app.add_middleware(
     allow_methods=["*"],
    allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
-async def auto_generate_summary(thread_id: str, user_id: str):
-    """Auto-generate summary when thread has 10+ messages (counting pairs)"""
+def llm_configured() -> bool:
+    """At least one LLM backend could be created (Groq with an API key, or fake)"""
+    return llm_router is not None
+
+
+async def admit(user_id: str):
+    """Admit a chat request for `user_id` (raises AdmissionRejected); returns a lease to release, or None"""
+    if admission is None:
+        return None
+    return await admission.acquire(user_id)
+
+
+def admission_rejected(e: AdmissionRejected) -> HTTPException:
+    """429 (user over quota) or 503 (server busy) with a Retry-After hint"""
+    return HTTPException(
+        status_code=e.status_code,
+        detail={"error": str(e), "reason": e.reason, "retry_after": math.ceil(e.retry_after or 1)},
+        headers={"Retry-After": str(math.ceil(e.retry_after or 1))}
+    )
+
+
+def llm_unavailable(e: LLMUnavailableError) -> HTTPException:
+    """503 with a Retry-After hint when every LLM backend is throttled or failing"""
+    retry_after = math.ceil(e.retry_after) if e.retry_after else settings.LLM_RETRY_MAX_DELAY
+    return HTTPException(
+        status_code=503,
+        detail=f"LLM temporarily unavailable: {str(e)}",
+        headers={"Retry-After": str(int(retry_after))}
+    )
+
+
+def make_thread_title(content: str) -> str:
+    """Generate a thread title from message content (first 50 chars)"""
+    return content[:50] + "..." if len(content) > 50 else content
+
+
+async def auto_generate_summary(thread_id: str, user_id: str, thread_info: Optional[dict] = None):
+    """
+    Roll the thread summary forward once SUMMARY_INTERVAL messages are unsummarized.
+    
+    The previous summary and only the messages after the thread's high-water mark
+    (summarized_until + summarized_until_id / summarized_count) are folded into a new summary, so each
+    update costs O(new messages) instead of O(thread).
+    
+    Pass the thread document returned by commit_turn as `thread_info` to skip re-reading it.
+    """
     try:
         if not db_client or not db_client.is_connected():
             return
         
-        # Get current message count
-        message_count = db_client.messages_collection.count_documents({"thread_id": thread_id})
+        if thread_info is None:
+            # Get thread info to check message count and summary high-water mark
+            thread_info = await db_client.get_thread_info(thread_id)
+        if not thread_info:
+            return
         
-        # Get thread info to check if summary already exists
-        thread_info = db_client.get_thread_info(thread_id)
-        has_summary = thread_info.get("summary") if thread_info else None
+        message_count = thread_info.get("message_count", 0)
+        summarized_count = thread_info.get("summarized_count", 0)
         
-        # Generate summary every 10 messages (if not already generated)
-        if message_count >= 10 and message_count % 10 == 0 and not has_summary:
-            logger.info(f"Auto-generating summary for thread {thread_id} at {message_count} messages")
-            try:
-                summary_text = await generate_summary(thread_id, user_id)
-                if summary_text:
-                    db_client.save_thread_summary(thread_id, summary_text)
+        if message_count - summarized_count < settings.SUMMARY_INTERVAL:
+            return
+        
+        logger.info(
+            f"Rolling summary for thread {thread_id}: {message_count - summarized_count} new messages "
+            f"since message {summarized_count}"
+        )
+        try:
+            # Oldest unsummarized messages first; a long backlog is folded in over several runs
+            new_messages = await db_client.get_messages_since(
+                thread_id, user_id,
+                since=thread_info.get("summarized_until"),
+                since_id=thread_info.get("summarized_until_id"),
+                limit=settings.SUMMARY_MAX_NEW_MESSAGES
+            )
+            if not new_messages:
+                return
+            
+            summary_text = await generate_summary(
+                thread_id, user_id,
+                previous_summary=thread_info.get("summary"),
+                messages=new_messages
+            )
+            if summary_text:
+                saved = await db_client.save_thread_summary(
+                    thread_id, summary_text,
+                    summarized_until=new_messages[-1]["created_at"],
+                    summarized_until_id=new_messages[-1]["id"],
+                    summarized_count=summarized_count + len(new_messages),
+                    expected_summarized_count=summarized_count
+                )
+                if saved:
                     logger.info(f"Auto-summary generated and saved for thread {thread_id}")
-            except Exception as e:
-                logger.error(f"Error auto-generating summary: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error auto-generating summary: {str(e)}")
     except Exception as e:
         logger.error(f"Error in auto_generate_summary: {str(e)}")
 
 
+def schedule_summary(thread_id: str, user_id: str, thread_info: Optional[dict] = None):
+    """Queue an auto-summary check for the thread; repeated calls for one thread coalesce"""
+    summary_queue.submit(
+        (thread_id, user_id),
+        lambda: auto_generate_summary(thread_id, user_id, thread_info)
+    )
+
+
+async def run_new_chat(messages: List[dict], user_id: str, unread: bool = False) -> AIResponse:
+    """Answer the first turn of a new thread and save it (`unread` marks the thread unread)"""
+    # Generate unique thread_id for each new conversation
+    thread_id = str(uuid.uuid4())
+    
+    logger.info(f"Generating response for user {user_id} with thread {thread_id}")
+    
+    # Save the turn to database
+    if messages and db_client and db_client.is_connected():
+        user_message = messages[-1]  # Last message from user
+        received_at = datetime.utcnow()
+        
+        # New thread has no stored summary or history yet, skip the context query
+        response_text = await generate_context_aware_response(
+            messages, thread_id, user_id, context={"summary": None, "messages": []}
+        )
+        
+        # Create thread and save both messages in one turn commit
+        thread_info = await db_client.commit_turn(
+            thread_id, user_id, user_message, response_text,
+            title=make_thread_title(user_message.get("content", "")),
+            user_created_at=received_at,
+            unread=unread
+        )
+        logger.info(f"Messages saved to database for thread {thread_id}")
+        
+        # Auto-generate summary in background (non-blocking)
+        schedule_summary(thread_id, user_id, thread_info)
+        
+        return AIResponse(response=response_text, success=True, thread_id=thread_id)
+    else:
+        # Fallback if no database - use basic response
+        response_text = await generate_gemini_response(messages, user_id)
+        return AIResponse(response=response_text, success=True, thread_id=thread_id)
+
+
 @app.post("/api/chat", response_model=AIResponse)
-async def generate(request: AIRequest):
+async def generate(
+    request: AIRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    lease = None
     try:
         # Validate API key
-        if not settings.GROQ_API_KEY:
+        if not llm_configured():
             logger.error("GROQ_API_KEY is not set")
             raise ValueError("API key is not configured")
         
         messages = [msg.model_dump() for msg in request.messages]
+        scope = ("chat", request.user_id)
+        fingerprint = request_fingerprint(messages)
         
-        # Generate unique thread_id for each new conversation
-        thread_id = str(uuid.uuid4())
-        
-        logger.info(f"Generating response for user {request.user_id} with thread {thread_id}")
+        replayed = chat_dedup.replay(scope, fingerprint, idempotency_key)
+        if replayed is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return replayed
         
-        # Save user message to database
-        if messages and db_client and db_client.is_connected():
-            user_message = messages[-1]  # Last message from user
-            
-            # Create thread if it doesn't exist
-            if not db_client.get_thread_info(thread_id):
-                # Generate title from message content (first 50 chars)
-                msg_content = user_message.get("content", "")
-                title = msg_content[:50] + "..." if len(msg_content) > 50 else msg_content
-                db_client.create_thread(thread_id, request.user_id, title=title)
-            
-            db_client.save_message(thread_id, request.user_id, user_message.get("role", "user"), user_message.get("content", ""))
-            
-            # Use context-aware response to preserve conversation history
-            response_text = await generate_context_aware_response(messages, thread_id, request.user_id)
-            
-            db_client.save_message(thread_id, request.user_id, "assistant", response_text)
-            db_client.update_thread_message_count(thread_id)
-            logger.info(f"Messages saved to database for thread {thread_id}")
-            
-            # Auto-generate summary in background (non-blocking)
-            asyncio.create_task(auto_generate_summary(thread_id, request.user_id))
-            
-            return AIResponse(response=response_text, success=True, thread_id=thread_id)
-        else:
-            # Fallback if no database - use basic response
-            response_text = await generate_gemini_response(messages, request.user_id)
-            return AIResponse(response=response_text, success=True, thread_id=thread_id)
+        lease = await admit(request.user_id)
         
-        return AIResponse(response=response_text, success=True)
+        # A double-submitted question joins the in-flight turn instead of opening a second thread
+        return await chat_dedup.run(
+            scope, fingerprint, lambda: run_new_chat(messages, request.user_id), idempotency_key
+        )
     
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
         logger.warning(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        logger.warning(f"Request from user {request.user_id} rejected: {str(e)}")
+        raise admission_rejected(e)
+    except LLMUnavailableError as e:
+        logger.warning(f"LLM unavailable: {str(e)}")
+        raise llm_unavailable(e)
     except Exception as e:
         logger.error(f"Error generating response: {str(e)}")
         return AIResponse(response="", success=False, error=f"Error: {str(e)}")
+    finally:
+        if lease:
+            lease.release()
 
 
 
 @app.get("/api/threads/{user_id}", response_model=ThreadListResponse)
-async def get_user_threads(user_id: str):
-    """Get all threads for a user"""
+async def get_user_threads(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = None,
+    after: Optional[str] = None
+):
+    """
+    Get a page of threads for a user, most recently updated first.
+    
+    Pass `next_cursor` from the response as `before` to load older threads,
+    or as `after` (from a newer-direction page) to load threads updated since.
+    """
     try:
         if not db_client or not db_client.is_connected():
             raise ValueError("Database not connected")
         
-        # Get all unique thread_ids for user
-        threads_data = db_client.threads_collection.find({"user_id": user_id}).sort("updated_at", -1)
+        # Get one page of threads for user (only the fields ThreadInfo needs, previews
+        # included - one indexed query however many threads there are)
+        page = await db_client.get_user_threads_page(user_id, limit=limit, before=before, after=after)
         
         threads = []
-        for thread in threads_data:
-            thread.pop("_id", None)
+        for thread in page["threads"]:
             threads.append(ThreadInfo(
                 thread_id=thread.get("thread_id"),
                 user_id=thread.get("user_id"),
                 title=thread.get("title", ""),
                 message_count=thread.get("message_count", 0),
                 created_at=str(thread.get("created_at")) if thread.get("created_at") else None,
-                updated_at=str(thread.get("updated_at")) if thread.get("updated_at") else None
+                updated_at=str(thread.get("updated_at")) if thread.get("updated_at") else None,
+                last_message_preview=thread.get("last_message_preview"),
+                last_message_role=thread.get("last_message_role"),
+                unread=thread.get("unread", False),
+                summary_version=thread.get("summary_version") or 0
             ))
         
         logger.info(f"Retrieved {len(threads)} threads for user {user_id}")
@@ -139,65 +353,199 @@ async def get_user_threads(user_id: str):
         return ThreadListResponse(
             threads=threads,
             total=len(threads),
+            next_cursor=page["next_cursor"],
+            has_more=page["has_more"],
             success=True
         )
     
+    except ValueError as e:
+        logger.warning(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving threads: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error retrieving threads: {str(e)}")
 
 @app.delete("/api/threads/{thread_id}/{user_id}", response_model=ThreadDeleteResponse)
 async def delete_thread(thread_id: str, user_id: str):
-    """Delete a thread and all its messages"""
+    """
+    Delete a thread: it disappears from listings at once (tombstone) and its
+    messages are purged in the background.
+    """
     try:
         if not db_client or not db_client.is_connected():
             raise ValueError("Database not connected")
         
-        # Delete all messages in thread
-        result = db_client.messages_collection.delete_many({
-            "thread_id": thread_id,
-            "user_id": user_id
-        })
-        
-        # Delete thread info
-        db_client.threads_collection.delete_one({
-            "thread_id": thread_id,
-            "user_id": user_id
-        })
-        
-        logger.info(f"Deleted thread {thread_id} with {result.deleted_count} messages")
+        if not await db_client.delete_thread(thread_id, user_id):
+            raise HTTPException(status_code=404, detail="Thread not found")
         
+        purge_queue.submit(
+            ("thread", thread_id, user_id),
+            lambda: purge_thread(db_client, thread_id, user_id, settings.PURGE_BATCH_SIZE, settings.PURGE_BATCH_PAUSE)
+        )
         return ThreadDeleteResponse(
             thread_id=thread_id,
             success=True,
-            message=f"Thread deleted successfully. Removed {result.deleted_count} messages."
+            message="Thread deleted successfully. Its messages are removed in the background."
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting thread: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error deleting thread: {str(e)}")
 
+@app.delete("/api/users/{user_id}/threads", response_model=UserThreadsDeleteResponse)
+async def delete_user_threads(user_id: str):
+    """Delete all threads of a user (tombstoned now, purged in the background)"""
+    try:
+        if not db_client or not db_client.is_connected():
+            raise ValueError("Database not connected")
+        
+        deleted = await db_client.delete_user_threads(user_id)
+        if deleted:
+            purge_queue.submit(
+                ("user", user_id),
+                lambda: purge_deleted_threads(db_client, user_id, settings.PURGE_BATCH_SIZE, settings.PURGE_BATCH_PAUSE)
+            )
+        return UserThreadsDeleteResponse(user_id=user_id, threads_deleted=deleted, success=True)
+    
+    except Exception as e:
+        logger.error(f"Error deleting threads of user {user_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error deleting threads: {str(e)}")
+
+@app.post("/api/threads/{thread_id}/{user_id}/read")
+async def mark_thread_read(thread_id: str, user_id: str):
+    """Clear a thread's unread marker (call when the user opens the thread)"""
+    if not db_client or not db_client.is_connected():
+        raise HTTPException(status_code=400, detail="Database not connected")
+    
+    if not await db_client.mark_thread_read(thread_id, user_id):
+        raise HTTPException(status_code=404, detail="Thread not found")
+    return {"thread_id": thread_id, "unread": False, "success": True}
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process serves requests (does not check dependencies)"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready(response: Response):
+    """Readiness: storage connected and an LLM backend configured; 503 until then"""
+    checks = {
+        "llm": llm_configured(),
+        "storage": bool(db_client and db_client.is_connected())
+    }
+    ready = all(checks.values())
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if ready else "not_ready",
+        "checks": checks,
+        "storage": storage_connector.status() if storage_connector else None
+    }
+
+
 @app.get("/health")
 async def health():
     try:
         # Check if API key is configured
-        if not settings.GROQ_API_KEY:
+        if not llm_configured():
             return {"status": "error", "message": "API key not configured"}
         
-        return {"status": "ok", "model": settings.MODEL}
+        return {
+            "status": "ok",
+            "model": settings.MODEL,
+            "llm_backend": settings.LLM_BACKEND,
+            "storage_backend": db_client.name if db_client else None,
+            "prompt_version": SYSTEM_PREFIX.version
+        }
     except Exception as e:
         logger.error(f"Health check error: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and size of the thread context cache and the response cache"""
+    if not db_client or not db_client.context_cache:
+        stats = {"enabled": False}
+    else:
+        stats = {"enabled": True, **db_client.context_cache.stats()}
+    stats["response_cache"] = (
+        {"enabled": True, **response_cache.stats()} if response_cache else {"enabled": False}
+    )
+    return stats
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, stage latency, token and queue metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/llm/backends")
+async def llm_backends():
+    """Routes and rolling latency / error rate per LLM backend"""
+    if not llm_router:
+        return {"enabled": False}
+    return {"enabled": True, **llm_router.stats()}
+
+
+@app.get("/api/admission/stats")
+async def admission_stats():
+    """Per-user quota counters and the fair scheduler in front of the LLM"""
+    return {
+        "enabled": admission is not None,
+        **(admission.stats() if admission else {}),
+        "scheduler": llm_scheduler.stats()
+    }
+
+
+@app.get("/api/dedup/stats")
+async def dedup_stats():
+    """Chat turns run fresh, coalesced with an identical in-flight turn, or replayed by Idempotency-Key"""
+    return chat_dedup.stats()
+
+
+@app.get("/api/background/stats")
+async def background_stats():
+    """Depth, throughput and latency of the summary and purge queues and the write-behind buffer"""
+    write_buffer = db_client.write_buffer if db_client else None
+    return {
+        **summary_queue.stats(),
+        "purges": {
+            **purge_queue.stats(),
+            "sweep": purge_sweeper.stats() if purge_sweeper else None
+        },
+        "write_buffer": {"enabled": True, **write_buffer.stats()} if write_buffer else {"enabled": False}
+    }
+
 @app.get("/api/threads/{thread_id}/{user_id}/messages")
-async def get_thread_all_messages(thread_id: str, user_id: str):
-    """Get all messages from a thread"""
+async def get_thread_all_messages(
+    thread_id: str,
+    user_id: str,
+    limit: int = Query(100, ge=1, le=100),
+    before: Optional[str] = None,
+    after: Optional[str] = None
+):
+    """
+    Get a page of messages from a thread in chronological order (latest page by default).
+    
+    Pass `next_cursor` from the response as `before` to load older messages,
+    or as `after` to load messages newer than a previous `after` page.
+    """
     try:
         if not db_client or not db_client.is_connected():
             raise ValueError("Database not connected")
         
-        # Get all messages from thread
-        messages = db_client.get_thread_messages(thread_id, user_id, limit=100)
+        # Get one page of messages from thread
+        page = await db_client.get_thread_messages_page(thread_id, user_id, limit=limit, before=before, after=after)
+        messages = page["messages"]
+
+        # Messages of a deleted thread stay until the background purge reaches them
+        if messages and await db_client.get_thread_info(thread_id) is None:
+            page = {"messages": [], "next_cursor": None, "has_more": False}
+            messages = []
         
         logger.info(f"Retrieved {len(messages)} messages from thread {thread_id}")
         
@@ -206,72 +554,99 @@ async def get_thread_all_messages(thread_id: str, user_id: str):
             "user_id": user_id,
             "messages": messages,
             "count": len(messages),
-            
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"]
         }
     
+    except ValueError as e:
+        logger.warning(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving thread messages: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+async def run_thread_turn(thread_id: str, user_id: str, messages_list: List[dict]) -> dict:
+    """Answer one turn in a thread with its stored context and save it"""
+    received_at = datetime.utcnow()
+    
+    logger.info(f"Chat mode: Generating context-aware response for thread {thread_id}, user {user_id}")
+    
+    # Load summary and recent history in one query (raises ThreadNotFoundError if the thread is deleted)
+    context = await db_client.load_thread_context(thread_id, user_id, limit=20)
+    
+    # Generate response with thread context (uses stored summary)
+    response_text = await generate_context_aware_response(
+        messages_list, 
+        thread_id, 
+        user_id,
+        context=context
+    )
+    
+    # Save both messages and update the thread in one turn commit. An unknown thread_id
+    # starts the thread; one that existed when the context was loaded is not recreated
+    # if it was deleted meanwhile (raises ThreadNotFoundError)
+    user_message = messages_list[-1]
+    thread_info = await db_client.commit_turn(
+        thread_id, user_id, user_message, response_text,
+        title=make_thread_title(user_message.get("content", "")),
+        user_created_at=received_at,
+        create=context["thread"] is None
+    )
+    logger.info(f"Messages saved to thread {thread_id}")
+    
+    # Auto-generate summary in background
+    schedule_summary(thread_id, user_id, thread_info)
+    
+    return {
+        "thread_id": thread_id,
+        "user_id": user_id,
+        "response": response_text,
+       
+    }
+
+
 @app.post("/api/threads/{thread_id}/{user_id}/messages")
 async def thread_messages_combined(
     thread_id: str, 
     user_id: str,
-    request: ThreadMessagesRequest
+    request: ThreadMessagesRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Combined endpoint for GET/CHAT operations:
     - If 'messages' provided: Chat mode (generate response + save to thread + use summary context)
     - If 'messages' NOT provided: Fetch mode (retrieve messages + summary from thread)
+    
+    In chat mode, identical concurrent requests for the thread share one turn, and a
+    retry with the same Idempotency-Key header returns the stored response
+    (marked with an Idempotent-Replayed: true header) instead of generating again.
     """
+    lease = None
     try:
         if not db_client or not db_client.is_connected():
             raise ValueError("Database not connected")
         
         # CHAT MODE: If messages provided
         if request.messages and len(request.messages) > 0:
-            if not settings.GROQ_API_KEY:
+            if not llm_configured():
                 logger.error("GROQ_API_KEY is not set")
                 raise ValueError("API key is not configured")
             
             messages_list = [msg.model_dump() for msg in request.messages]
+            scope = (thread_id, user_id)
+            fingerprint = request_fingerprint(messages_list)
             
-            logger.info(f"Chat mode: Generating context-aware response for thread {thread_id}, user {user_id}")
-            
-            # Generate response with thread context (uses stored summary)
-            response_text = await generate_context_aware_response(
-                messages_list, 
-                thread_id, 
-                user_id
-            )
-            
-            # Save messages to database
-            if db_client and db_client.is_connected():
-                # Create thread if it doesn't exist
-                if not db_client.get_thread_info(thread_id):
-                    msg_content = messages_list[-1].get("content", "")
-                    title = msg_content[:50] + "..." if len(msg_content) > 50 else msg_content
-                    db_client.create_thread(thread_id, user_id, title=title)
-                
-                user_message = messages_list[-1]
-                db_client.save_message(thread_id, user_id, user_message.get("role", "user"), user_message.get("content", ""))
-                db_client.save_message(thread_id, user_id, "assistant", response_text)
-                db_client.update_thread_message_count(thread_id)
-                logger.info(f"Messages saved to thread {thread_id}")
-                
-                # Auto-generate summary in background
-                asyncio.create_task(auto_generate_summary(thread_id, user_id))
+            replayed = chat_dedup.replay(scope, fingerprint, idempotency_key)
+            if replayed is not None:
+                response.headers["Idempotent-Replayed"] = "true"
+                return replayed
             
-            # Get updated summary
-            thread_info = db_client.get_thread_info(thread_id)
-            thread_summary = thread_info.get("summary") if thread_info else None
+            lease = await admit(user_id)
             
-            return {
-                "thread_id": thread_id,
-                "user_id": user_id,
-                "response": response_text,
-               
-            }
+            return await chat_dedup.run(
+                scope, fingerprint, lambda: run_thread_turn(thread_id, user_id, messages_list), idempotency_key
+            )
         
         # FETCH MODE: If messages NOT provided
         else:
@@ -279,14 +654,10 @@ async def thread_messages_combined(
             
           
             
-            # Get messages from thread
-            messages_list = db_client.get_thread_messages(thread_id, user_id)
-            
-            # Get thread summary for context
-            thread_summary = None
-            thread_info = db_client.get_thread_info(thread_id)
-            if thread_info:
-                thread_summary = thread_info.get("summary")
+            # Get messages and thread summary in one query
+            context = await db_client.load_thread_context(thread_id, user_id, limit=10)
+            messages_list = context["messages"]
+            thread_summary = context["summary"]
             
             logger.info(f"Retrieved {len(messages_list)} messages from thread {thread_id}")
             
@@ -298,11 +669,302 @@ async def thread_messages_combined(
                 
             }
     
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ThreadNotFoundError:
+        raise HTTPException(status_code=404, detail="Thread not found")
     except ValueError as e:
         logger.warning(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        logger.warning(f"Request from user {user_id} rejected: {str(e)}")
+        raise admission_rejected(e)
+    except LLMUnavailableError as e:
+        logger.warning(f"LLM unavailable: {str(e)}")
+        raise llm_unavailable(e)
     except Exception as e:
         logger.error(f"Error in thread_messages_combined: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    finally:
+        if lease:
+            lease.release()
+
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_chat_turn(messages_list: List[dict], thread_id: str, user_id: str, context: Optional[dict] = None,
+                           create: bool = False):
+    """
+    Stream a context-aware response as SSE frames and persist the turn once it completes
+    (`create` for the first turn of a new thread).
+    
+    Frames:
+        event: start  -> {"thread_id": ...}
+        (default)     -> {"token": ...} for each fragment
+        event: done   -> {"thread_id": ..., "length": ...} after the assistant message is saved
+        event: error  -> {"error": ...} if generation fails ("retry_after" seconds
+                         when the LLM is throttled, its circuit is open or no
+                         LLM slot freed up in time) or the thread was deleted
+                         before the turn was saved
+    
+    The turn (user + assistant message) is committed only after the last token, so
+    if the client disconnects mid-stream nothing partial is saved.
+    """
+    yield sse_event({"thread_id": thread_id}, event="start")
+    
+    received_at = datetime.utcnow()
+    parts = []
+    try:
+        async for token in stream_context_aware_response(messages_list, thread_id, user_id, context):
+            parts.append(token)
+            yield sse_event({"token": token})
+    except Exception as e:
+        logger.error(f"Error streaming response for thread {thread_id}: {str(e)}")
+        payload = {"error": str(e)}
+        if isinstance(e, (LLMUnavailableError, AdmissionRejected)) and e.retry_after:
+            payload["retry_after"] = math.ceil(e.retry_after)
+        yield sse_event(payload, event="error")
+        return
+    
+    response_text = "".join(parts).strip()
+    
+    if db_client and db_client.is_connected():
+        user_message = messages_list[-1]
+        try:
+            thread_info = await db_client.commit_turn(
+                thread_id, user_id, user_message, response_text,
+                title=make_thread_title(user_message.get("content", "")),
+                user_created_at=received_at,
+                create=create
+            )
+        except ThreadNotFoundError:
+            yield sse_event({"error": "Thread not found"}, event="error")
+            return
+        logger.info(f"Streamed messages saved to thread {thread_id}")
+        
+        # Auto-generate summary in background
+        schedule_summary(thread_id, user_id, thread_info)
+    
+    yield sse_event({"thread_id": thread_id, "length": len(response_text)}, event="done")
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Disable proxy buffering so tokens flush immediately
+}
+
+
+async def release_after(frames, lease):
+    """Pass stream frames through and release the admission lease when the stream ends"""
+    try:
+        async for frame in frames:
+            yield frame
+    finally:
+        if lease:
+            lease.release()
+
+
+def sse_response(frames, lease=None, media_type: str = "text/event-stream") -> StreamingResponse:
+    """
+    Streamed response holding `lease` until the stream is done. The background task
+    covers a client that disconnects before the body is started.
+    """
+    return StreamingResponse(
+        release_after(frames, lease),
+        media_type=media_type,
+        headers=SSE_HEADERS,
+        background=BackgroundTask(lease.release) if lease else None
+    )
+
+
+async def answer_batch_item(index: int, item: dict, user_id: str, persist: bool) -> dict:
+    """Answer one batch conversation; failures are reported in the result instead of raised"""
+    start = time.perf_counter()
+    result = {"index": index, "id": item.get("id")}
+    try:
+        if persist:
+            # Batch answers show up unread in the thread list until the thread is opened
+            answer = await run_new_chat(item["messages"], user_id, unread=True)
+            result.update(success=True, response=answer.response, thread_id=answer.thread_id)
+        else:
+            result.update(success=True, response=await generate_gemini_response(item["messages"], user_id))
+    except Exception as e:
+        logger.error(f"Batch item {index} for user {user_id} failed: {str(e)}")
+        result.update(success=False, error=str(e))
+        if isinstance(e, (LLMUnavailableError, AdmissionRejected)) and e.retry_after:
+            result["retry_after"] = math.ceil(e.retry_after)
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+async def stream_batch(items: List[dict], user_id: str, persist: bool, concurrency: int):
+    """
+    Run batch items with bounded concurrency and yield NDJSON lines as they complete.
+    
+    Lines:
+        {"index", "id", "success", "response" | "error", "thread_id" (persist), "latency_ms"}
+        ...in completion order, then
+        {"done": true, "total", "succeeded", "failed", "elapsed_seconds"}
+    """
+    start = time.perf_counter()
+    succeeded = 0
+    async for result in map_unordered(
+        items, lambda index, item: answer_batch_item(index, item, user_id, persist), concurrency
+    ):
+        succeeded += result["success"]
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    logger.info(f"Batch of {len(items)} for user {user_id} finished: {succeeded} succeeded")
+    yield json.dumps({
+        "done": True,
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "elapsed_seconds": round(time.perf_counter() - start, 3)
+    }) + "\n"
+
+
+@app.post("/api/chat/stream")
+async def generate_stream(request: AIRequest):
+    """Streaming variant of /api/chat: creates a new thread and streams the response as SSE"""
+    try:
+        if not llm_configured():
+            logger.error("GROQ_API_KEY is not set")
+            raise ValueError("API key is not configured")
+        
+        if not db_client or not db_client.is_connected():
+            raise ValueError("Database not connected")
+        
+        messages = [msg.model_dump() for msg in request.messages]
+        thread_id = str(uuid.uuid4())
+        
+        logger.info(f"Streaming response for user {request.user_id} with thread {thread_id}")
+        
+        lease = await admit(request.user_id)
+        
+        # New thread has no stored summary or history yet, skip the context query
+        return sse_response(
+            stream_chat_turn(
+                messages, thread_id, request.user_id, context={"summary": None, "messages": []}, create=True
+            ),
+            lease
+        )
+    
+    except ValueError as e:
+        logger.warning(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        logger.warning(f"Request from user {request.user_id} rejected: {str(e)}")
+        raise admission_rejected(e)
+    except Exception as e:
+        logger.error(f"Error starting stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@app.post("/api/chat/batch")
+async def generate_batch(request: BatchChatRequest):
+    """
+    Answer many independent conversations (nightly replays, FAQ generation).
+    
+    Items run at most max_concurrency (capped by BATCH_MAX_CONCURRENCY) at a time
+    through the same LLM path as /api/chat, sharing the fair scheduler with
+    interactive traffic. Results stream back as NDJSON in completion order. With
+    persist=false (default) nothing is written to the database; with persist=true
+    every item becomes a new thread. The whole batch counts as one request for
+    admission control.
+    """
+    try:
+        if not llm_configured():
+            logger.error("GROQ_API_KEY is not set")
+            raise ValueError("API key is not configured")
+        
+        if len(request.items) > settings.BATCH_MAX_ITEMS:
+            raise ValueError(f"A batch can hold at most {settings.BATCH_MAX_ITEMS} items")
+        
+        if request.persist and (not db_client or not db_client.is_connected()):
+            raise ValueError("Database not connected")
+        
+        concurrency = min(request.max_concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+        if concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        
+        items = [
+            {"id": item.id, "messages": [msg.model_dump() for msg in item.messages]}
+            for item in request.items
+        ]
+        
+        lease = await admit(request.user_id)
+        
+        logger.info(
+            f"Batch of {len(items)} conversations for user {request.user_id}, "
+            f"concurrency {concurrency}, persist={request.persist}"
+        )
+        return sse_response(
+            stream_batch(items, request.user_id, request.persist, concurrency),
+            lease,
+            media_type="application/x-ndjson"
+        )
     
-    
\ No newline at end of file
+    except ValueError as e:
+        logger.warning(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        logger.warning(f"Batch from user {request.user_id} rejected: {str(e)}")
+        raise admission_rejected(e)
+    except Exception as e:
+        logger.error(f"Error starting batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@app.post("/api/threads/{thread_id}/{user_id}/messages/stream")
+async def thread_messages_stream(
+    thread_id: str,
+    user_id: str,
+    request: ThreadMessagesRequest
+):
+    """Streaming variant of the thread chat mode: streams the response as SSE"""
+    try:
+        if not db_client or not db_client.is_connected():
+            raise ValueError("Database not connected")
+        
+        if not request.messages:
+            raise ValueError("messages list cannot be empty")
+        
+        if not llm_configured():
+            logger.error("GROQ_API_KEY is not set")
+            raise ValueError("API key is not configured")
+        
+        messages_list = [msg.model_dump() for msg in request.messages]
+        
+        logger.info(f"Stream mode: Generating context-aware response for thread {thread_id}, user {user_id}")
+        
+        lease = await admit(user_id)
+        
+        # Deleted threads are rejected before any token is generated; the turn commit
+        # checks again once the stream finishes
+        try:
+            context = await db_client.load_thread_context(thread_id, user_id, limit=20)
+        except Exception:
+            if lease:
+                lease.release()
+            raise
+        
+        return sse_response(
+            stream_chat_turn(messages_list, thread_id, user_id, context, create=context["thread"] is None), lease
+        )
+    
+    except ThreadNotFoundError:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    except ValueError as e:
+        logger.warning(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        logger.warning(f"Request from user {user_id} rejected: {str(e)}")
+        raise admission_rejected(e)
+    except Exception as e:
+        logger.error(f"Error starting stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -26,6 +26,67 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "current_thread" not in st.session_state:
     st.session_state.current_thread = None
+if "stream_responses" not in st.session_state:
+    st.session_state.stream_responses = True
+if "threads_cursor" not in st.session_state:
+    st.session_state.threads_cursor = None
+if "threads_has_more" not in st.session_state:
+    st.session_state.threads_has_more = False
+
+# Threads fetched per page in the sidebar
+THREADS_PAGE_SIZE = 20
+
+
+def load_threads_page(before: str = None):
+    """Fetch one page of threads; appends to the sidebar list when `before` is given"""
+    params = {"limit": THREADS_PAGE_SIZE}
+    if before:
+        params["before"] = before
+    response = requests.get(f"{API_BASE_URL}/api/threads/{st.session_state.user_id}", params=params)
+    if response.status_code != 200:
+        return False
+    
+    data = response.json()
+    threads = data.get("threads", [])
+    st.session_state.threads = st.session_state.threads + threads if before else threads
+    st.session_state.threads_cursor = data.get("next_cursor")
+    st.session_state.threads_has_more = data.get("has_more", False)
+    return True
+
+
+def stream_chat(url: str, payload: dict, result: dict):
+    """
+    POST to a streaming (SSE) endpoint and yield response tokens as they arrive.
+    
+    Fills `result` with the thread_id from the start event and any error message,
+    so callers can use them after st.write_stream() has consumed the generator.
+    """
+    with requests.post(url, json=payload, stream=True, timeout=120) as response:
+        if response.status_code != 200:
+            result["error"] = response.json().get("detail", "Unknown error") if response.text else "Connection error"
+            return
+        
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                event = None
+                continue
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+                continue
+            if not line.startswith("data:"):
+                continue
+            
+            data = json.loads(line[len("data:"):].strip())
+            if event == "start":
+                result["thread_id"] = data.get("thread_id")
+            elif event == "error":
+                result["error"] = data.get("error", "Unknown error")
+            elif event == "done":
+                result["done"] = True
+            elif "token" in data:
+                yield data["token"]
+
 
 # Header
 st.title("💬 Nikoo AI Assistant")
@@ -48,16 +109,19 @@ with st.sidebar:
     if st.session_state.user_id:
         st.success(f"✅ Logged in as: {st.session_state.user_id}")
         
+        st.session_state.stream_responses = st.toggle(
+            "⚡ Stream responses",
+            value=st.session_state.stream_responses,
+            help="Render the assistant's reply token by token"
+        )
+        
         st.markdown("---")
         st.header("📚 Threads")
         
         # Load threads button
         if st.button("🔄 Load Threads", use_container_width=True):
             try:
-                response = requests.get(f"{API_BASE_URL}/api/threads/{st.session_state.user_id}")
-                if response.status_code == 200:
-                    data = response.json()
-                    st.session_state.threads = data.get("threads", [])
+                if load_threads_page():
                     st.success(f"✅ Loaded {len(st.session_state.threads)} threads")
                 else:
                     st.error("Failed to load threads")
@@ -72,16 +136,26 @@ with st.sidebar:
                 col1, col2, col3 = st.columns([3, 1, 1])
                 
                 with col1:
-                    # Thread title
+                    # Thread title, marked while it has an unopened reply
                     thread_title = thread.get("title", "Untitled")[:50]
+                    marker = "🔵" if thread.get("unread") else "💬"
                     if st.button(
-                        f"💬 {thread_title}",
+                        f"{marker} {thread_title}",
                         key=f"thread_{thread['thread_id']}",
                         use_container_width=True
                     ):
+                        if thread.get("unread"):
+                            requests.post(
+                                f"{API_BASE_URL}/api/threads/{thread['thread_id']}/{st.session_state.user_id}/read"
+                            )
+                            thread["unread"] = False
                         st.session_state.thread_id = thread["thread_id"]
                         st.session_state.current_thread = thread
                         st.rerun()
+                    
+                    # Last message preview (stored on the thread, no extra request)
+                    if thread.get("last_message_preview"):
+                        st.caption(thread["last_message_preview"][:80])
                 
                 with col2:
                     # Message count
@@ -113,6 +187,16 @@ with st.sidebar:
                         except Exception as e:
                             st.error(f"Error: {str(e)}")
             
+            # Older threads are fetched page by page
+            if st.session_state.threads_has_more:
+                if st.button("⬇️ Load more threads", use_container_width=True):
+                    try:
+                        if not load_threads_page(before=st.session_state.threads_cursor):
+                            st.error("Failed to load threads")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Error: {str(e)}")
+            
             st.markdown("---")
         
         # New chat button
@@ -148,17 +232,33 @@ if st.session_state.user_id:
                         "user_id": st.session_state.user_id
                     }
                     
-                    response = requests.post(
-                        f"{API_BASE_URL}/api/chat",
-                        json=payload
-                    )
+                    data = None
+                    if st.session_state.stream_responses:
+                        result = {}
+                        st.markdown("🤖 **Assistant**:")
+                        streamed_text = st.write_stream(
+                            stream_chat(f"{API_BASE_URL}/api/chat/stream", payload, result)
+                        )
+                        if result.get("error"):
+                            st.error(f"❌ Error: {result['error']}")
+                        else:
+                            data = {"thread_id": result.get("thread_id"), "response": streamed_text}
+                    else:
+                        response = requests.post(
+                            f"{API_BASE_URL}/api/chat",
+                            json=payload
+                        )
+                        if response.status_code == 200:
+                            data = response.json()
+                            st.info(f"🤖 **Assistant**: {data.get('response', '')}")
+                        else:
+                            error_detail = response.json().get('detail', 'Unknown error') if response.text else 'Connection error'
+                            st.error(f"❌ Error: {error_detail}")
                     
-                    if response.status_code == 200:
-                        data = response.json()
+                    if data:
                         new_thread_id = data.get("thread_id")
                         
                         st.success("✅ Chat created successfully!")
-                        st.info(f"🤖 **Assistant**: {data.get('response', '')}")
                         
                         # Create thread object to display in UI
                         new_thread = {
@@ -180,9 +280,6 @@ if st.session_state.user_id:
                         
                         st.info("💬 Now you can send more messages to continue the conversation!")
                         st.rerun()
-                    else:
-                        error_detail = response.json().get('detail', 'Unknown error') if response.text else 'Connection error'
-                        st.error(f"❌ Error: {error_detail}")
                 
                 except Exception as e:
                     st.error(f"❌ Error creating chat: {str(e)}")
@@ -253,28 +350,47 @@ if st.session_state.user_id:
                         ]
                     }
                     
-                    response = requests.post(
-                        f"{API_BASE_URL}/api/threads/{thread['thread_id']}/{st.session_state.user_id}/messages",
-                        json=payload
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        st.success("✅ Message sent!")
-                        
-                        # Display AI response
-                        if "response" in data:
-                            st.info(f"🤖 **Assistant**: {data['response']}")
-                        
-                        # Show summary if available
-                        if data.get("summary"):
-                            with st.expander("📝 Thread Summary"):
-                                st.write(data["summary"])
-                        
-                        # Reload messages
-                        st.rerun()
+                    if st.session_state.stream_responses:
+                        result = {}
+                        st.markdown("🤖 **Assistant**:")
+                        streamed_text = st.write_stream(
+                            stream_chat(
+                                f"{API_BASE_URL}/api/threads/{thread['thread_id']}/{st.session_state.user_id}/messages/stream",
+                                payload,
+                                result
+                            )
+                        )
+                        if result.get("error"):
+                            st.error(f"Error: {result['error']}")
+                        else:
+                            st.session_state.messages.extend([
+                                {"role": "user", "content": user_message},
+                                {"role": "assistant", "content": streamed_text}
+                            ])
+                            st.rerun()
                     else:
-                        st.error(f"Error: {response.json().get('detail', 'Unknown error')}")
+                        response = requests.post(
+                            f"{API_BASE_URL}/api/threads/{thread['thread_id']}/{st.session_state.user_id}/messages",
+                            json=payload
+                        )
+                        
+                        if response.status_code == 200:
+                            data = response.json()
+                            st.success("✅ Message sent!")
+                            
+                            # Display AI response
+                            if "response" in data:
+                                st.info(f"🤖 **Assistant**: {data['response']}")
+                            
+                            # Show summary if available
+                            if data.get("summary"):
+                                with st.expander("📝 Thread Summary"):
+                                    st.write(data["summary"])
+                            
+                            # Reload messages
+                            st.rerun()
+                        else:
+                            st.error(f"Error: {response.json().get('detail', 'Unknown error')}")
                 
                 except Exception as e:
                     st.error(f"Error sending message: {str(e)}")
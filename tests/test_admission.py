@@ -0,0 +1,151 @@
+"""
+FairScheduler weighted round-robin handoff and AdmissionController quotas.
+
+Run with: python -m pytest -q
+"""
+from app.admission.admission import AdmissionController, AdmissionRejected, MemoryQuotaStore
+from app.admission.scheduler import FairScheduler
+from app.LLM_Service.ai_service import GroqService
+from app.LLM_Service.fake_llm import FakeLLMClient
+import asyncio
+
+import pytest
+
+
+async def grant_order(scheduler: FairScheduler, waiters):
+    """Queue `waiters` (user ids, in arrival order) behind a held slot and record who gets it"""
+    await scheduler.acquire("holder")
+    order = []
+
+    async def wait(user_id: str):
+        await scheduler.acquire(user_id)
+        order.append(user_id)
+        scheduler.release()
+
+    tasks = []
+    for user_id in waiters:
+        tasks.append(asyncio.create_task(wait(user_id)))
+        await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_scheduler_grants_free_slots_immediately():
+    scheduler = FairScheduler(slots=2)
+
+    async def run():
+        await scheduler.acquire("a")
+        await scheduler.acquire("a")
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 2 and stats["queued"] == 0
+
+
+def test_scheduler_round_robins_between_users():
+    scheduler = FairScheduler(slots=1)
+    order = asyncio.run(grant_order(scheduler, ["a", "a", "a", "b", "c"]))
+    assert order == ["a", "b", "c", "a", "a"]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_scheduler_weight_gives_several_slots_per_turn():
+    scheduler = FairScheduler(slots=1, weights={"a": 2})
+    order = asyncio.run(grant_order(scheduler, ["a", "a", "a", "b", "b"]))
+    assert order == ["a", "a", "b", "a", "b"]
+
+
+def test_scheduler_rejects_after_queue_timeout():
+    scheduler = FairScheduler(slots=1, queue_timeout=0.01)
+
+    async def run():
+        await scheduler.acquire("a")
+        with pytest.raises(AdmissionRejected) as error:
+            await scheduler.acquire("b")
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503 and error.reason == "queue_timeout"
+    assert scheduler.stats()["waiting"] == 0 and scheduler.timeouts == 1
+
+    # The timed-out waiter is gone, so the released slot is simply free again
+    scheduler.release()
+    assert scheduler.stats()["active"] == 0
+
+
+def test_scheduler_cancelled_waiter_leaves_the_queue():
+    scheduler = FairScheduler(slots=1)
+
+    async def run():
+        await scheduler.acquire("a")
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release()
+
+    asyncio.run(run())
+    stats = scheduler.stats()
+    assert stats["active"] == 0 and stats["waiting"] == 0 and stats["waiting_users"] == 0
+    assert stats["granted"] == 1
+
+
+def test_scheduler_caps_concurrent_fake_llm_calls():
+    scheduler = FairScheduler(slots=2)
+    backend = GroqService(FakeLLMClient(latency=0.01, tokens_per_second=0), "fake-model",
+                          name="test", rpm_limit=0, tpm_limit=0)
+    peak = 0
+
+    async def turn(user_id: str):
+        nonlocal peak
+        async with scheduler.slot(user_id):
+            peak = max(peak, scheduler.active)
+            return await backend.create_completion([{"role": "user", "content": user_id}])
+
+    async def run():
+        return await asyncio.gather(*(turn(f"user-{i % 3}") for i in range(9)))
+
+    replies = asyncio.run(run())
+    assert all(replies) and peak == 2
+    assert scheduler.stats()["granted"] == 9 and scheduler.stats()["active"] == 0
+
+
+def test_admission_caps_concurrent_requests_per_user():
+    controller = AdmissionController(MemoryQuotaStore(), requests_per_minute=0, max_concurrent=2)
+
+    async def run():
+        leases = [await controller.acquire("a"), await controller.acquire("a")]
+        with pytest.raises(AdmissionRejected) as error:
+            await controller.acquire("a")
+        other = await controller.acquire("b")
+
+        leases[0].release()
+        leases[0].release()
+        leases.append(await controller.acquire("a"))
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("a")
+        for lease in leases + [other]:
+            lease.release()
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429 and error.reason == "concurrency"
+    assert controller.stats()["users_in_flight"] == 0
+    assert controller.rejected == {"concurrency": 2, "rate": 0}
+
+
+def test_admission_rate_quota_rejects_and_frees_the_slot():
+    controller = AdmissionController(MemoryQuotaStore(), requests_per_minute=2, max_concurrent=1)
+
+    async def run():
+        for _ in range(2):
+            (await controller.acquire("a")).release()
+        with pytest.raises(AdmissionRejected) as error:
+            await controller.acquire("a")
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.reason == "rate" and 0 < error.retry_after <= 60
+    assert controller.stats()["users_in_flight"] == 0
+    assert controller.admitted == 2
@@ -0,0 +1,66 @@
+"""
+assemble_prompt packing, and stored history the client re-sent appearing only once.
+
+Run with: python -m pytest -q
+"""
+from app.LLM_Service.prompt_builder import assemble_prompt, count_message_tokens
+from typing import Dict, List
+
+
+def conversation(turns: int) -> List[Dict]:
+    """Alternating user/assistant messages q0, a0, q1, a1, ..."""
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"question {i}"})
+        messages.append({"role": "assistant", "content": f"answer {i}"})
+    return messages
+
+
+def contents(formatted: List[Dict]) -> List[str]:
+    return [msg["content"] for msg in formatted[1:]]
+
+
+def test_new_message_only_uses_stored_history():
+    history = conversation(3)
+    formatted, stats = assemble_prompt("system", [{"role": "user", "content": "new"}], history=history)
+
+    assert contents(formatted) == [msg["content"] for msg in history] + ["new"]
+    assert stats["messages_dropped"] == 0
+
+
+def test_resent_recent_turns_are_not_duplicated():
+    history = conversation(3)
+    messages = history[-2:] + [{"role": "user", "content": "new"}]
+    formatted, _ = assemble_prompt("system", messages, history=history)
+
+    assert contents(formatted) == [msg["content"] for msg in history] + ["new"]
+
+
+def test_full_conversation_resend_longer_than_history_is_not_duplicated():
+    full = conversation(15)
+    # The store returns only the last 20 messages; the client sends all 30 plus the new one
+    history = full[-20:]
+    messages = full + [{"role": "user", "content": "new"}]
+    formatted, stats = assemble_prompt("system", messages, history=history, budget=100000)
+
+    assert contents(formatted) == [msg["content"] for msg in full] + ["new"]
+    assert stats["messages_included"] == len(full) + 1
+
+
+def test_history_missing_from_the_resend_is_kept():
+    history = conversation(2)
+    messages = [{"role": "user", "content": "earlier elsewhere"}, {"role": "user", "content": "new"}]
+    formatted, _ = assemble_prompt("system", messages, history=history)
+
+    assert contents(formatted) == [msg["content"] for msg in history] + ["earlier elsewhere", "new"]
+
+
+def test_budget_drops_oldest_whole_messages():
+    history = conversation(10)
+    new = {"role": "user", "content": "new"}
+    budget = count_message_tokens({"content": "system"}) + count_message_tokens(new) \
+        + sum(count_message_tokens(msg) for msg in history[-4:])
+    formatted, stats = assemble_prompt("system", [new], history=history, budget=budget)
+
+    assert contents(formatted) == [msg["content"] for msg in history[-4:]] + ["new"]
+    assert stats["messages_dropped"] == len(history) - 4
@@ -0,0 +1,253 @@
+"""
+TokenBucket, RetryPolicy and CircuitBreaker state machines, and GroqService
+retrying on top of them with the fake LLM client.
+
+Run with: python -m pytest -q
+"""
+from app.LLM_Service import rate_limit
+from app.LLM_Service.ai_service import GroqService
+from app.LLM_Service.fake_llm import FakeLLMClient, FakeLLMError
+from app.LLM_Service.rate_limit import CircuitBreaker, LLMUnavailableError, RetryPolicy, TokenBucket
+from types import SimpleNamespace
+import asyncio
+import time
+
+import pytest
+
+
+class FakeClock:
+    """Stands in for time.monotonic and asyncio.sleep in rate_limit; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(rate_limit, "asyncio", SimpleNamespace(sleep=clock.sleep, Lock=asyncio.Lock))
+    return clock
+
+
+class BadRequestError(Exception):
+    """400 from the provider: not retryable"""
+
+    status_code = 400
+
+
+class RateLimitedError(Exception):
+    """429 with a Retry-After header, shaped like groq.RateLimitError"""
+
+    status_code = 429
+
+    def __init__(self, retry_after: str):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+def fake_client(errors):
+    """FakeLLMClient whose first calls raise `errors` in order"""
+    client = FakeLLMClient(latency=0, tokens_per_second=0, reply_tokens=3)
+    create = client.chat.completions.create
+    errors = list(errors)
+
+    async def failing_create(*args, **kwargs):
+        if errors:
+            client.calls += 1
+            raise errors.pop(0)
+        return await create(*args, **kwargs)
+
+    client.chat = SimpleNamespace(completions=SimpleNamespace(create=failing_create))
+    return client
+
+
+def service(client, max_retries: int = 2, failures: int = 5, cooldown: float = 30.0) -> GroqService:
+    backend = GroqService(client, "fake-model", name="test", rpm_limit=0, tpm_limit=0)
+    backend.retry_policy = RetryPolicy(max_retries=max_retries, base_delay=0.001, max_delay=1.0)
+    backend.breaker = CircuitBreaker(failure_threshold=failures, cooldown=cooldown)
+    return backend
+
+
+def test_token_bucket_serves_capacity_then_waits_for_refill(clock):
+    bucket = TokenBucket(per_minute=60, capacity=2)
+
+    async def run():
+        return [await bucket.acquire() for _ in range(3)]
+
+    assert asyncio.run(run()) == [0.0, 0.0, pytest.approx(1.0)]
+    assert clock.slept == [pytest.approx(1.0)]
+
+
+def test_token_bucket_debit_and_pause_delay_next_acquire(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.debit(61)
+    assert asyncio.run(bucket.acquire()) == pytest.approx(2.0)
+
+    clock.now += 60
+    bucket.pause(5)
+    assert asyncio.run(bucket.acquire()) == pytest.approx(6.0)
+
+
+def test_token_bucket_caps_oversized_requests_at_capacity(clock):
+    bucket = TokenBucket(per_minute=60, capacity=10)
+    assert asyncio.run(bucket.acquire(100)) == 0.0
+    assert bucket.tokens == 0
+
+
+def test_retry_policy_gives_up_after_max_retries():
+    policy = RetryPolicy(max_retries=2, base_delay=0.5, max_delay=20)
+    assert 0 <= policy.delay(1) <= 0.5
+    assert 0 <= policy.delay(2) <= 1.0
+    assert policy.delay(3) is None
+
+
+def test_retry_policy_honours_retry_after_up_to_max_delay():
+    policy = RetryPolicy(max_retries=2, base_delay=0.5, max_delay=20)
+    assert policy.delay(1, retry_after=7) == 7
+    assert policy.delay(1, retry_after=21) is None
+    assert policy.delay(3, retry_after=1) is None
+
+
+def test_circuit_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow() and not breaker.is_open()
+
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.retry_after() == pytest.approx(10)
+
+
+def test_circuit_breaker_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    breaker.record_failure()
+
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    # A failed trial re-opens for another cooldown
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_circuit_breaker_released_trial_lets_the_next_call_try(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    breaker.record_failure()
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.release_trial()
+    assert not breaker.is_open()
+    assert breaker.allow() and breaker.state == "half_open"
+
+    # Outside a trial there is nothing to release
+    breaker.record_success()
+    breaker.release_trial()
+    assert breaker.state == "closed"
+
+
+def test_service_pauses_for_retry_after_then_succeeds():
+    client = fake_client([RateLimitedError("0.05")])
+    backend = service(client)
+
+    start = time.monotonic()
+    reply = asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+
+    assert reply
+    assert client.calls == 2
+    assert time.monotonic() - start >= 0.05
+    assert backend.paused_until > start
+    assert backend.breaker.state == "closed"
+
+
+def test_service_fails_fast_when_retry_after_exceeds_max_delay():
+    client = fake_client([RateLimitedError("5")])
+    backend = service(client)
+
+    with pytest.raises(LLMUnavailableError) as error:
+        asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+
+    assert client.calls == 1
+    assert error.value.retry_after == 5
+
+
+def test_service_circuit_opens_and_rejects_without_calling():
+    client = fake_client([FakeLLMError("down")] * 2)
+    backend = service(client, max_retries=5, failures=2, cooldown=60)
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+    assert backend.breaker.state == "open"
+    assert client.calls == 2
+
+    with pytest.raises(LLMUnavailableError, match="Circuit open"):
+        asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+    assert client.calls == 2
+
+
+def test_service_half_open_trial_closes_circuit():
+    client = fake_client([FakeLLMError("down")])
+    backend = service(client, max_retries=0, failures=1, cooldown=0.01)
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+    assert backend.breaker.state == "open"
+
+    time.sleep(0.02)
+    assert asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+    assert backend.breaker.state == "closed"
+
+
+def test_service_half_open_trial_ending_in_a_client_error_closes_circuit():
+    client = fake_client([FakeLLMError("down"), BadRequestError("bad request")])
+    backend = service(client, max_retries=0, failures=1, cooldown=0.01)
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+
+    time.sleep(0.02)
+    with pytest.raises(BadRequestError):
+        asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+    assert backend.breaker.state == "closed"
+    assert asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+
+
+def test_service_cancelled_half_open_trial_does_not_hold_the_circuit():
+    client = fake_client([FakeLLMError("down")])
+    backend = service(client, max_retries=0, failures=1, cooldown=0.01)
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(backend.create_completion([{"role": "user", "content": "hi"}]))
+    time.sleep(0.02)
+
+    async def cancelled_trial():
+        client.latency = 10
+        trial = asyncio.create_task(backend.create_completion([{"role": "user", "content": "hi"}]))
+        await asyncio.sleep(0.01)
+        assert backend.breaker.state == "half_open"
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        client.latency = 0
+        return await backend.create_completion([{"role": "user", "content": "hi"}])
+
+    assert asyncio.run(cancelled_trial())
+    assert backend.breaker.state == "closed"
@@ -0,0 +1,185 @@
+"""
+WriteBehindBuffer flush ordering across failed batches and the read-your-writes
+merge of pending turns (pending_messages / overlay_thread).
+
+Run with: python -m pytest -q
+"""
+from app.background.write_buffer import WriteBehindBuffer
+from datetime import datetime, timedelta
+from typing import Dict, List
+import asyncio
+
+import pytest
+
+START = datetime(2026, 1, 1)
+
+
+class BulkWriteError(Exception):
+    """Stand-in for pymongo's BulkWriteError: `details` counts the operations applied"""
+
+    def __init__(self, applied: int):
+        super().__init__(f"failed after {applied} operations")
+        self.details = {"nMatched": applied, "nUpserted": 0}
+
+
+class Sink:
+    """
+    In-memory messages and threads behind the buffer. Message writes are
+    idempotent by _id; thread updates apply in order and can stop part way.
+    """
+
+    def __init__(self):
+        self.messages: Dict[int, Dict] = {}
+        self.threads: Dict[str, Dict] = {}
+        self.fail_messages = 0
+        self.fail_threads_after = None
+        self.thread_batches: List[List[str]] = []
+
+    async def insert_messages(self, documents: List[Dict]):
+        if self.fail_messages:
+            self.fail_messages -= 1
+            raise ConnectionError("messages unavailable")
+        for doc in documents:
+            self.messages.setdefault(doc["_id"], doc)
+
+    async def update_threads(self, updates: Dict[str, Dict]):
+        self.thread_batches.append(list(updates))
+        for index, (thread_id, update) in enumerate(updates.items()):
+            if self.fail_threads_after == index:
+                self.fail_threads_after = None
+                raise BulkWriteError(index)
+            thread = self.threads.setdefault(thread_id, {"thread_id": thread_id, "message_count": 0})
+            thread["message_count"] += update["count"]
+            thread["updated_at"] = update["updated_at"]
+            thread.update(update["fields"])
+
+
+def turn(thread_id: str, first: int, count: int = 2, user_id: str = "u") -> List[Dict]:
+    """`count` message documents with increasing _id and created_at"""
+    return [
+        {"_id": n, "thread_id": thread_id, "user_id": user_id, "content": f"m{n}",
+         "created_at": START + timedelta(seconds=n)}
+        for n in range(first, first + count)
+    ]
+
+
+@pytest.fixture
+def sink():
+    return Sink()
+
+
+@pytest.fixture
+def buffer(sink):
+    return WriteBehindBuffer(sink.insert_messages, sink.update_threads, max_batch=100, flush_interval=10)
+
+
+def test_flush_writes_messages_and_one_update_per_thread(sink, buffer):
+    async def run():
+        await buffer.add("t1", "u", turn("t1", 0), title="first", fields={"last": "m1"})
+        await buffer.add("t1", "u", turn("t1", 2), fields={"last": "m3"})
+        await buffer.add("t2", "u", turn("t2", 4))
+        return await buffer.flush()
+
+    assert asyncio.run(run())
+    assert list(sink.messages) == [0, 1, 2, 3, 4, 5]
+    assert sink.thread_batches == [["t1", "t2"]]
+    assert sink.threads["t1"]["message_count"] == 4
+    assert sink.threads["t1"]["last"] == "m3"
+    assert sink.threads["t1"]["updated_at"] == START + timedelta(seconds=3)
+    assert buffer.stats()["pending_messages"] == 0
+
+
+def test_failed_batch_is_retried_before_newer_turns(sink, buffer):
+    sink.fail_messages = 1
+
+    async def run():
+        await buffer.add("t1", "u", turn("t1", 0), fields={"last": "m1"})
+        assert not await buffer.flush()
+        await buffer.add("t1", "u", turn("t1", 2), fields={"last": "m3"})
+        return await buffer.flush()
+
+    assert asyncio.run(run())
+    assert list(sink.messages) == [0, 1, 2, 3]
+    # The retried update and the newer one are folded into a single update
+    assert sink.thread_batches == [["t1"]]
+    assert sink.threads["t1"]["message_count"] == 4
+    assert sink.threads["t1"]["last"] == "m3"
+    assert buffer.failures == 1 and buffer.flushes == 1
+
+
+def test_partly_applied_thread_updates_are_not_applied_twice(sink, buffer):
+    sink.fail_threads_after = 1
+
+    async def run():
+        await buffer.add("t1", "u", turn("t1", 0))
+        await buffer.add("t2", "u", turn("t2", 2))
+        assert not await buffer.flush()
+        return await buffer.flush()
+
+    assert asyncio.run(run())
+    assert sink.thread_batches == [["t1", "t2"], ["t2"]]
+    assert sink.threads["t1"]["message_count"] == 2
+    assert sink.threads["t2"]["message_count"] == 2
+
+
+def test_pending_turns_stay_visible_while_flushing(sink, buffer):
+    seen = {}
+
+    async def run():
+        gate = asyncio.Event()
+        insert = sink.insert_messages
+
+        async def slow_insert(documents):
+            await gate.wait()
+            await insert(documents)
+
+        buffer.insert_messages = slow_insert
+        await buffer.add("t1", "u", turn("t1", 0), title="first")
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+
+        seen["messages"] = [msg["_id"] for msg in buffer.pending_messages("t1", "u")]
+        seen["thread"] = buffer.overlay_thread("t1", None)
+        gate.set()
+        await flush
+
+    asyncio.run(run())
+    assert seen["messages"] == [0, 1]
+    assert seen["thread"]["title"] == "first" and seen["thread"]["message_count"] == 2
+    assert buffer.pending_messages("t1") == []
+
+
+def test_overlay_adds_pending_counts_to_the_stored_thread(buffer):
+    stored = {"thread_id": "t1", "message_count": 4, "updated_at": START, "title": "stored"}
+
+    async def run():
+        await buffer.add("t1", "u", turn("t1", 10), fields={"last": "m11"})
+
+    asyncio.run(run())
+    thread = buffer.overlay_thread("t1", stored)
+    assert thread["message_count"] == 6
+    assert thread["updated_at"] == START + timedelta(seconds=11)
+    assert thread["title"] == "stored" and thread["last"] == "m11"
+    assert stored["message_count"] == 4
+
+
+def test_overlay_skips_updates_the_stored_thread_already_has(buffer):
+    async def run():
+        await buffer.add("t1", "u", turn("t1", 0))
+
+    asyncio.run(run())
+    flushed = {"thread_id": "t1", "message_count": 2, "updated_at": START + timedelta(seconds=1)}
+    assert buffer.overlay_thread("t1", flushed) is flushed
+
+
+def test_overlay_does_not_recreate_a_missing_thread_for_existing_thread_turns(buffer):
+    async def run():
+        await buffer.add("new", "u", turn("new", 0), title="new thread")
+        await buffer.add("gone", "u", turn("gone", 2), create=False)
+        # The first pending turn decides; a later creating turn does not change it
+        await buffer.add("gone", "u", turn("gone", 4), create=True)
+
+    asyncio.run(run())
+    assert buffer.overlay_thread("new", None)["title"] == "new thread"
+    assert buffer.overlay_thread("gone", None) is None
+    assert buffer._threads["gone"]["create"] is False